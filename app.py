@@ -1,16 +1,37 @@
+import time
+_import_started = time.perf_counter()  # before anything heavy: feeds the startup report
+
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+from src.access import AccessControl
+from src.broadcast import BroadcastManager
+from src.capture import WebhookCapture
+from src.coalescer import SenderCoalescer
 from src.config import settings
-from src.routers import webhook, health, messages, debug  # Add debug import
+from src.instances import InstanceConfig, InstanceRegistry
+from src.llm import LLMClient
+from src.logging_setup import configure_logging
+from src.loop_monitor import LoopLagMonitor
+from src.media import MediaPipeline
+from src.metrics import QUEUE_DEPTH, InFlightMiddleware
+from src.outbox import Outbox
+from src.processor import MessageProcessor
+from src.response_cache import ResponseCache
+from src.routing import ModelRouter
+from src.responses import FastJSONResponse
+from src.startup import FirstRequestMiddleware, StartupReport
+from src.state import create_state_backend
+from src.routers import webhook, health, instances, logs, messages, metrics
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Setup logging (queued, off the event loop; level and sampling adjustable at /logging)
+logging_control = configure_logging(settings)
 logger = logging.getLogger(__name__)
 
+startup_report = StartupReport(_import_started)
+startup_report.mark("import")
+
 # Lifespan context manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -22,10 +43,175 @@ async def lifespan(app: FastAPI):
     logger.info(f"🏷️  Instance name: {settings.INSTANCE_NAME}")
     logger.info(f"🌐 Bot running on: http://localhost:{settings.PORT}")
     logger.info("=" * 60)
+
+    # Event-loop lag sampling (cheap; one short sleep every 100ms)
+    app.state.loop_monitor = LoopLagMonitor()
+    app.state.loop_monitor.start()
+    startup_report.mark("loop_monitor")
+
+    # Shared Groq client (reuses TLS connections across conversations); the
+    # SDK is imported on first use or by the pre-warm below
+    app.state.llm = LLMClient.from_settings(settings)
+    app.state.prewarm = None
+    if settings.STARTUP_PREWARM:
+        # TLS handshake to Groq before the first message needs it
+        app.state.prewarm = asyncio.create_task(app.state.llm.prewarm())
+        if settings.STARTUP_PREWARM_WAIT:
+            await app.state.prewarm
+    startup_report.mark("llm")
+
+    # Opt-in recording of incoming webhooks for bench/replay.py
+    app.state.capture = None
+    if settings.WEBHOOK_CAPTURE_FILE:
+        app.state.capture = WebhookCapture(
+            settings.WEBHOOK_CAPTURE_FILE,
+            queue_size=settings.WEBHOOK_CAPTURE_QUEUE_SIZE,
+            max_bytes=settings.WEBHOOK_CAPTURE_MAX_BYTES,
+        )
+        app.state.capture.start()
+
+    # Redelivery dedup keys and per-sender chat history used as LLM context;
+    # STATE_BACKEND=sqlite shares them between uvicorn workers
+    app.state.store = create_state_backend(settings)
+    await app.state.store.start()
+    logger.info(f"🗄️  State backend: {app.state.store.name}")
+    startup_report.mark("state")
+
+    # Replies to repeated short prompts, optionally persisted across restarts
+    app.state.response_cache = None
+    if settings.RESPONSE_CACHE_ENABLED:
+        app.state.response_cache = ResponseCache(
+            max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+            ttl=settings.RESPONSE_CACHE_TTL,
+            path=settings.RESPONSE_CACHE_FILE,
+        )
+        restored = app.state.response_cache.load()
+        if restored:
+            logger.info(f"⚡ Restored {restored} cached responses")
+    startup_report.mark("response_cache")
+
+    # Replies are committed here first so an Evolution outage cannot lose them
+    app.state.outbox = None
+    if settings.OUTBOX_ENABLED:
+        app.state.outbox = Outbox(
+            settings.OUTBOX_PATH,
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            max_in_flight=settings.OUTBOX_MAX_IN_FLIGHT,
+            poll_interval=settings.OUTBOX_POLL_INTERVAL,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            backoff_base=settings.OUTBOX_BACKOFF_BASE,
+            backoff_max=settings.OUTBOX_BACKOFF_MAX,
+            lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+            retention=settings.OUTBOX_RETENTION,
+        )
+        await app.state.outbox.open()
+    startup_report.mark("outbox")
+
+    # Who the bot answers besides the owners; ACCESS_LIST_FILE is hot-reloaded
+    app.state.access = AccessControl(
+        settings.ACCESS_LIST_FILE,
+        reload_interval=settings.ACCESS_LIST_RELOAD_INTERVAL,
+    )
+    await app.state.access.start()
+    startup_report.mark("access")
+
+    # Small model for small talk, large model for the rest, with a latency cascade
+    app.state.router = ModelRouter.from_settings(settings) if settings.ROUTER_ENABLED else None
+
+    # Generates and sends replies for queued webhooks
+    processor = MessageProcessor(
+        app.state.llm,
+        app.state.store,
+        app.state.response_cache,
+        app.state.outbox,
+        app.state.router,
+    )
+
+    # Images, voice notes and documents, on their own bounded worker pool
+    app.state.media = None
+    if settings.MEDIA_ENABLED:
+        app.state.media = MediaPipeline.from_settings(settings, app.state.llm, processor)
+
+    # Per-sender lanes in front of the worker pools: in-order replies (media
+    # included), bursts answered with one LLM request
+    app.state.coalescer = SenderCoalescer(
+        processor.process,
+        media=app.state.media,
+        window=settings.COALESCE_WINDOW,
+        max_wait=settings.COALESCE_MAX_WAIT,
+        max_batch=settings.COALESCE_MAX_BATCH,
+        max_pending=settings.COALESCE_MAX_PENDING,
+    )
+    if app.state.media is not None:
+        app.state.media.start(app.state.coalescer.run)
+
+    # One Evolution pool, outbound scheduler and worker pool per instance;
+    # INSTANCES_FILE adds more instances and is reloaded without a restart
+    app.state.instances = InstanceRegistry(
+        InstanceConfig.from_settings(settings),
+        settings,
+        app.state.coalescer.run,
+        path=settings.INSTANCES_FILE,
+        reload_interval=settings.INSTANCES_RELOAD_INTERVAL,
+    )
+    await app.state.instances.start()
+    logger.info(f"📞 Serving {len(app.state.instances)} instance(s)")
+    app.state.evolution = app.state.instances.default.client
+    app.state.outbound = app.state.instances.default.outbound
+    if app.state.outbox is not None:
+        app.state.outbox.start(app.state.instances)
+    startup_report.mark("instances")
+
+    # Bulk sends fan out through the instances' schedulers; resumable by job id
+    app.state.broadcasts = BroadcastManager(
+        settings.BROADCAST_PATH,
+        concurrency=settings.BROADCAST_CONCURRENCY,
+        max_recipients=settings.BROADCAST_MAX_RECIPIENTS,
+        max_wait=settings.BROADCAST_MAX_WAIT,
+    )
+    await app.state.broadcasts.open()
+    app.state.broadcasts.start(app.state.instances)
+    startup_report.mark("broadcasts")
+
+    # Evolution connection state served from memory to health probes; kept
+    # current by CONNECTION_UPDATE webhooks, with polling as the fallback
+    app.state.connection_monitor = app.state.instances.default.connection
+
+    # Queue depths are read at scrape time
+    QUEUE_DEPTH.set_function(lambda: app.state.instances.webhook_depth, "webhook")
+    QUEUE_DEPTH.set_function(lambda: app.state.instances.outbound_depth, "outbound")
+    QUEUE_DEPTH.set_function(lambda: app.state.coalescer.depth, "coalesce")
+    if app.state.media is not None:
+        QUEUE_DEPTH.set_function(lambda: app.state.media.depth, "media")
+    startup_report.ready()
     
     yield  # This is where the app runs
     
     # Shutdown logic
+    # Running broadcasts stop here and are resumed later by job id
+    await app.state.broadcasts.stop()
+    # Finish queued replies, deliver what the outbox can, then close the pools
+    app.state.coalescer.flush()
+    if app.state.media is not None:
+        await app.state.media.stop(drain_timeout=settings.WEBHOOK_DRAIN_TIMEOUT)
+    await app.state.instances.drain()
+    if app.state.outbox is not None:
+        await app.state.outbox.stop(drain_timeout=settings.OUTBOUND_DRAIN_TIMEOUT)
+    await app.state.instances.stop()
+    if app.state.outbox is not None:
+        await app.state.outbox.close()
+    await app.state.broadcasts.close()
+    if app.state.response_cache is not None:
+        app.state.response_cache.save()
+    await app.state.access.stop()
+    await app.state.store.close()
+    if app.state.prewarm is not None and not app.state.prewarm.done():
+        app.state.prewarm.cancel()
+        await asyncio.gather(app.state.prewarm, return_exceptions=True)
+    await app.state.llm.aclose()
+    if app.state.capture is not None:
+        await asyncio.to_thread(app.state.capture.stop)
+    await app.state.loop_monitor.stop()
     logger.info("=" * 60)
     logger.info("🛑 Shutting down WhatsApp Bot")
     logger.info("=" * 60)
@@ -36,15 +222,23 @@ app = FastAPI(
     description="Simple WhatsApp bot using Evolution API",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json"
 )
+app.add_middleware(InFlightMiddleware)
+app.add_middleware(FirstRequestMiddleware, report=startup_report)
+app.state.logging = logging_control
+app.state.startup = startup_report
 
 # Include routers
 app.include_router(health.router, tags=["Health"])
 app.include_router(messages.router, tags=["Messages"])
+app.include_router(instances.router, tags=["Instances"])
 app.include_router(webhook.router, tags=["Webhook"])
+app.include_router(metrics.router, tags=["Metrics"])
+app.include_router(logs.router, tags=["Logging"])
 #> app.include_router(debug.router, tags=["Debug"])  # Add debug router
 
 # Root endpoint
@@ -57,7 +251,11 @@ async def root():
         "endpoints": {
             "health": "/health",
             "test_message": "/messages/test",
+            "bulk_send": "/messages/send-bulk",
             "webhook": "/webhook",
+            "instances": "/instances",
+            "metrics": "/metrics",
+            "logging": "/logging",
             "debug": "/debug/config"
         }
     }
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""Starts the bot and the mock upstreams as local processes for load tools."""
+
+import contextlib
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Owner number of the benchmarked bot
+BENCH_PHONE_NUMBER = "+10000000000"
+
+
+def bench_sender_jid(index: int) -> str:
+    """
+    A distinct sender per generated message: one sender's messages share a
+    lane and are answered one batch at a time, which would serialise the run
+    """
+    return f"2{index:010d}@s.whatsapp.net"
+
+
+def allow_all_senders(directory: str) -> str:
+    """Write an access list answering every sender; returns its path"""
+    path = os.path.join(directory, "bench-access.txt")
+    with open(path, "w") as f:
+        f.write("*\n")
+    return path
+
+# Lift the outbound pacing so the benchmark measures the app, not the limiter
+DEFAULT_APP_ENV = {
+    "GROQ_API_KEY": "bench",
+    "EVOLUTION_API_KEY": "bench",
+    "YOUR_PHONE_NUMBER": BENCH_PHONE_NUMBER,
+    "OUTBOUND_GLOBAL_RATE": "100000",
+    "OUTBOUND_GLOBAL_BURST": "100000",
+    "OUTBOUND_RECIPIENT_RATE": "100000",
+    "OUTBOUND_RECIPIENT_BURST": "100000",
+    "GROQ_MAX_RETRIES": "0",
+    # No debounce: a burst wait would dominate the measured reply latency
+    "COALESCE_WINDOW": "0",
+}
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def _spawn(module_app: str, port: int, env: Dict[str, str], log_path: Optional[str]):
+    out = open(log_path, "w") if log_path else subprocess.DEVNULL
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            module_app,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=ROOT,
+        env={**os.environ, **env},
+        stdout=out,
+        stderr=subprocess.STDOUT,
+    )
+
+
+@contextlib.contextmanager
+def local_stack(
+    app_port: int = 18000,
+    mock_port: int = 18080,
+    app_env: Optional[Dict[str, str]] = None,
+    mock_env: Optional[Dict[str, str]] = None,
+    log_dir: Optional[str] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    Run mock upstreams and `app:app` wired to them; yields their base URLs.
+    Both processes are terminated on exit.
+    """
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    env = {
+        **DEFAULT_APP_ENV,
+        "EVOLUTION_API_URL": mock_url,
+        "GROQ_BASE_URL": mock_url,
+        "PORT": str(app_port),
+        **(app_env or {}),
+    }
+    logs = {
+        name: os.path.join(log_dir, f"{name}.log") if log_dir else None for name in ("mock", "app")
+    }
+    processes = []
+    try:
+        processes.append(
+            _spawn("bench.mock_upstreams:app", mock_port, mock_env or {}, logs["mock"])
+        )
+        wait_until_up(f"{mock_url}/instance/fetchInstances")
+        processes.append(_spawn("app:app", app_port, env, logs["app"]))
+        wait_until_up(f"{app_url}/health/live")
+        yield {"app": app_url, "mock": mock_url}
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
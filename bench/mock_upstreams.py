@@ -0,0 +1,208 @@
+"""
+Local stand-ins for the Evolution API and Groq, used by the benchmark and
+replay tools. One app serves both:
+
+    POST /message/sendText/{instance}           Evolution send
+    GET  /instance/connectionState/{instance}   Evolution state
+    GET  /instance/fetchInstances               Evolution instances
+    POST /chat/getBase64FromMediaMessage/{i}    Evolution media download
+    POST /openai/v1/chat/completions            Groq chat (plain and streamed)
+    POST /openai/v1/audio/transcriptions        Groq speech to text
+    GET  /openai/v1/models                      Groq models (start-up pre-warm)
+
+Latency and error injection come from environment variables (or
+POST /_mock/config at runtime):
+
+    MOCK_EVOLUTION_LATENCY_MS  MOCK_LLM_LATENCY_MS  MOCK_JITTER_MS
+    MOCK_ERROR_RATE            MOCK_LLM_REPLY_WORDS MOCK_MEDIA_BYTES
+
+Run with:  uvicorn bench.mock_upstreams:app --port 18080
+"""
+
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Benchmark messages carry a marker so a reply can be matched to its webhook
+MARKER_RE = re.compile(r"bench-[\w-]+")
+
+config: Dict[str, float] = {
+    "evolution_latency_ms": float(os.getenv("MOCK_EVOLUTION_LATENCY_MS", "20")),
+    "llm_latency_ms": float(os.getenv("MOCK_LLM_LATENCY_MS", "300")),
+    "jitter_ms": float(os.getenv("MOCK_JITTER_MS", "10")),
+    "error_rate": float(os.getenv("MOCK_ERROR_RATE", "0")),
+    "llm_reply_words": float(os.getenv("MOCK_LLM_REPLY_WORDS", "40")),
+    "media_bytes": float(os.getenv("MOCK_MEDIA_BYTES", "200000")),
+}
+
+# (received_at wall clock, number, text)
+sends: Deque[Tuple[float, str, str]] = deque(maxlen=1_000_000)
+# marker -> wall clock time of the first send that carried it
+first_send_by_marker: Dict[str, float] = {}
+counters: Dict[str, int] = {
+    "sends": 0,
+    "llm_calls": 0,
+    "media_downloads": 0,
+    "transcriptions": 0,
+    "errors_injected": 0,
+}
+
+app = FastAPI(title="Mock Evolution API + Groq")
+
+
+async def _delay(base_ms: float) -> None:
+    jitter = random.uniform(-config["jitter_ms"], config["jitter_ms"])
+    await asyncio.sleep(max(0.0, base_ms + jitter) / 1000)
+
+
+def _inject_error() -> bool:
+    if config["error_rate"] and random.random() < config["error_rate"]:
+        counters["errors_injected"] += 1
+        return True
+    return False
+
+
+@app.post("/message/sendText/{instance}")
+async def send_text(instance: str, request: Request):
+    body = await request.json()
+    await _delay(config["evolution_latency_ms"])
+    if _inject_error():
+        return JSONResponse(status_code=500, content={"error": "injected failure"})
+    now = time.time()
+    text = body.get("text", "")
+    sends.append((now, body.get("number", ""), text))
+    counters["sends"] += 1
+    for marker in MARKER_RE.findall(text):
+        first_send_by_marker.setdefault(marker, now)
+    return {
+        "key": {"remoteJid": body.get("number"), "fromMe": True, "id": f"MOCK{counters['sends']}"},
+        "status": "PENDING",
+    }
+
+
+@app.get("/instance/connectionState/{instance}")
+async def connection_state(instance: str):
+    await _delay(config["evolution_latency_ms"])
+    return {"instance": {"instanceName": instance, "state": "open"}}
+
+
+@app.get("/instance/fetchInstances")
+async def fetch_instances():
+    return [{"name": "evolution_api", "connectionStatus": "open"}]
+
+
+@app.post("/chat/getBase64FromMediaMessage/{instance}")
+async def media_base64(instance: str):
+    """Random bytes of MOCK_MEDIA_BYTES, base64 in JSON like Evolution, streamed"""
+    counters["media_downloads"] += 1
+    await _delay(config["evolution_latency_ms"])
+    encoded = base64.b64encode(os.urandom(int(config["media_bytes"])))
+
+    async def body():
+        yield b'{"mediaType":"mock","mimetype":"application/octet-stream","base64":"'
+        for i in range(0, len(encoded), 65536):
+            yield encoded[i : i + 65536]
+        yield b'"}'
+
+    return StreamingResponse(body(), media_type="application/json")
+
+
+@app.post("/openai/v1/audio/transcriptions")
+async def transcriptions(request: Request):
+    form = await request.form()
+    upload = form.get("file")
+    size = len(await upload.read()) if upload is not None else 0
+    counters["transcriptions"] += 1
+    await _delay(config["llm_latency_ms"])
+    return {"text": f"mock transcript of {size} bytes"}
+
+
+@app.get("/openai/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+
+def _reply_text(body: Dict[str, Any]) -> str:
+    user_messages = [m["content"] for m in body.get("messages", []) if m.get("role") == "user"]
+    last = user_messages[-1] if user_messages else ""
+    filler = " ".join(["lorem"] * int(config["llm_reply_words"]))
+    return f"<think>planning</think>Reply to {last}. {filler}."
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    counters["llm_calls"] += 1
+    model = body.get("model", "mock")
+    if _inject_error():
+        await _delay(config["llm_latency_ms"] / 10)
+        return JSONResponse(status_code=503, content={"error": {"message": "injected failure"}})
+
+    text = _reply_text(body)
+    words = text.split(" ")
+    prompt_tokens = sum(len(m.get("content", "")) // 4 for m in body.get("messages", []))
+
+    if body.get("stream"):
+        per_word = config["llm_latency_ms"] / 1000 / max(1, len(words))
+
+        async def events():
+            for i, word in enumerate(words):
+                await asyncio.sleep(per_word)
+                delta = word if i == 0 else f" {word}"
+                chunk = {
+                    "id": "mock",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await _delay(config["llm_latency_ms"])
+    return {
+        "id": "mock",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        },
+    }
+
+
+@app.get("/_mock/sends")
+async def mock_sends():
+    """First-send time per benchmark marker plus counters"""
+    return {"counters": counters, "first_send_by_marker": first_send_by_marker}
+
+
+@app.post("/_mock/config")
+async def mock_config(update: Dict[str, float]):
+    config.update({k: float(v) for k, v in update.items() if k in config})
+    return config
+
+
+@app.post("/_mock/reset")
+async def mock_reset():
+    sends.clear()
+    first_send_by_marker.clear()
+    for key in counters:
+        counters[key] = 0
+    return {"status": "reset"}
@@ -0,0 +1,293 @@
+"""
+Replay captured webhooks against the bot and report latency distributions.
+
+Record real traffic with WEBHOOK_CAPTURE_FILE=webhooks.jsonl, then fire it at
+the bot at its original pace, scaled, or as fast as possible:
+
+    python -m bench.replay webhooks.jsonl --speed 1
+    python -m bench.replay webhooks.jsonl --speed 10 --baseline bench/results/replay-last.json
+    python -m bench.replay webhooks.jsonl --speed max --concurrency 200
+
+By default the mock Evolution/Groq upstreams and `app.py` are started locally,
+as in run_bench.py (--llm-latency-ms etc. shape the mocks, --app-env KEY=VALUE
+configures the bot). --app-url replays against a bot that is already running;
+add --mock-url to measure end-to-end reply latency there too.
+
+Each payload goes to the path it arrived on. The instance is rewritten to the
+bot's default instance and a marker is appended to message text, so replies
+can be matched to their webhook (--verbatim sends the payloads unchanged).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from bench.harness import ROOT, local_stack
+from bench.run_bench import end_to_end, git_revision, parse_env
+from bench.stats import compare, summarize_ms
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class ReplayItem:
+    __slots__ = ("offset", "path", "event", "body", "marker")
+
+    def __init__(self, offset: float, path: str, event: str, body: bytes, marker: Optional[str]):
+        self.offset = offset
+        self.path = path
+        self.event = event
+        self.body = body
+        self.marker = marker
+
+
+def load_capture(path: str) -> List[Dict[str, Any]]:
+    """Captured records in arrival order; unreadable lines are skipped"""
+    records = []
+    skipped = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                float(record["ts"])
+                records.append(record)
+            except (ValueError, KeyError, TypeError):
+                skipped += 1
+    if skipped:
+        print(f"Skipped {skipped} unreadable line(s) in {path}")
+    records.sort(key=lambda record: record["ts"])
+    return records
+
+
+def _add_marker(body: Dict[str, Any], marker: str) -> bool:
+    message = (body.get("data") or {}).get("message") or {}
+    if message.get("conversation"):
+        message["conversation"] += f" {marker}"
+        return True
+    extended = message.get("extendedTextMessage") or {}
+    if extended.get("text"):
+        extended["text"] += f" {marker}"
+        return True
+    return False
+
+
+def prepare(
+    records: List[Dict[str, Any]], run_id: str, instance: str, verbatim: bool
+) -> List[ReplayItem]:
+    """Request bodies serialised up front so the send loop only sends"""
+    items = []
+    start = records[0]["ts"] if records else 0.0
+    for index, record in enumerate(records):
+        body = record.get("body")
+        event = record.get("event") or "unknown"
+        marker = None
+        if body is None:
+            # Acknowledged unread when captured; the event name is all there is
+            body = {"event": event, "instance": instance, "data": {}}
+        elif isinstance(body, dict) and not verbatim:
+            if "instance" in body:
+                body["instance"] = instance
+            candidate = f"bench-{run_id}-r{index}"
+            if _add_marker(body, candidate):
+                marker = candidate
+        raw = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        items.append(
+            ReplayItem(record["ts"] - start, record.get("path") or "/webhook/", event, raw, marker)
+        )
+    return items
+
+
+async def fire(
+    client: httpx.AsyncClient,
+    app_url: str,
+    items: List[ReplayItem],
+    speed: Optional[float],
+    concurrency: int,
+) -> Dict[str, Any]:
+    """
+    Send every item at offset / speed from the start (all at once when speed
+    is None), with at most `concurrency` requests in flight. Start lag is how
+    late a request went out versus its schedule: when it grows, the bot (or
+    this client) is not keeping up with the replayed rate.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    by_event: Dict[str, List[float]] = {}
+    start_lag: List[float] = []
+    sent_at: Dict[int, float] = {}
+    status_counts: Dict[str, int] = {}
+    errors = 0
+    started = time.perf_counter()
+
+    async def send(index: int, item: ReplayItem, due: float) -> None:
+        nonlocal errors
+        async with semaphore:
+            request_started = time.perf_counter()
+            start_lag.append(max(0.0, request_started - due))
+            sent_at[index] = time.time()
+            try:
+                response = await client.post(
+                    f"{app_url}{item.path}", content=item.body, headers=JSON_HEADERS
+                )
+                key = str(response.status_code)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+                errors += 1
+            elapsed = time.perf_counter() - request_started
+            latencies.append(elapsed)
+            by_event.setdefault(item.event, []).append(elapsed)
+            status_counts[key] = status_counts.get(key, 0) + 1
+
+    tasks = []
+    for index, item in enumerate(items):
+        due = started + (item.offset / speed if speed else 0.0)
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(index, item, due)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(items),
+        "errors": errors,
+        "status_codes": status_counts,
+        "capture_seconds": round(items[-1].offset, 3) if items else 0.0,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(items) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize_ms(latencies),
+        "latency_ms_by_event": {event: summarize_ms(values) for event, values in by_event.items()},
+        "start_lag_ms": summarize_ms(start_lag),
+        "_sent_at": sent_at,
+    }
+
+
+async def replay(
+    args: argparse.Namespace, items: List[ReplayItem], app_url: str, mock_url: Optional[str]
+) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        if mock_url:
+            await client.post(f"{mock_url}/_mock/reset")
+        await client.get(f"{app_url}/health/loop", params={"reset": True})
+
+        results = await fire(client, app_url, items, args.speed, args.concurrency)
+        sent_at = results.pop("_sent_at")
+        markers = {index: item.marker for index, item in enumerate(items) if item.marker}
+        if mock_url and markers:
+            # Coalesced bursts answer several markers with one reply; each counts
+            results["end_to_end"] = await end_to_end(
+                client, mock_url, markers, sent_at, args.settle_timeout
+            )
+
+        results["event_loop_lag"] = (await client.get(f"{app_url}/health/loop")).json()
+        if mock_url:
+            results["upstream"] = (await client.get(f"{mock_url}/_mock/sends")).json()["counters"]
+    return results
+
+
+def parse_speed(value: str) -> Optional[float]:
+    """"max" (no pacing) or a positive multiple of the captured pace"""
+    if value.lower() in ("max", "0", "inf"):
+        return None
+    speed = float(value.lower().rstrip("x"))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("capture", help="JSONL file written by WEBHOOK_CAPTURE_FILE")
+    parser.add_argument(
+        "--speed", type=parse_speed, default=1.0, help="1, 10, ... times the captured pace, or max"
+    )
+    parser.add_argument("--concurrency", type=int, default=100, help="max requests in flight")
+    parser.add_argument("--limit", type=int, help="replay only the first N webhooks")
+    parser.add_argument("--instance", default="evolution_api", help="instance to rewrite to")
+    parser.add_argument("--verbatim", action="store_true", help="send payloads unchanged")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--settle-timeout", type=float, default=60.0, help="max wait for replies after the replay"
+    )
+    parser.add_argument("--app-url", help="replay against this running bot instead")
+    parser.add_argument("--mock-url", help="mock upstreams used by --app-url, for reply latency")
+    parser.add_argument("--evolution-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--app-port", type=int, default=18000)
+    parser.add_argument("--mock-port", type=int, default=18080)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument("--output", help="result JSON path (default bench/results/replay-<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture)[: args.limit]
+    if not records:
+        parser.error(f"no webhooks in {args.capture}")
+    run_id = uuid.uuid4().hex[:8]
+    items = prepare(records, run_id, args.instance, args.verbatim)
+
+    results_dir = os.path.join(ROOT, "bench", "results")
+    os.makedirs(results_dir, exist_ok=True)
+    mock_env = {
+        "MOCK_EVOLUTION_LATENCY_MS": str(args.evolution_latency_ms),
+        "MOCK_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "MOCK_JITTER_MS": str(args.jitter_ms),
+        "MOCK_ERROR_RATE": str(args.error_rate),
+    }
+    app_env = parse_env(args.app_env)
+
+    if args.app_url:
+        results = asyncio.run(replay(args, items, args.app_url.rstrip("/"), args.mock_url))
+    else:
+        # Captured senders are real users: answer all of them, as production did
+        access_file = os.path.join(results_dir, "replay-access.txt")
+        with open(access_file, "w") as f:
+            f.write("*\n")
+        env = {"ACCESS_LIST_FILE": access_file, "INSTANCE_NAME": args.instance, **app_env}
+        with local_stack(args.app_port, args.mock_port, env, mock_env, log_dir=results_dir) as urls:
+            results = asyncio.run(replay(args, items, urls["app"], urls["mock"]))
+
+    document = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "capture": os.path.abspath(args.capture),
+            "webhooks": len(items),
+            "speed": args.speed or "max",
+            "concurrency": args.concurrency,
+            "app_url": args.app_url,
+            "mock": None if args.app_url else mock_env,
+            "app_env": app_env,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        results_dir, f"replay-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"\nSaved results to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline}:")
+        for line in compare(baseline["results"], results):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
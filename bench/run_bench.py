@@ -0,0 +1,250 @@
+"""
+Load and latency benchmark for the bot.
+
+Starts the mock Evolution/Groq upstreams and `app.py` as local processes,
+drives /webhook/messages-upsert and /messages/send at a fixed concurrency,
+and reports throughput, request latency, end-to-end reply latency (webhook
+accepted -> reply reaching the mock Evolution) and event-loop lag.
+
+    python -m bench.run_bench --requests 2000 --concurrency 100 \\
+        --llm-latency-ms 400 --error-rate 0.01 --baseline bench/results/last.json
+
+Extra bot settings can be passed with --app-env KEY=VALUE (repeatable).
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+from bench.harness import ROOT, allow_all_senders, bench_sender_jid, local_stack
+from bench.stats import compare, summarize_ms
+
+
+def webhook_payload(marker: str, index: int) -> Dict[str, Any]:
+    return {
+        "event": "messages.upsert",
+        "instance": "evolution_api",
+        "data": {
+            "key": {"remoteJid": bench_sender_jid(index), "fromMe": False, "id": f"BENCH{marker}"},
+            "pushName": "Bench",
+            "message": {"conversation": f"question {index} {marker}"},
+            "messageType": "conversation",
+        },
+    }
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    make_request: Callable[[int], Any],
+    total: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Fire `total` requests with `concurrency` in flight; collect latencies"""
+    counter = itertools.count()
+    latencies: List[float] = []
+    sent_at: Dict[int, float] = {}
+    status_counts: Dict[str, int] = {}
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while True:
+            index = next(counter)
+            if index >= total:
+                return
+            started = time.perf_counter()
+            sent_at[index] = time.time()
+            try:
+                response = await make_request(index)
+                key = str(response.status_code)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError as e:
+                key = type(e).__name__
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+            status_counts[key] = status_counts.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "status_codes": status_counts,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize_ms(latencies),
+        "_sent_at": sent_at,
+    }
+
+
+async def end_to_end(
+    client: httpx.AsyncClient,
+    mock_url: str,
+    markers: Dict[int, str],
+    sent_at: Dict[int, float],
+    settle_timeout: float,
+) -> Dict[str, Any]:
+    """Wait for replies to reach the mock Evolution and measure delivery latency"""
+    deadline = time.monotonic() + settle_timeout
+    delivered: Dict[str, float] = {}
+    while time.monotonic() < deadline:
+        delivered = (await client.get(f"{mock_url}/_mock/sends")).json()["first_send_by_marker"]
+        if all(marker in delivered for marker in markers.values()):
+            break
+        await asyncio.sleep(0.5)
+    durations = [
+        delivered[marker] - sent_at[index]
+        for index, marker in markers.items()
+        if marker in delivered and index in sent_at
+    ]
+    return {
+        "delivered": len(durations),
+        "missing": len(markers) - len(durations),
+        "latency_ms": summarize_ms(durations),
+    }
+
+
+async def run_scenarios(args: argparse.Namespace, urls: Dict[str, str]) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex[:8]
+    results: Dict[str, Any] = {}
+    limits = httpx.Limits(
+        max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+    )
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await client.post(f"{urls['mock']}/_mock/reset")
+        await client.get(f"{urls['app']}/health/loop", params={"reset": True})
+
+        if args.scenario in ("webhook", "all"):
+            markers = {i: f"bench-{run_id}-w{i}" for i in range(args.requests)}
+            result = await drive(
+                client,
+                lambda i: client.post(
+                    f"{urls['app']}/webhook/messages-upsert",
+                    json=webhook_payload(markers[i], i),
+                ),
+                args.requests,
+                args.concurrency,
+            )
+            sent_at = result.pop("_sent_at")
+            result["end_to_end"] = await end_to_end(
+                client, urls["mock"], markers, sent_at, args.settle_timeout
+            )
+            results["webhook"] = result
+
+        if args.scenario in ("send", "all"):
+            result = await drive(
+                client,
+                lambda i: client.post(
+                    f"{urls['app']}/messages/send",
+                    params={"number": f"+1555{i:07d}", "message": f"bench-{run_id}-s{i}"},
+                ),
+                args.requests,
+                args.concurrency,
+            )
+            result.pop("_sent_at")
+            results["send"] = result
+
+        results["event_loop_lag"] = (await client.get(f"{urls['app']}/health/loop")).json()
+        results["upstream"] = (await client.get(f"{urls['mock']}/_mock/sends")).json()["counters"]
+    return results
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_env(pairs: List[str]) -> Dict[str, str]:
+    env = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        env[key] = value
+    return env
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--scenario", choices=["webhook", "send", "all"], default="all")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument(
+        "--settle-timeout", type=float, default=60.0, help="max wait for webhook replies"
+    )
+    parser.add_argument("--evolution-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--app-port", type=int, default=18000)
+    parser.add_argument("--mock-port", type=int, default=18080)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE")
+    parser.add_argument(
+        "--output", help="result JSON path (default bench/results/<timestamp>.json)"
+    )
+    parser.add_argument("--baseline", help="earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    mock_env = {
+        "MOCK_EVOLUTION_LATENCY_MS": str(args.evolution_latency_ms),
+        "MOCK_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "MOCK_JITTER_MS": str(args.jitter_ms),
+        "MOCK_ERROR_RATE": str(args.error_rate),
+    }
+    app_env = parse_env(args.app_env)
+    results_dir = os.path.join(ROOT, "bench", "results")
+    os.makedirs(results_dir, exist_ok=True)
+
+    env = {"ACCESS_LIST_FILE": allow_all_senders(results_dir), **app_env}
+    with local_stack(args.app_port, args.mock_port, env, mock_env, log_dir=results_dir) as urls:
+        results = asyncio.run(run_scenarios(args, urls))
+
+    document = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_revision": git_revision(),
+            "scenario": args.scenario,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mock": mock_env,
+            "app_env": app_env,
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(results_dir, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(document, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"\nSaved results to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline}:")
+        for line in compare(baseline["results"], results):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Latency summary helpers shared by the benchmark and replay tools."""
+
+import math
+from typing import Dict, List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (p in 0..100)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_ms(seconds: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of durations given in seconds, reported in ms"""
+    if not seconds:
+        return {"count": 0}
+    values = sorted(seconds)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values) * 1000, 3),
+        "p50": round(percentile(values, 50) * 1000, 3),
+        "p95": round(percentile(values, 95) * 1000, 3),
+        "p99": round(percentile(values, 99) * 1000, 3),
+        "max": round(values[-1] * 1000, 3),
+    }
+
+
+def compare(baseline: Dict, current: Dict, path: str = "") -> List[str]:
+    """
+    Human-readable deltas between two result documents, walking matching
+    numeric fields (latency percentiles, throughput, ...).
+    """
+    lines: List[str] = []
+    for key, value in current.items():
+        if key not in baseline:
+            continue
+        name = f"{path}.{key}" if path else key
+        old = baseline[key]
+        if isinstance(value, dict) and isinstance(old, dict):
+            lines.extend(compare(old, value, name))
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            change = (value - old) / old * 100
+            lines.append(f"{name}: {old} -> {value} ({change:+.1f}%)")
+    return lines
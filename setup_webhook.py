@@ -32,6 +32,7 @@ def setup_webhook():
     payload = {
         "url": webhook_url,
         "webhook_by_events": True,
+        # Media stays out of the webhook body; the bot fetches it by message id
         "webhook_base64": False,
         "events": [
             "APPLICATION_STARTUP",
@@ -0,0 +1,227 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+USER = "user"
+GROUP = "group"
+LID = "lid"
+OTHER = "other"
+
+# JID server -> kind; c.us is the legacy spelling of s.whatsapp.net
+_SERVERS = {
+    "s.whatsapp.net": USER,
+    "c.us": USER,
+    "g.us": GROUP,
+    "lid": LID,
+}
+
+_STRIP = str.maketrans("", "", "+ -()")
+
+
+def parse_jid(jid: str) -> Tuple[str, str]:
+    """
+    (kind, key) for a JID or bare phone number. Users are keyed by their
+    digits ("+962 7874-99976", "962787499976:3@s.whatsapp.net" and
+    "962787499976@c.us" are all "962787499976"); groups and LIDs keep
+    their server ("1203...@g.us", "2154...@lid") since their ids are not
+    phone numbers.
+    """
+    user, _, server = jid.strip().partition("@")
+    # Drop the device suffix of multi-device JIDs (number:device@server)
+    user = user.split(":", 1)[0].translate(_STRIP)
+    kind = _SERVERS.get(server.lower(), OTHER) if server else USER
+    if kind in (USER, OTHER):
+        return kind, user
+    return kind, f"{user}@{server.lower()}"
+
+
+# Per-message lookups: a repeat sender costs one dict hit instead of parsing
+normalize_jid = functools.lru_cache(maxsize=65536)(parse_jid)
+
+
+class _PrefixTrie:
+    """Digit trie of number prefixes (country or area codes)"""
+
+    __slots__ = ("_root", "size")
+
+    _END = "$"
+
+    def __init__(self):
+        self._root: Dict[str, dict] = {}
+        self.size = 0
+
+    def add(self, prefix: str) -> None:
+        node = self._root
+        for digit in prefix:
+            node = node.setdefault(digit, {})
+        if self._END not in node:
+            node[self._END] = {}
+            self.size += 1
+
+    def matches(self, number: str) -> bool:
+        """True if any stored prefix starts `number`; at most len(number) steps"""
+        node = self._root
+        for digit in number:
+            node = node.get(digit)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+
+
+class AccessList:
+    """
+    Immutable index of allowed senders. Entries, one per line:
+
+        962787499976        one number (any formatting, or a full JID)
+        962*                every number starting with 962 (trie)
+        120363...@g.us      a group: the bot may answer inside it
+        215400...@lid       a sender known only by its LID
+        *                   everyone
+
+    Exact entries live in a set (O(1)); prefix rules in a trie, walked in
+    at most the length of the number, so the cost per message does not
+    grow with the size of the list.
+    """
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self._exact: set = set()
+        self._prefixes = _PrefixTrie()
+        self.allow_all = False
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: str) -> None:
+        entry = entry.split("#", 1)[0].strip()
+        if not entry:
+            return
+        if entry == "*":
+            self.allow_all = True
+        elif entry.endswith("*"):
+            _, prefix = parse_jid(entry[:-1])
+            if prefix.isdigit():
+                self._prefixes.add(prefix)
+            else:
+                raise ValueError(f"Prefix rules need digits: {entry!r}")
+        else:
+            self._exact.add(parse_jid(entry)[1])
+
+    @classmethod
+    def from_file(cls, path: str) -> "AccessList":
+        with open(path, encoding="utf-8") as f:
+            return cls(f)
+
+    def allows(self, kind: str, key: str) -> bool:
+        if self.allow_all or key in self._exact:
+            return True
+        # Prefix rules describe phone numbers; groups and LIDs must be listed
+        return kind == USER and self._prefixes.matches(key)
+
+    def __len__(self) -> int:
+        return len(self._exact) + self._prefixes.size
+
+
+class AccessControl:
+    """
+    Decides whether the bot answers a sender: the instance owner always,
+    plus everyone allowed by the access list in ACCESS_LIST_FILE. The file
+    is polled for changes and re-indexed off the event loop; lookups keep
+    using the previous index until the new one is complete.
+    """
+
+    def __init__(self, path: Optional[str] = None, *, reload_interval: float = 10.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.access_list = AccessList()
+        self.loaded_at: Optional[float] = None
+        self._mtime: Optional[float] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        self.allowed = 0
+        self.denied = 0
+
+    async def start(self) -> None:
+        if not self.path:
+            return
+        await self.reload()
+        if self.reload_interval > 0:
+            self._watcher = asyncio.create_task(self._watch(), name="access-list")
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                await self.reload()
+
+    async def reload(self) -> Dict[str, Any]:
+        """
+        Re-read the access list file. An unreadable or invalid file keeps
+        the current list.
+        """
+        if not self.path:
+            return {"loaded": False, "entries": 0}
+        async with self._lock:
+            try:
+                self._mtime = os.stat(self.path).st_mtime
+                access_list = await asyncio.to_thread(AccessList.from_file, self.path)
+            except (OSError, ValueError) as e:
+                logger.error(f"❌ Could not load access list {self.path}: {e}")
+                return {"loaded": False, "entries": len(self.access_list)}
+            self.access_list = access_list
+            self.loaded_at = time.time()
+            logger.info(f"🔐 Access list loaded: {len(access_list)} entries")
+            return {"loaded": True, "entries": len(access_list)}
+
+    def _allows(self, kind: str, key: str, owner: Optional[str]) -> bool:
+        if kind == OTHER:
+            # status@broadcast, newsletters: never answered
+            return False
+        if owner and kind == USER and key == normalize_jid(owner)[1]:
+            return True
+        return self.access_list.allows(kind, key)
+
+    def allows(
+        self, jid: str, owner: Optional[str] = None, alt_jid: Optional[str] = None
+    ) -> bool:
+        """
+        Whether to answer a message in chat `jid`. `alt_jid` is the phone
+        JID Evolution sends alongside a LID (remoteJidAlt / senderPn): a LID
+        chat is matched by its LID entry first, then by its number.
+        """
+        kind, key = normalize_jid(jid)
+        allowed = self._allows(kind, key, owner)
+        if not allowed and kind == LID and alt_jid:
+            allowed = self._allows(*normalize_jid(alt_jid), owner)
+        if allowed:
+            self.allowed += 1
+        else:
+            self.denied += 1
+        return allowed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "entries": len(self.access_list),
+            "allow_all": self.access_list.allow_all,
+            "loaded_at": self.loaded_at,
+            "allowed": self.allowed,
+            "denied": self.denied,
+            "normalize_cache": normalize_jid.cache_info()._asdict(),
+        }
@@ -0,0 +1,602 @@
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import httpx
+
+from src.resilience import CircuitOpenError
+from src.scheduler import PRIORITY_BULK, OutboundQueueFull, OutboundStopped
+from src.utils import clean_phone_number, send_whatsapp_message
+
+if TYPE_CHECKING:
+    from src.instances import Instance, InstanceRegistry
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS broadcast_jobs (
+    id TEXT PRIMARY KEY,
+    instance TEXT NOT NULL,
+    message TEXT,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS broadcast_recipients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    number TEXT NOT NULL,
+    text TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    updated_at REAL,
+    UNIQUE (job_id, number)
+);
+CREATE INDEX IF NOT EXISTS broadcast_recipients_status
+    ON broadcast_recipients (job_id, status, id);
+"""
+
+# Column names accepted in a CSV header
+_NUMBER_COLUMNS = {"number", "phone", "recipient", "jid"}
+_MESSAGE_COLUMNS = {"message", "text"}
+
+# (number, per-recipient text or None for the job's message)
+Recipient = Tuple[str, Optional[str]]
+
+
+class BroadcastInterrupted(Exception):
+    """A job cannot send for now; its pending recipients wait for resume()"""
+
+
+def _recipient(number: Any, text: Any = None) -> Optional[Recipient]:
+    number = clean_phone_number(str(number or "").strip())
+    if not number:
+        return None
+    return number, (str(text) if text else None)
+
+
+def parse_csv(lines: Iterable[str]) -> Iterator[Recipient]:
+    """
+    Rows of `number[,message]`. A header row naming a number column
+    (number/phone/recipient/jid) and optionally message/text is honoured.
+    """
+    reader = csv.reader(lines)
+    number_col, message_col = 0, 1
+    for index, row in enumerate(reader):
+        if not row:
+            continue
+        if index == 0:
+            names = [cell.strip().lower() for cell in row]
+            if _NUMBER_COLUMNS & set(names):
+                number_col = next(
+                    i for i, n in enumerate(names) if n in _NUMBER_COLUMNS
+                )
+                message_col = next(
+                    (i for i, n in enumerate(names) if n in _MESSAGE_COLUMNS), None
+                )
+                continue
+        text = (
+            row[message_col]
+            if message_col is not None and message_col < len(row)
+            else None
+        )
+        recipient = _recipient(row[number_col] if number_col < len(row) else "", text)
+        if recipient:
+            yield recipient
+
+
+def parse_jsonl(lines: Iterable[str]) -> Iterator[Recipient]:
+    """One recipient per line: a JSON string or {"number": ..., "message": ...}"""
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_no}: invalid JSON ({e.msg})") from None
+        if isinstance(item, dict):
+            recipient = _recipient(
+                item.get("number"), item.get("message") or item.get("text")
+            )
+        else:
+            recipient = _recipient(item)
+        if recipient:
+            yield recipient
+
+
+def parse_upload(
+    file: IO[bytes], filename: str = "", content_type: str = ""
+) -> Iterator[Recipient]:
+    """Recipients from an uploaded CSV or JSONL file, read line by line"""
+    lines = codecs.iterdecode(file, "utf-8-sig")
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")) or "json" in (content_type or ""):
+        return parse_jsonl(lines)
+    return parse_csv(lines)
+
+
+class _Job:
+    __slots__ = ("id", "instance", "message", "task", "subscribers", "sent", "failed")
+
+    def __init__(self, job_id: str, instance: str, message: Optional[str]):
+        self.id = job_id
+        self.instance = instance
+        self.message = message
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers: List[asyncio.Queue] = []
+        self.sent = 0
+        self.failed = 0
+
+
+class BroadcastManager:
+    """
+    Bulk sends ("broadcasts") persisted in SQLite. Recipients are stored
+    with the job before any message goes out; a runner task fans them out
+    through the instance's outbound scheduler (so the usual rate limits
+    apply) with at most `concurrency` sends in flight, and records each
+    result. Back-pressure (a full queue, Evolution's circuit open) is waited
+    out for up to `max_wait` seconds per send; after that, or when the
+    instance is removed, the job is interrupted. A job that was interrupted
+    (restart, crash) is resumed by its id and only sends to recipients that
+    have no result yet.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        concurrency: int = 50,
+        max_recipients: int = 100_000,
+        page_size: int = 500,
+        flush_interval: float = 0.5,
+        flush_batch: int = 200,
+        queue_full_wait: float = 1.0,
+        max_wait: float = 300.0,
+    ):
+        self.path = path
+        self.concurrency = concurrency
+        self.max_recipients = max_recipients
+        self.page_size = page_size
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.queue_full_wait = queue_full_wait
+        self.max_wait = max_wait
+
+        self.instances: Optional["InstanceRegistry"] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_now = asyncio.Event()
+        # (status, error, updated_at, recipient id) not yet written
+        self._results: List[Tuple[str, Optional[str], float, int]] = []
+        self._jobs: Dict[str, _Job] = {}
+
+    def _run(self, func, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self) -> None:
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="broadcast-sqlite")
+        await self._run(self._open)
+
+    def _open(self) -> None:
+        conn = sqlite3.connect(
+            self.path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+
+    def start(self, instances: "InstanceRegistry") -> None:
+        self.instances = instances
+        self._flusher = asyncio.create_task(
+            self._flush_loop(), name="broadcast-flusher"
+        )
+
+    async def stop(self) -> None:
+        """Cancel running jobs and record the results so far; resume them later"""
+        jobs = [job.task for job in self._jobs.values() if job.task is not None]
+        for task in jobs:
+            task.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+    async def close(self) -> None:
+        if self._executor is None:
+            return
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    # Jobs
+
+    async def create(
+        self, instance: str, message: Optional[str], recipients: Iterable[Recipient]
+    ) -> Tuple[str, int]:
+        """
+        Store a job and its recipients (duplicates are dropped) in one
+        transaction; returns (job id, recipient count). `recipients` is
+        consumed in the database thread, so it may read a file lazily.
+        Raises ValueError for bad input or a recipient with no text.
+        """
+        job_id = uuid.uuid4().hex
+        total = await self._run(self._create, job_id, instance, message, recipients)
+        logger.info(
+            f"📣 Broadcast {job_id} created for {total} recipients on {instance}"
+        )
+        return job_id, total
+
+    def _create(
+        self,
+        job_id: str,
+        instance: str,
+        message: Optional[str],
+        recipients: Iterable[Recipient],
+    ) -> int:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO broadcast_jobs (id, instance, message, total, created_at) "
+                "VALUES (?, ?, ?, 0, ?)",
+                (job_id, instance, message, time.time()),
+            )
+            chunk: List[Tuple[str, str, Optional[str], str]] = []
+            count = 0
+            for number, text in recipients:
+                recipient = _recipient(number, text)
+                if recipient is None:
+                    continue
+                number, text = recipient
+                count += 1
+                if count > self.max_recipients:
+                    raise ValueError(f"More than {self.max_recipients} recipients")
+                if not (text or message):
+                    raise ValueError(f"No message for recipient {number}")
+                chunk.append((job_id, number, text, PENDING))
+                if len(chunk) >= 1000:
+                    self._insert_recipients(chunk)
+                    chunk = []
+            self._insert_recipients(chunk)
+            total = conn.execute(
+                "SELECT COUNT(*) FROM broadcast_recipients WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            if not total:
+                raise ValueError("No recipients")
+            conn.execute(
+                "UPDATE broadcast_jobs SET total = ? WHERE id = ?", (total, job_id)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return total
+
+    def _insert_recipients(
+        self, chunk: List[Tuple[str, str, Optional[str], str]]
+    ) -> None:
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO broadcast_recipients (job_id, number, text, status) "
+            "VALUES (?, ?, ?, ?)",
+            chunk,
+        )
+
+    async def resume(self, job_id: str, retry_failed: bool = False) -> bool:
+        """
+        Start (or restart) sending a job to its remaining recipients; with
+        `retry_failed` failed sends are tried again. False for an unknown job.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            row = await self._run(self._job_row, job_id)
+            if row is None:
+                return False
+            job = self._jobs[job_id] = _Job(job_id, row[0], row[1])
+        if job.task is not None and not job.task.done():
+            return True
+        if retry_failed:
+            await self.flush()
+            await self._run(self._reset_failed, job_id)
+        job.sent = job.failed = 0
+        job.task = asyncio.create_task(self._run_job(job), name=f"broadcast-{job_id}")
+        return True
+
+    def _job_row(self, job_id: str) -> Optional[Tuple[str, Optional[str]]]:
+        return self._conn.execute(
+            "SELECT instance, message FROM broadcast_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+
+    def _reset_failed(self, job_id: str) -> None:
+        self._conn.execute(
+            "UPDATE broadcast_recipients SET status = ?, error = NULL "
+            "WHERE job_id = ? AND status = ?",
+            (PENDING, job_id, FAILED),
+        )
+
+    def _pending_page(
+        self, job_id: str, after: int, limit: int
+    ) -> List[Tuple[int, str, Optional[str]]]:
+        return self._conn.execute(
+            "SELECT id, number, text FROM broadcast_recipients "
+            "WHERE job_id = ? AND status = ? AND id > ? ORDER BY id LIMIT ?",
+            (job_id, PENDING, after, limit),
+        ).fetchall()
+
+    def _instance(self, name: str) -> "Instance":
+        """The job's instance as currently registered (reloads replace it)"""
+        instance = self.instances.get(name) if self.instances else None
+        if instance is None:
+            raise BroadcastInterrupted(f"Unknown instance {name!r}")
+        return instance
+
+    async def _run_job(self, job: _Job) -> None:
+        try:
+            self._instance(job.instance)
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+            workers = [
+                asyncio.create_task(self._worker(job, queue))
+                for _ in range(self.concurrency)
+            ]
+            # A worker that raises ends the job; the feeder must not block on it
+            tasks = [asyncio.create_task(self._feed(job, queue, len(workers)))]
+            tasks += workers
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await self.flush()
+            logger.info(
+                f"📣 Broadcast {job.id} finished: {job.sent} sent, {job.failed} failed"
+            )
+            summary = await self.status(job.id)
+            summary["status"] = "interrupted" if summary["pending"] else "completed"
+            self._publish(job, {"job_id": job.id, "done": True, **summary})
+        except asyncio.CancelledError:
+            self._publish(job, {"job_id": job.id, "done": False, "interrupted": True})
+            raise
+        except BroadcastInterrupted as e:
+            await self.flush()
+            logger.warning(f"⏸️  Broadcast {job.id} interrupted: {e}")
+            self._publish(
+                job,
+                {"job_id": job.id, "done": False, "interrupted": True, "error": str(e)},
+            )
+        except Exception as e:
+            logger.error(f"❌ Broadcast {job.id} stopped: {e}")
+            self._publish(job, {"job_id": job.id, "done": False, "error": str(e)})
+        finally:
+            for queue in job.subscribers:
+                queue.put_nowait(None)
+            # Finished jobs live on in SQLite only; resume() reloads them
+            if self._jobs.get(job.id) is job:
+                del self._jobs[job.id]
+
+    async def _feed(self, job: _Job, queue: asyncio.Queue, workers: int) -> None:
+        # Page through the recipients instead of loading the whole list
+        after = 0
+        while True:
+            page = await self._run(self._pending_page, job.id, after, self.page_size)
+            if not page:
+                break
+            for row in page:
+                await queue.put(row)
+            after = page[-1][0]
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def _worker(self, job: _Job, queue: asyncio.Queue) -> None:
+        while True:
+            row = await queue.get()
+            if row is None:
+                return
+            row_id, number, text = row
+            result = await self._send(job, number, text or job.message)
+            if result["status"] == SENT:
+                job.sent += 1
+            else:
+                job.failed += 1
+            self._results.append(
+                (result["status"], result.get("error"), time.time(), row_id)
+            )
+            if len(self._results) >= self.flush_batch:
+                self._flush_now.set()
+            self._publish(job, result)
+
+    async def _send(self, job: _Job, number: str, text: str) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            instance = self._instance(job.instance)
+            try:
+                response = await send_whatsapp_message(
+                    instance.outbound, number, text, priority=PRIORITY_BULK
+                )
+            except OutboundStopped:
+                # Retired by an instances reload (or shutting down); a
+                # replacement is picked up on the next attempt
+                if self._instance(job.instance) is instance:
+                    raise BroadcastInterrupted(
+                        f"Instance {job.instance!r} stopped sending"
+                    ) from None
+                continue
+            except (OutboundQueueFull, CircuitOpenError) as e:
+                # Back-pressure from the scheduler, or Evolution failing for
+                # everyone: wait for it instead of failing every recipient
+                if time.monotonic() >= deadline:
+                    raise BroadcastInterrupted(
+                        f"Gave up after waiting {self.max_wait:.0f}s: {e}"
+                    ) from None
+                await asyncio.sleep(self.queue_full_wait)
+                continue
+            except httpx.HTTPStatusError as e:
+                return {
+                    "number": number,
+                    "status": FAILED,
+                    "error": f"HTTP {e.response.status_code}",
+                }
+            except httpx.HTTPError as e:
+                return {
+                    "number": number,
+                    "status": FAILED,
+                    "error": f"{type(e).__name__}: {e}",
+                }
+            except Exception as e:
+                # e.g. an unparseable response; fail this recipient, not the job
+                logger.exception(f"❌ Unexpected error sending broadcast to {number}")
+                return {
+                    "number": number,
+                    "status": FAILED,
+                    "error": f"{type(e).__name__}: {e}",
+                }
+            key = response.get("key") if isinstance(response, dict) else None
+            return {
+                "number": number,
+                "status": SENT,
+                "message_id": key.get("id") if isinstance(key, dict) else None,
+            }
+
+    def _publish(self, job: _Job, event: Dict[str, Any]) -> None:
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+
+    def follow(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Results of a job as they come in, ending with a summary. Subscribes
+        right away, so call it before the job can make progress; a client
+        going away does not stop the job.
+        """
+        job = self._jobs.get(job_id) or _Job(job_id, "", None)
+        queue: asyncio.Queue = asyncio.Queue()
+        job.subscribers.append(queue)
+        if job.task is None or job.task.done():
+            queue.put_nowait(None)
+        return self._events(job, queue)
+
+    async def _events(
+        self, job: _Job, queue: asyncio.Queue
+    ) -> AsyncIterator[Dict[str, Any]]:
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            job.subscribers.remove(queue)
+
+    # Results
+
+    async def flush(self) -> None:
+        """Write buffered per-recipient results in one transaction"""
+        if not self._results:
+            return
+        batch, self._results = self._results, []
+        try:
+            await self._run(self._write_results, batch)
+        except sqlite3.Error as e:
+            logger.error(f"❌ Broadcast flush of {len(batch)} results failed: {e}")
+            self._results[:0] = batch
+
+    def _write_results(
+        self, batch: List[Tuple[str, Optional[str], float, int]]
+    ) -> None:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "UPDATE broadcast_recipients SET status = ?, error = ?, updated_at = ? "
+                "WHERE id = ?",
+                batch,
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_now.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Recipient counts by status; None for an unknown job"""
+        await self.flush()
+        row = await self._run(self._status, job_id)
+        if row is None:
+            return None
+        job = self._jobs.get(job_id)
+        running = job is not None and job.task is not None and not job.task.done()
+        if running:
+            state = "running"
+        elif row["pending"]:
+            state = "interrupted" if row["sent"] or row["failed"] else "created"
+        else:
+            state = "completed"
+        return {"status": state, **row}
+
+    def _status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._conn.execute(
+            "SELECT instance, total, created_at FROM broadcast_jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if job is None:
+            return None
+        counts = dict(
+            self._conn.execute(
+                "SELECT status, COUNT(*) FROM broadcast_recipients "
+                "WHERE job_id = ? GROUP BY status",
+                (job_id,),
+            ).fetchall()
+        )
+        return {
+            "instance": job[0],
+            "total": job[1],
+            "created_at": job[2],
+            "sent": counts.get(SENT, 0),
+            "failed": counts.get(FAILED, 0),
+            "pending": counts.get(PENDING, 0),
+        }
+
+    async def failures(self, job_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self._run(self._failures, job_id, limit)
+
+    def _failures(self, job_id: str, limit: int) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT number, error, updated_at FROM broadcast_recipients "
+            "WHERE job_id = ? AND status = ? ORDER BY id LIMIT ?",
+            (job_id, FAILED, limit),
+        ).fetchall()
+        return [{"number": n, "error": e, "updated_at": t} for n, e, t in rows]
@@ -0,0 +1,144 @@
+import logging
+import os
+import queue
+import threading
+import time
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+import pydantic_core
+
+logger = logging.getLogger(__name__)
+
+# (received at, request path, event name, raw body or None)
+_Record = Tuple[float, str, Optional[str], Optional[bytes]]
+
+
+def _line(record: _Record) -> bytes:
+    """One JSONL line; the raw body is embedded as-is when it is valid JSON"""
+    received_at, path, event, body = record
+    head = pydantic_core.to_json({"ts": received_at, "path": path, "event": event})
+    if body is None:
+        payload = b"null"
+    else:
+        try:
+            pydantic_core.from_json(body)
+            payload = body.strip()
+        except ValueError:
+            # Kept as a string so the line stays valid JSON
+            payload = pydantic_core.to_json(body.decode("utf-8", errors="replace"))
+    return head[:-1] + b',"body":' + payload + b"}\n"
+
+
+class WebhookCapture:
+    """
+    Records incoming webhooks to a JSONL file for bench/replay.py. The
+    request path only appends to a bounded in-memory queue; a background
+    thread formats and writes the lines. Records are dropped (and counted)
+    when the queue is full or the file has reached `max_bytes`, never
+    waited for. Captures hold real message contents: treat them as such.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        queue_size: int = 10_000,
+        max_bytes: int = 1024 * 1024 * 1024,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._queue: "queue.Queue[Optional[_Record]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.bytes = 0
+
+    def start(self) -> None:
+        self.bytes = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self._thread = threading.Thread(
+            target=self._write_loop, name="webhook-capture", daemon=True
+        )
+        self._thread.start()
+        logger.info("🎥 Capturing webhooks to %s", self.path)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Write what is queued (up to `timeout`), then stop the writer thread"""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning(
+                "⚠️  Webhook capture writer is stuck, %d records not written",
+                self._queue.qsize(),
+            )
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        self._thread = None
+
+    def record(self, path: str, event: Optional[str], body: Optional[bytes]) -> None:
+        """Queue one webhook; `body` is None for events acknowledged unread"""
+        try:
+            self._queue.put_nowait((time.time(), path, event, body))
+            self.captured += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self) -> None:
+        f: Optional[IO[bytes]] = None
+        try:
+            while True:
+                record = self._queue.get()
+                batch: List[Optional[_Record]] = [record]
+                # Drain what else is waiting into the same write
+                while len(batch) < 1000:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stopping = None in batch
+                lines = []
+                for item in batch:
+                    if item is None:
+                        continue
+                    line = _line(item)
+                    if self.bytes + len(line) > self.max_bytes:
+                        self.dropped += 1
+                        continue
+                    lines.append(line)
+                if lines:
+                    try:
+                        if f is None:
+                            f = open(self.path, "ab")
+                        f.write(b"".join(lines))
+                        f.flush()
+                        self.bytes += sum(len(line) for line in lines)
+                        self.written += len(lines)
+                    except OSError as e:
+                        # Disk full, file removed...: count the loss, keep draining
+                        self.errors += 1
+                        self.dropped += len(lines)
+                        if self.errors == 1 or self.errors % 100 == 0:
+                            logger.error("❌ Webhook capture write failed: %s", e)
+                        if f is not None:
+                            f.close()
+                            f = None
+                if stopping:
+                    return
+        finally:
+            if f is not None:
+                f.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "captured": self.captured,
+            "written": self.written,
+            "dropped": self.dropped,
+            "write_errors": self.errors,
+            "queued": self._queue.qsize(),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from src.metrics import COALESCED_BATCHES, COALESCED_MESSAGES
+from src.models import IncomingMessage
+
+if TYPE_CHECKING:
+    from src.instances import Instance
+    from src.media import MediaPipeline
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[["Instance", IncomingMessage], Awaitable[None]]
+
+# Lane states
+IDLE = "idle"  # nothing queued or running
+WAITING = "waiting"  # debouncing follow-ups (or retrying a full pool)
+BUSY = "busy"  # a batch is queued on or running in the worker pool
+
+
+class _Lane:
+    __slots__ = ("instance", "pending", "state", "first_at", "last_at", "timer")
+
+    def __init__(self, instance: "Instance"):
+        self.instance = instance
+        self.pending: List[IncomingMessage] = []
+        self.state = IDLE
+        self.first_at = 0.0
+        self.last_at = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+def combine(messages: List[IncomingMessage]) -> IncomingMessage:
+    """
+    One message answering for a burst: texts in arrival order, one per line.
+    Media messages are never combined; they are batches of their own.
+    """
+    if len(messages) == 1:
+        return messages[0]
+    last = messages[-1]
+    return last.model_copy(
+        update={"text": "\n".join(m.text for m in messages if m.text)}
+    )
+
+
+class SenderCoalescer:
+    """
+    Keeps each conversation's messages in order and answers a burst once.
+    Messages from one sender on one instance share a lane. The first message
+    of an idle lane goes to the worker pool at once; messages arriving while
+    it is answered wait, and once they are quiet for `window` seconds (at
+    most `max_wait` after the first of them) become one combined LLM request.
+    A lane never has more than one batch in the worker pool, so replies go
+    out in order. Media messages take their place in the lane too, but run
+    on the `media` pipeline's workers. Different lanes run in parallel.
+    """
+
+    def __init__(
+        self,
+        handler: MessageHandler,
+        *,
+        media: Optional["MediaPipeline"] = None,
+        window: float = 1.5,
+        max_wait: float = 5.0,
+        max_batch: int = 10,
+        max_pending: int = 10_000,
+        retry_delay: float = 0.5,
+    ):
+        self._handler = handler
+        self.media = media
+        self.window = window
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+        self._lanes: Dict[str, _Lane] = {}
+        self._pending = 0
+        self._closing = False
+        self.rejected = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        """Messages waiting in lanes (not yet handed to a worker pool)"""
+        return self._pending
+
+    def submit(self, instance: "Instance", message: IncomingMessage) -> bool:
+        """Add a message to its sender's lane; False when too many are waiting"""
+        if self._closing or self._pending >= self.max_pending:
+            self.rejected += 1
+            return False
+        key = message.conversation_id
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane(instance)
+        # The newest Instance object, in case a reload replaced it
+        lane.instance = instance
+        now = time.monotonic()
+        if not lane.pending:
+            lane.first_at = now
+        lane.pending.append(message)
+        lane.last_at = now
+        self._pending += 1
+        if lane.state == IDLE:
+            # Nothing in flight for this chat: no reason to wait
+            lane.state = WAITING
+            self._dispatch(key)
+        elif lane.state == WAITING:
+            # A new message restarts the debounce, within max_wait of the first
+            self._arm(key, lane, self._delay(lane, now))
+        return True
+
+    def _delay(self, lane: _Lane, now: float) -> float:
+        if len(lane.pending) >= self.max_batch:
+            return 0.0
+        quiet_at = lane.last_at + self.window
+        deadline = lane.first_at + self.max_wait
+        return max(0.0, min(quiet_at, deadline) - now)
+
+    def _arm(self, key: str, lane: _Lane, delay: float) -> None:
+        if lane.timer is not None:
+            lane.timer.cancel()
+        lane.state = WAITING
+        lane.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, key)
+
+    def _take(self, lane: _Lane) -> List[IncomingMessage]:
+        """The next batch: one media message, or the texts up to the next one"""
+        size = 1
+        if lane.pending[0].media is None:
+            while (
+                size < min(self.max_batch, len(lane.pending))
+                and lane.pending[size].media is None
+            ):
+                size += 1
+        batch = lane.pending[:size]
+        del lane.pending[:size]
+        self._pending -= len(batch)
+        return batch
+
+    def _record(self, batch: List[IncomingMessage]) -> None:
+        COALESCED_BATCHES.inc()
+        COALESCED_MESSAGES.inc(amount=len(batch))
+
+    def _dispatch(self, key: str) -> None:
+        """Debounce over: hand the lane's batch to its instance's worker pool"""
+        lane = self._lanes.get(key)
+        if lane is None or lane.state != WAITING:
+            return
+        lane.timer = None
+        batch = self._take(lane)
+        lane.state = BUSY
+        if batch[0].media is not None:
+            pool = self.media.pool
+            queued = self.media.submit(lane.instance, batch[0])
+        else:
+            pool = lane.instance.pool
+            queued = pool.submit(combine(batch))
+        if queued:
+            self._record(batch)
+            if len(batch) > 1:
+                logger.debug("🧩 Coalesced %d messages from %s", len(batch), key)
+            return
+        if not pool.accepting:
+            # Shutting down, or the instance was removed by a reload
+            self.dropped += len(batch)
+            logger.warning(
+                "⚠️  Dropped %d message(s) from %s: %s is stopped",
+                len(batch),
+                key,
+                lane.instance.name,
+            )
+            self._release(key, lane)
+            return
+        # Worker queue full: put the batch back in front and try again shortly
+        lane.pending[:0] = batch
+        self._pending += len(batch)
+        self._arm(key, lane, self.retry_delay)
+
+    async def run(self, instance: "Instance", message: IncomingMessage) -> None:
+        """
+        Worker pool handler (text and media workers alike): answer a batch,
+        then start the lane's next one
+        """
+        key = message.conversation_id
+        try:
+            if message.media is not None:
+                await self.media.handle(instance, message)
+                return
+            await self._handler(instance, message)
+            # Texts that arrived meanwhile and are already quiet for
+            # `window` (or at shutdown) are answered on this worker, in order
+            lane = self._lanes.get(key)
+            while (
+                lane is not None
+                and lane.pending
+                and lane.pending[0].media is None
+                and (self._closing or self._delay(lane, time.monotonic()) == 0.0)
+            ):
+                batch = self._take(lane)
+                self._record(batch)
+                await self._handler(instance, combine(batch))
+        finally:
+            lane = self._lanes.get(key)
+            if lane is not None:
+                self._release(key, lane)
+
+    def _release(self, key: str, lane: _Lane) -> None:
+        if lane.pending:
+            self._arm(key, lane, self._delay(lane, time.monotonic()))
+        else:
+            lane.state = IDLE
+            del self._lanes[key]
+
+    def flush(self) -> None:
+        """Dispatch every debouncing lane now and stop accepting (shutdown)"""
+        self._closing = True
+        for key, lane in list(self._lanes.items()):
+            if lane.state == WAITING:
+                if lane.timer is not None:
+                    lane.timer.cancel()
+                self._dispatch(key)
+
+    def stats(self) -> Dict[str, Any]:
+        states = [lane.state for lane in self._lanes.values()]
+        batches = COALESCED_BATCHES.value()
+        return {
+            "window": self.window,
+            "max_wait": self.max_wait,
+            "lanes": len(states),
+            "waiting": states.count(WAITING),
+            "busy": states.count(BUSY),
+            "pending": self._pending,
+            "batches": batches,
+            "messages": COALESCED_MESSAGES.value(),
+            "messages_per_batch": (
+                round(COALESCED_MESSAGES.value() / batches, 3) if batches else None
+            ),
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+        }
@@ -1,3 +1,4 @@
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -5,6 +6,31 @@ class Settings(BaseSettings):
     # GROQ API Configuration
     GROQ_API_KEY: str
     GROQ_MODEL: str = "llama-3.3-70b-versatile"  # or mixtral-8x7b-32768
+    GROQ_TIMEOUT: float = 30.0
+    GROQ_MAX_RETRIES: int = 2
+    GROQ_MAX_CONCURRENCY: int = 32
+    GROQ_BASE_URL: Optional[str] = None  # e.g. a local stand-in for benchmarks
+    # Resilience: circuit breaker, retry budget (share of calls) and p95 hedging
+    GROQ_BREAKER_FAILURES: int = 5
+    GROQ_BREAKER_RESET: float = 30.0
+    GROQ_RETRY_BUDGET_RATIO: float = 0.2
+    GROQ_HEDGE: bool = False
+    GROQ_HEDGE_PERCENTILE: float = 95.0
+    GROQ_HEDGE_MIN_DELAY: float = 0.5
+    # Model routing: short, simple messages go to ROUTER_SMALL_MODEL and the
+    # rest to GROQ_MODEL (or the instance's model). A model whose recent p95
+    # is over ROUTER_LATENCY_BUDGET seconds (0 = off) cascades to the next
+    # of ROUTER_FALLBACK_MODELS
+    ROUTER_ENABLED: bool = True
+    ROUTER_SMALL_MODEL: str = "llama-3.1-8b-instant"
+    ROUTER_SIMPLE_MAX_CHARS: int = 60
+    ROUTER_SMALL_MAX_TOKENS: int = 200
+    ROUTER_LARGE_MAX_TOKENS: int = 500
+    ROUTER_LATENCY_BUDGET: float = 4.0
+    ROUTER_LATENCY_PERCENTILE: float = 95.0
+    ROUTER_LATENCY_WINDOW: float = 120.0
+    ROUTER_MIN_SAMPLES: int = 10
+    ROUTER_FALLBACK_MODELS: List[str] = ["llama-3.1-8b-instant"]
     
     # Your phone number
     YOUR_PHONE_NUMBER: str = "+962787499976"
@@ -14,6 +40,139 @@ class Settings(BaseSettings):
     EVOLUTION_API_KEY: str 
     INSTANCE_NAME: str = "evolution_api"
 
+    # Extra Evolution instances (JSON list of InstanceConfig), polled for changes
+    INSTANCES_FILE: Optional[str] = None
+    INSTANCES_RELOAD_INTERVAL: float = 10.0
+    # Senders the bot answers besides each instance owner: one number, JID,
+    # group (@g.us), LID (@lid) or prefix rule (962*) per line; reloaded on change
+    ACCESS_LIST_FILE: Optional[str] = None
+    ACCESS_LIST_RELOAD_INTERVAL: float = 10.0
+
+    # Evolution API HTTP client (shared connection pool)
+    EVOLUTION_TIMEOUT: float = 30.0
+    EVOLUTION_CONNECT_TIMEOUT: float = 5.0
+    EVOLUTION_MAX_CONNECTIONS: int = 200
+    EVOLUTION_MAX_KEEPALIVE: int = 50
+    EVOLUTION_KEEPALIVE_EXPIRY: float = 30.0
+    EVOLUTION_HTTP2: bool = False
+    # Resilience: retries cover connect errors only (a send is not idempotent)
+    EVOLUTION_MAX_RETRIES: int = 2
+    EVOLUTION_BREAKER_FAILURES: int = 5
+    EVOLUTION_BREAKER_RESET: float = 15.0
+    EVOLUTION_RETRY_BUDGET_RATIO: float = 0.2
+
+    # Health checks (Evolution connection state is cached and refreshed in the background)
+    HEALTH_REFRESH_INTERVAL: float = 15.0
+    HEALTH_STALE_AFTER: float = 60.0
+    HEALTH_CHECK_TIMEOUT: float = 5.0
+    # Safety-net poll once CONNECTION_UPDATE webhooks keep the state current
+    HEALTH_PUSH_REFRESH_INTERVAL: float = 300.0
+    # Opt-in: /health/ready fails while WhatsApp is not logged in. Off by
+    # default, as an unready pod gets no webhooks, not even the
+    # CONNECTION_UPDATE that reports the number back
+    HEALTH_READY_REQUIRES_WHATSAPP: bool = False
+
+    # Outbound send pacing (messages per second) and retries on 429
+    OUTBOUND_GLOBAL_RATE: float = 20.0
+    OUTBOUND_GLOBAL_BURST: int = 40
+    OUTBOUND_RECIPIENT_RATE: float = 1.0
+    OUTBOUND_RECIPIENT_BURST: int = 5
+    OUTBOUND_MAX_IN_FLIGHT: int = 50
+    OUTBOUND_MAX_QUEUE: int = 10_000
+    OUTBOUND_MAX_RETRIES: int = 3
+    OUTBOUND_DEFAULT_RETRY_AFTER: float = 5.0
+    OUTBOUND_DRAIN_TIMEOUT: float = 10.0
+
+    # Durable outbox: replies are committed to SQLite and delivered by a
+    # background dispatcher with exponential backoff; failures end up as dead letters
+    OUTBOX_ENABLED: bool = True
+    OUTBOX_PATH: str = "outbox.db"
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_MAX_IN_FLIGHT: int = 500
+    OUTBOX_POLL_INTERVAL: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE: float = 2.0
+    OUTBOX_BACKOFF_MAX: float = 300.0
+    OUTBOX_LEASE_SECONDS: float = 120.0
+    OUTBOX_RETENTION: float = 86400.0
+
+    # Bulk sends: recipients and per-recipient results are kept in SQLite so an
+    # interrupted broadcast can be resumed by its job id
+    BROADCAST_PATH: str = "broadcast.db"
+    BROADCAST_CONCURRENCY: int = 50
+    BROADCAST_MAX_RECIPIENTS: int = 100_000
+    # Longest a send waits out a full queue or open circuit before the job is
+    # interrupted (resume it later)
+    BROADCAST_MAX_WAIT: float = 300.0
+
+    # Webhook worker pool (per instance)
+    WEBHOOK_WORKERS: int = 8
+    WEBHOOK_QUEUE_SIZE: int = 1000
+    WEBHOOK_DRAIN_TIMEOUT: float = 25.0
+    WEBHOOK_RETRY_AFTER: int = 5
+    WEBHOOK_MAX_BODY_BYTES: int = 1024 * 1024
+    # Opt-in: append every incoming webhook (with its arrival time) to this
+    # JSONL file, written by a background thread; replay with bench/replay.py
+    WEBHOOK_CAPTURE_FILE: Optional[str] = None
+    WEBHOOK_CAPTURE_QUEUE_SIZE: int = 10_000
+    WEBHOOK_CAPTURE_MAX_BYTES: int = 1024 * 1024 * 1024
+    # Per-sender lanes: messages from one chat are answered in order. A lone
+    # message is answered at once; messages arriving while the chat is being
+    # answered, within COALESCE_WINDOW seconds of each other (at most
+    # COALESCE_MAX_WAIT after the first), become one LLM request
+    COALESCE_WINDOW: float = 1.5
+    COALESCE_MAX_WAIT: float = 5.0
+    COALESCE_MAX_BATCH: int = 10
+    COALESCE_MAX_PENDING: int = 10_000
+
+    # Images, voice notes and documents: fetched from Evolution by reference
+    # and streamed into temp files that spill to disk past MEDIA_SPOOL_BYTES.
+    # MEDIA_WORKERS caps concurrent media jobs apart from the text workers
+    MEDIA_ENABLED: bool = True
+    MEDIA_WORKERS: int = 4
+    MEDIA_QUEUE_SIZE: int = 100
+    MEDIA_MAX_BYTES: int = 25 * 1024 * 1024
+    MEDIA_SPOOL_BYTES: int = 1024 * 1024
+    MEDIA_IMAGE_MAX_BYTES: int = 4 * 1024 * 1024
+    MEDIA_DOCUMENT_MAX_CHARS: int = 8000
+    MEDIA_FETCH_TIMEOUT: float = 60.0
+    # Storage (S3/MinIO) hosts whose media links are downloaded directly; any
+    # other link in a webhook is ignored and the media fetched by message id
+    MEDIA_URL_HOSTS: List[str] = []
+    MEDIA_TRANSCRIBE_MODEL: str = "whisper-large-v3-turbo"
+    MEDIA_VISION_MODEL: str = "meta-llama/llama-4-scout-17b-16e-instruct"
+
+    # Webhook redelivery dedup (keyed on remoteJid + message id)
+    DEDUP_MAX_ENTRIES: int = 100_000
+    DEDUP_TTL: float = 3600.0
+
+    # Where dedup keys and history live: "memory" (per process) or "sqlite"
+    # (one WAL database shared by every uvicorn worker on the host)
+    STATE_BACKEND: str = "memory"
+    STATE_SQLITE_PATH: str = "state.db"
+    STATE_FLUSH_INTERVAL: float = 0.05
+    STATE_FLUSH_BATCH: int = 500
+    STATE_READ_CACHE_TTL: float = 2.0
+    STATE_READ_CACHE_SIZE: int = 10_000
+
+    # Conversation history (per sender JID)
+    HISTORY_MAX_TURNS: int = 20
+    HISTORY_MAX_CHARS: int = 8000
+    HISTORY_MAX_CONVERSATIONS: int = 10_000
+    HISTORY_MAX_TOTAL_CHARS: int = 50_000_000
+    HISTORY_TOKEN_BUDGET: int = 2000
+
+    # LLM response cache for short, repeated prompts
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+    RESPONSE_CACHE_TTL: float = 86400.0
+    RESPONSE_CACHE_MAX_PROMPT_CHARS: int = 64
+    RESPONSE_CACHE_FILE: Optional[str] = None
+
+    # Streamed replies: send each finished sentence/paragraph as it is generated
+    STREAM_REPLIES: bool = False
+    STREAM_MIN_CHUNK_CHARS: int = 80
+
     # Bot Configuration
     BOT_URL: str = "http://localhost:8000"
     PORT: int = 8000
@@ -21,6 +180,19 @@ class Settings(BaseSettings):
     # SSL Configuration
     SSL_VERIFY: bool = True
 
+    # Logging goes through a queue drained by a background thread.
+    # LOG_FORMAT is "text" or "json"; LOG_SAMPLING keeps a fraction of the
+    # sub-WARNING lines per logger, e.g. {"src.processor": 0.1}
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "text"
+    LOG_SAMPLING: Dict[str, float] = {}
+    LOG_QUEUE_SIZE: int = 10_000
+
+    # Cold start: open the Groq connection in the background at startup;
+    # STARTUP_PREWARM_WAIT delays readiness until it is done
+    STARTUP_PREWARM: bool = True
+    STARTUP_PREWARM_WAIT: bool = False
+
     # Headers for Evolution API
     @property
     def evolution_headers(self):
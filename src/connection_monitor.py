@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from src.evolution import EvolutionClient
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionMonitor:
+    """
+    Keeps the Evolution instance connection state in memory; the instance
+    counts as connected only while its WhatsApp state is "open". Readiness
+    only needs Evolution to answer (a logged-out number must still receive
+    the webhooks that report it back), unless `require_open` is set.
+    A background task refreshes it every `refresh_interval` seconds, and
+    reads are served from the cache (stale-while-revalidate): a read that
+    finds the entry older than the interval triggers one refresh in the
+    background but still returns immediately.
+
+    Once CONNECTION_UPDATE webhooks arrive (`update(..., pushed=True)`)
+    Evolution tells us about changes itself, and polling drops to a safety
+    net every `push_refresh_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        client: EvolutionClient,
+        *,
+        refresh_interval: float = 15.0,
+        stale_after: float = 60.0,
+        timeout: float = 5.0,
+        push_refresh_interval: float = 300.0,
+        require_open: bool = False,
+    ):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.stale_after = stale_after
+        self.timeout = timeout
+        self.push_refresh_interval = push_refresh_interval
+        self.require_open = require_open
+
+        self.state: Optional[str] = None
+        # Evolution answered the last check; `connected` is WhatsApp logged in
+        self.reachable = False
+        self.connected = False
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        # Set by the first pushed update; the state is then kept current by events
+        self.pushed = False
+        self.pushed_updates = 0
+        self._checked_monotonic: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._loop_task = asyncio.create_task(
+            self._refresh_loop(), name="connection-monitor"
+        )
+
+    async def stop(self) -> None:
+        for task in (self._loop_task, self._refreshing):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    @property
+    def _interval(self) -> float:
+        if self.pushed and self.connected:
+            return self.push_refresh_interval
+        return self.refresh_interval
+
+    async def _refresh_loop(self) -> None:
+        # The first refresh also opens (pre-warms) the instance's connection pool
+        await self.client.open()
+        while True:
+            age = self.age
+            if age is None or age >= self._interval:
+                await self.refresh()
+                age = 0.0
+            await asyncio.sleep(self._interval - age)
+
+    async def refresh(self) -> None:
+        """Fetch the connection state from Evolution and update the cache"""
+        try:
+            state_info = await self.client.connection_state(timeout=self.timeout)
+            state = state_info.get("state") or state_info.get("instance", {}).get(
+                "state"
+            )
+            self.update(state)
+        except Exception as e:
+            if self.connected or self.error is None:
+                logger.warning(f"⚠️  Evolution connection check failed: {e}")
+            self.reachable = False
+            self.connected = False
+            self.error = str(e)
+            self._mark_checked()
+
+    def update(self, state: Optional[str], pushed: bool = False) -> None:
+        """Record a known connection state (from a poll or a pushed event)"""
+        if state != self.state and self.state is not None:
+            log = logger.warning if state == "close" else logger.info
+            log(f"📶 WhatsApp connection {self.state} -> {state}")
+        if pushed:
+            self.pushed = True
+            self.pushed_updates += 1
+        self.state = state
+        self.reachable = True
+        # Reachable is not enough: WhatsApp must be logged in on the instance
+        self.connected = state == "open"
+        self.error = None if self.connected else f"WhatsApp connection is {state}"
+        self._mark_checked()
+
+    def _mark_checked(self) -> None:
+        self.checked_at = time.time()
+        self._checked_monotonic = time.monotonic()
+
+    @property
+    def age(self) -> Optional[float]:
+        if self._checked_monotonic is None:
+            return None
+        return time.monotonic() - self._checked_monotonic
+
+    @property
+    def _stale_after(self) -> float:
+        # Pushed state stays valid between the (rare) safety-net polls
+        if self.pushed:
+            return self.push_refresh_interval + self.stale_after
+        return self.stale_after
+
+    @property
+    def is_ready(self) -> bool:
+        age = self.age
+        up = self.connected if self.require_open else self.reachable
+        return up and age is not None and age <= self._stale_after
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cached state; kicks off a background refresh when it is due"""
+        age = self.age
+        if (age is None or age > self._interval) and (
+            self._refreshing is None or self._refreshing.done()
+        ):
+            self._refreshing = asyncio.create_task(self.refresh())
+        return {
+            "connected": self.connected,
+            "reachable": self.reachable,
+            "state": self.state,
+            "error": self.error,
+            "checked_at": self.checked_at,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "stale": age is None or age > self._stale_after,
+            "pushed_updates": self.pushed_updates,
+        }
@@ -0,0 +1,66 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+
+class DedupCache:
+    """
+    Memory-bounded LRU of recently seen webhook message keys with TTL expiry.
+    Every operation is O(1): entries are kept in expiry order, so expired
+    ones are always at the front and the LRU victim is the oldest entry.
+    """
+
+    def __init__(self, max_entries: int = 100_000, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(remote_jid: str, message_id: str, instance: str = "") -> str:
+        return f"{instance}:{remote_jid}:{message_id}"
+
+    def _expire(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            key, expires_at = next(iter(entries.items()))
+            if expires_at > now:
+                break
+            entries.popitem(last=False)
+
+    def check_and_add(self, key: str) -> bool:
+        """Record `key`; True if it was already seen within the TTL"""
+        now = time.monotonic()
+        self._expire(now)
+        seen = key in self._entries
+        if seen:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        else:
+            self.misses += 1
+            if len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        self._entries[key] = now + self.ttl
+        return seen
+
+    def discard(self, key: str) -> None:
+        """Forget `key`, e.g. when the message could not be queued"""
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,104 @@
+from fastapi import Request
+from typing import Optional
+from src.access import AccessControl
+from src.broadcast import BroadcastManager
+from src.capture import WebhookCapture
+from src.coalescer import SenderCoalescer
+from src.connection_monitor import ConnectionMonitor
+from src.evolution import EvolutionClient
+from src.instances import InstanceRegistry
+from src.llm import LLMClient
+from src.logging_setup import LoggingControl
+from src.media import MediaPipeline
+from src.loop_monitor import LoopLagMonitor
+from src.outbox import Outbox
+from src.response_cache import ResponseCache
+from src.routing import ModelRouter
+from src.scheduler import OutboundScheduler
+from src.startup import StartupReport
+from src.state import StateBackend
+
+
+def get_evolution_client(request: Request) -> EvolutionClient:
+    """Evolution API client of the default instance"""
+    return request.app.state.evolution
+
+
+def get_llm_client(request: Request) -> LLMClient:
+    """Shared Groq client created in the app lifespan"""
+    return request.app.state.llm
+
+
+def get_instance_registry(request: Request) -> InstanceRegistry:
+    """Evolution instances served by this app, each with its own pools"""
+    return request.app.state.instances
+
+
+def get_state_backend(request: Request) -> StateBackend:
+    """Dedup and conversation history store (memory or SQLite)"""
+    return request.app.state.store
+
+
+def get_response_cache(request: Request) -> Optional[ResponseCache]:
+    """LLM response cache, None when disabled"""
+    return request.app.state.response_cache
+
+
+def get_model_router(request: Request) -> Optional[ModelRouter]:
+    """Per-message model choice and per-route stats; None when disabled"""
+    return request.app.state.router
+
+
+def get_outbound_scheduler(request: Request) -> OutboundScheduler:
+    """Rate-limited outbound send scheduler of the default instance"""
+    return request.app.state.outbound
+
+
+def get_capture(request: Request) -> Optional[WebhookCapture]:
+    """Webhook recorder for replay; None unless WEBHOOK_CAPTURE_FILE is set"""
+    return request.app.state.capture
+
+
+def get_coalescer(request: Request) -> SenderCoalescer:
+    """Per-sender lanes that order and batch incoming messages"""
+    return request.app.state.coalescer
+
+
+def get_connection_monitor(request: Request) -> ConnectionMonitor:
+    """Cached Evolution connection state refreshed in the background"""
+    return request.app.state.connection_monitor
+
+
+def get_loop_monitor(request: Request) -> LoopLagMonitor:
+    """Event-loop lag monitor started in the app lifespan"""
+    return request.app.state.loop_monitor
+
+
+def get_media_pipeline(request: Request) -> Optional[MediaPipeline]:
+    """Worker pool reading images, voice notes and documents; None when disabled"""
+    return request.app.state.media
+
+
+def get_outbox(request: Request) -> Optional[Outbox]:
+    """Durable outbound message queue, None when disabled"""
+    return request.app.state.outbox
+
+
+def get_broadcasts(request: Request) -> BroadcastManager:
+    """Bulk send jobs and their per-recipient results"""
+    return request.app.state.broadcasts
+
+
+def get_access_control(request: Request) -> AccessControl:
+    """Sender allowlist consulted before a message is queued"""
+    return request.app.state.access
+
+
+def get_logging_control(request: Request) -> LoggingControl:
+    """Runtime log level and sampling settings"""
+    return request.app.state.logging
+
+
+def get_startup_report(request: Request) -> StartupReport:
+    """Cold start timings of this process"""
+    return request.app.state.startup
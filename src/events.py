@@ -0,0 +1,82 @@
+import functools
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Request
+
+# Events Evolution API can deliver, in normalised form (see normalize_event)
+KNOWN_EVENTS = frozenset(
+    {
+        "application.startup",
+        "qrcode.updated",
+        "connection.update",
+        "messages.set",
+        "messages.upsert",
+        "messages.edited",
+        "messages.update",
+        "messages.delete",
+        "send.message",
+        "contacts.set",
+        "contacts.upsert",
+        "contacts.update",
+        "presence.update",
+        "chats.set",
+        "chats.upsert",
+        "chats.update",
+        "chats.delete",
+        "groups.upsert",
+        "group.update",
+        "group.participants.update",
+        "labels.edit",
+        "labels.association",
+        "call",
+        "logout.instance",
+        "remove.instance",
+    }
+)
+
+EventHandler = Callable[[Request, bytes], Awaitable[Any]]
+
+
+@functools.lru_cache(maxsize=256)
+def normalize_event(name: str) -> str:
+    """
+    One spelling per event: the subscription name (CONNECTION_UPDATE), the
+    per-event URL (connection-update) and the payload field
+    (connection.update) all map to "connection.update".
+    """
+    return name.strip().lower().replace("_", ".").replace("-", ".")
+
+
+def metric_label(event: str) -> str:
+    """Event name for metrics; unknown names are folded so labels stay bounded"""
+    return event if event in KNOWN_EVENTS else "other"
+
+
+class EventDispatcher:
+    """
+    Webhook event name -> handler table. Lookups are a dict hit on the
+    normalised name; events without a handler are acknowledged without
+    reading their body.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, EventHandler] = {}
+
+    def on(self, event: str) -> Callable[[EventHandler], EventHandler]:
+        """Decorator registering the handler of `event`"""
+
+        def register(handler: EventHandler) -> EventHandler:
+            self._handlers[normalize_event(event)] = handler
+            return handler
+
+        return register
+
+    def get(self, event: str) -> Optional[EventHandler]:
+        return self._handlers.get(normalize_event(event))
+
+    def __contains__(self, event: object) -> bool:
+        return isinstance(event, str) and normalize_event(event) in self._handlers
+
+    @property
+    def events(self) -> list:
+        return sorted(self._handlers)
@@ -0,0 +1,210 @@
+import asyncio
+import httpx
+import logging
+from typing import Dict, Any, Optional
+from src.config import Settings
+from src.resilience import CircuitBreaker, RetryBudget, UpstreamPolicy
+
+logger = logging.getLogger(__name__)
+
+
+def _evolution_retryable(error: Exception) -> bool:
+    """Only errors raised before the request went out; a send is not idempotent"""
+    return isinstance(
+        error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+    )
+
+
+def _evolution_failure(error: Exception) -> bool:
+    """Transport errors and 5xx count against the breaker; 4xx (429 too) do not"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+class EvolutionClient:
+    """
+    Async Evolution API client backed by a single pooled httpx.AsyncClient.
+    Create it once (in the app lifespan) and share it, so keep-alive
+    connections are reused across every send and status call. Sends go
+    through a circuit breaker with budgeted retries of connect errors.
+    The pool (and its TLS context, which is slow to load) is built on first
+    use or by `open`.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        instance_name: str,
+        *,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 200,
+        max_keepalive_connections: int = 50,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        verify: bool = True,
+        max_retries: int = 2,
+        breaker_failures: int = 5,
+        breaker_reset: float = 15.0,
+        retry_budget_ratio: float = 0.2,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.instance_name = instance_name
+        self._client_options: Dict[str, Any] = {
+            "base_url": self.base_url,
+            "timeout": httpx.Timeout(timeout, connect=connect_timeout),
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            "http2": http2,
+            "verify": verify,
+        }
+        self._client: Optional[httpx.AsyncClient] = None
+        self.breaker = CircuitBreaker(
+            f"evolution:{instance_name}",
+            failure_threshold=breaker_failures,
+            reset_timeout=breaker_reset,
+        )
+        self.policy = UpstreamPolicy(
+            f"evolution:{instance_name}",
+            breaker=self.breaker,
+            budget=RetryBudget(retry_budget_ratio),
+            max_retries=max_retries,
+            backoff_base=0.1,
+            backoff_max=1.0,
+            retryable=_evolution_retryable,
+            is_failure=_evolution_failure,
+        )
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "EvolutionClient":
+        return cls(
+            settings.EVOLUTION_API_URL,
+            settings.EVOLUTION_API_KEY,
+            settings.INSTANCE_NAME,
+            timeout=settings.EVOLUTION_TIMEOUT,
+            connect_timeout=settings.EVOLUTION_CONNECT_TIMEOUT,
+            max_connections=settings.EVOLUTION_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.EVOLUTION_MAX_KEEPALIVE,
+            keepalive_expiry=settings.EVOLUTION_KEEPALIVE_EXPIRY,
+            http2=settings.EVOLUTION_HTTP2,
+            verify=settings.SSL_VERIFY,
+            max_retries=settings.EVOLUTION_MAX_RETRIES,
+            breaker_failures=settings.EVOLUTION_BREAKER_FAILURES,
+            breaker_reset=settings.EVOLUTION_BREAKER_RESET,
+            retry_budget_ratio=settings.EVOLUTION_RETRY_BUDGET_RATIO,
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(**self._client_options)
+        return self._client
+
+    async def open(self) -> None:
+        """Build the pool off the event loop (loading CA certificates is slow)"""
+        if self._client is not None:
+            return
+        client = await asyncio.to_thread(httpx.AsyncClient, **self._client_options)
+        # A request may have built one meanwhile; keep that one
+        if self._client is None:
+            self._client = client
+        else:
+            await client.aclose()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"apikey": self.api_key, "Content-Type": "application/json"}
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        timeout: Optional[float] = None,
+        headers: Optional[Dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Send a request on the shared pool.
+        `headers` replaces the default auth headers instead of merging with them.
+        """
+        return await self.client.request(
+            method,
+            path,
+            headers=self.headers if headers is None else headers,
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            **kwargs,
+        )
+
+    async def send_text(
+        self, number: str, text: str, *, timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        POST /message/sendText/{instance}
+        Raises CircuitOpenError without sending while Evolution is failing.
+        """
+        payload = {
+            "number": number,
+            "text": text,
+            "options": {"delay": 1000, "presence": "composing", "linkPreview": False},
+        }
+
+        async def attempt() -> Dict[str, Any]:
+            response = await self.request(
+                "POST",
+                f"/message/sendText/{self.instance_name}",
+                json=payload,
+                timeout=timeout,
+            )
+            response.raise_for_status()
+            return response.json()
+
+        return await self.policy.call(attempt)
+
+    async def connection_state(self, *, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        GET /instance/connectionState/{instance}
+        """
+        response = await self.request(
+            "GET", f"/instance/connectionState/{self.instance_name}", timeout=timeout
+        )
+        # A 401 (wrong API key) or 404 (unknown instance) is not a state
+        response.raise_for_status()
+        return response.json()
+
+    def stream_media(self, message_id: str, *, timeout: Optional[float] = None):
+        """
+        POST /chat/getBase64FromMediaMessage/{instance}, as a streamed
+        response (`async with client.stream_media(id) as response`). The
+        body is JSON with the file in its "base64" field.
+        """
+        return self.client.stream(
+            "POST",
+            f"/chat/getBase64FromMediaMessage/{self.instance_name}",
+            json={"message": {"key": {"id": message_id}}, "convertToMp4": False},
+            headers=self.headers,
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+        )
+
+    def stream_url(self, url: str, *, timeout: Optional[float] = None):
+        """Streamed GET of a media URL (S3/MinIO storage); no Evolution auth sent"""
+        return self.client.stream(
+            "GET",
+            url,
+            headers={},
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+        )
+
+    async def aclose(self) -> None:
+        self.breaker.unregister()
+        if self._client is not None:
+            await self._client.aclose()
@@ -0,0 +1,128 @@
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Sequence, Tuple
+
+# (role, content)
+Turn = Tuple[str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token plus per-message overhead)"""
+    return len(text) // 4 + 4
+
+
+def select_context(turns: Sequence[Turn], token_budget: int) -> List[Dict[str, str]]:
+    """Newest `turns` that fit in `token_budget`, oldest first, as chat messages"""
+    selected: List[Dict[str, str]] = []
+    remaining = token_budget
+    for role, content in reversed(turns):
+        cost = estimate_tokens(content)
+        if cost > remaining:
+            break
+        remaining -= cost
+        selected.append({"role": role, "content": content})
+    selected.reverse()
+    return selected
+
+
+class _Conversation:
+    __slots__ = ("turns", "chars")
+
+    def __init__(self, max_turns: int):
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.chars = 0
+
+
+class ConversationStore:
+    """
+    Per-sender chat history kept as small ring buffers of turns.
+    Memory is capped per conversation (turns and chars) and globally
+    (conversation count and total chars); idle conversations are evicted
+    least-recently-used first.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 20,
+        max_chars_per_conversation: int = 8000,
+        max_conversations: int = 10_000,
+        max_total_chars: int = 50_000_000,
+    ):
+        self.max_turns = max_turns
+        self.max_chars_per_conversation = max_chars_per_conversation
+        self.max_conversations = max_conversations
+        self.max_total_chars = max_total_chars
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self.total_chars = 0
+        self.evictions = 0
+
+    def append(self, jid: str, role: str, content: str) -> None:
+        conversation = self._conversations.get(jid)
+        if conversation is None:
+            conversation = _Conversation(self.max_turns)
+            self._conversations[jid] = conversation
+        else:
+            self._conversations.move_to_end(jid)
+
+        turns = conversation.turns
+        if len(turns) == turns.maxlen:
+            self._drop_oldest(conversation)
+        turns.append((role, content))
+        conversation.chars += len(content)
+        self.total_chars += len(content)
+
+        # Per-conversation cap: always keep at least the newest turn
+        while conversation.chars > self.max_chars_per_conversation and len(turns) > 1:
+            self._drop_oldest(conversation)
+
+        self._evict(keep=jid)
+
+    def _drop_oldest(self, conversation: _Conversation) -> None:
+        _, content = conversation.turns.popleft()
+        conversation.chars -= len(content)
+        self.total_chars -= len(content)
+
+    def _evict(self, keep: str) -> None:
+        conversations = self._conversations
+        while len(conversations) > 1 and (
+            len(conversations) > self.max_conversations
+            or self.total_chars > self.max_total_chars
+        ):
+            jid, conversation = next(iter(conversations.items()))
+            if jid == keep:
+                break
+            conversations.popitem(last=False)
+            self.total_chars -= conversation.chars
+            self.evictions += 1
+
+    def turns(self, jid: str) -> List[Turn]:
+        conversation = self._conversations.get(jid)
+        return list(conversation.turns) if conversation else []
+
+    def context(self, jid: str, token_budget: int) -> List[Dict[str, str]]:
+        """
+        Newest turns of `jid` that fit in `token_budget`, oldest first,
+        as chat messages ready to sit between the system and user prompts.
+        """
+        conversation = self._conversations.get(jid)
+        if conversation is None or token_budget <= 0:
+            return []
+        self._conversations.move_to_end(jid)
+        return select_context(conversation.turns, token_budget)
+
+    def clear(self, jid: str) -> None:
+        conversation = self._conversations.pop(jid, None)
+        if conversation is not None:
+            self.total_chars -= conversation.chars
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "conversations": len(self._conversations),
+            "max_conversations": self.max_conversations,
+            "total_chars": self.total_chars,
+            "max_total_chars": self.max_total_chars,
+            "max_turns": self.max_turns,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,305 @@
+import asyncio
+import functools
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from src.config import Settings
+from src.connection_monitor import ConnectionMonitor
+from src.evolution import EvolutionClient
+from src.models import IncomingMessage
+from src.scheduler import OutboundScheduler
+from src.workers import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+
+class InstanceConfig(BaseModel):
+    """
+    One Evolution instance (WhatsApp number) served by this deployment.
+    Unset optional fields fall back to the global settings.
+    """
+
+    name: str
+    api_key: str
+    owner_number: str
+    model: Optional[str] = None
+    api_url: Optional[str] = None
+    # Replies generated at once for this instance (default WEBHOOK_WORKERS)
+    max_concurrency: Optional[int] = None
+    max_connections: Optional[int] = None
+    outbound_rate: Optional[float] = None
+    outbound_burst: Optional[int] = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "InstanceConfig":
+        """The instance configured through INSTANCE_NAME / EVOLUTION_API_KEY"""
+        return cls(
+            name=settings.INSTANCE_NAME,
+            api_key=settings.EVOLUTION_API_KEY,
+            owner_number=settings.YOUR_PHONE_NUMBER,
+        )
+
+
+_INSTANCE_LIST = TypeAdapter(List[InstanceConfig])
+
+# Fields read on every message; changing only these does not rebuild the pools
+_LIVE_FIELDS = {"owner_number", "model"}
+
+MessageHandler = Callable[["Instance", IncomingMessage], Awaitable[None]]
+
+
+class Instance:
+    """
+    Runtime state of one instance: its own Evolution connection pool,
+    outbound scheduler (rate limits), webhook worker pool (concurrency) and
+    cached WhatsApp connection state.
+    """
+
+    def __init__(
+        self, config: InstanceConfig, settings: Settings, handler: MessageHandler
+    ):
+        self.config = config
+        self.settings = settings
+        self.client = EvolutionClient(
+            config.api_url or settings.EVOLUTION_API_URL,
+            config.api_key,
+            config.name,
+            timeout=settings.EVOLUTION_TIMEOUT,
+            connect_timeout=settings.EVOLUTION_CONNECT_TIMEOUT,
+            max_connections=config.max_connections
+            or settings.EVOLUTION_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.EVOLUTION_MAX_KEEPALIVE,
+            keepalive_expiry=settings.EVOLUTION_KEEPALIVE_EXPIRY,
+            http2=settings.EVOLUTION_HTTP2,
+            verify=settings.SSL_VERIFY,
+            max_retries=settings.EVOLUTION_MAX_RETRIES,
+            breaker_failures=settings.EVOLUTION_BREAKER_FAILURES,
+            breaker_reset=settings.EVOLUTION_BREAKER_RESET,
+            retry_budget_ratio=settings.EVOLUTION_RETRY_BUDGET_RATIO,
+        )
+        self.outbound = OutboundScheduler(
+            self.client,
+            global_rate=config.outbound_rate or settings.OUTBOUND_GLOBAL_RATE,
+            global_burst=config.outbound_burst or settings.OUTBOUND_GLOBAL_BURST,
+            recipient_rate=settings.OUTBOUND_RECIPIENT_RATE,
+            recipient_burst=settings.OUTBOUND_RECIPIENT_BURST,
+            max_in_flight=settings.OUTBOUND_MAX_IN_FLIGHT,
+            max_queue_size=settings.OUTBOUND_MAX_QUEUE,
+            max_retries=settings.OUTBOUND_MAX_RETRIES,
+            default_retry_after=settings.OUTBOUND_DEFAULT_RETRY_AFTER,
+        )
+        self.connection = ConnectionMonitor(
+            self.client,
+            refresh_interval=settings.HEALTH_REFRESH_INTERVAL,
+            stale_after=settings.HEALTH_STALE_AFTER,
+            timeout=settings.HEALTH_CHECK_TIMEOUT,
+            push_refresh_interval=settings.HEALTH_PUSH_REFRESH_INTERVAL,
+            require_open=settings.HEALTH_READY_REQUIRES_WHATSAPP,
+        )
+        self.pool = WorkerPool(
+            functools.partial(handler, self),
+            num_workers=config.max_concurrency or settings.WEBHOOK_WORKERS,
+            max_queue_size=settings.WEBHOOK_QUEUE_SIZE,
+            name=f"webhook-{config.name}",
+        )
+
+    @property
+    def name(self) -> str:
+        return self.config.name
+
+    @property
+    def model(self) -> str:
+        return self.config.model or self.settings.GROQ_MODEL
+
+    def start(self) -> None:
+        self.outbound.start()
+        self.pool.start()
+        self.connection.start()
+
+    async def drain(self) -> None:
+        """Stop taking webhooks and finish the replies already queued"""
+        await self.pool.stop(drain_timeout=self.settings.WEBHOOK_DRAIN_TIMEOUT)
+
+    async def stop(self) -> None:
+        """Finish queued replies and sends, then close the connection pool"""
+        await self.connection.stop()
+        await self.drain()
+        await self.outbound.stop(drain_timeout=self.settings.OUTBOUND_DRAIN_TIMEOUT)
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "owner_number": self.config.owner_number,
+            "model": self.model,
+            "connection_state": self.connection.state,
+            "webhook": self.pool.stats(),
+            "outbound": self.outbound.stats(),
+            "circuit": self.client.breaker.stats(),
+        }
+
+
+class InstanceRegistry:
+    """
+    Instances this deployment answers for, keyed by Evolution instance name.
+    The default instance comes from the settings; more are read from a JSON
+    file (a list of InstanceConfig objects) that is polled for changes, so
+    instances can be added, changed or removed without a restart. Removed
+    or replaced instances drain their queues in the background.
+    """
+
+    def __init__(
+        self,
+        default: InstanceConfig,
+        settings: Settings,
+        handler: MessageHandler,
+        *,
+        path: Optional[str] = None,
+        reload_interval: float = 10.0,
+    ):
+        self.settings = settings
+        self.default_name = default.name
+        self.path = path
+        self.reload_interval = reload_interval
+        self._handler = handler
+        self._default_config = default
+        self._instances: Dict[str, Instance] = {}
+        self._mtime: Optional[float] = None
+        self._watcher: Optional[asyncio.Task] = None
+        self._retiring: set = set()
+        self._lock = asyncio.Lock()
+
+    @property
+    def default(self) -> Instance:
+        return self._instances[self.default_name]
+
+    def get(self, name: Optional[str]) -> Optional[Instance]:
+        """Instance for a webhook's `instance` field; empty means the default"""
+        return self._instances.get(name or self.default_name)
+
+    def __iter__(self):
+        return iter(list(self._instances.values()))
+
+    def __len__(self) -> int:
+        return len(self._instances)
+
+    async def start(self) -> None:
+        await self.reload()
+        if self.path and self.reload_interval > 0:
+            self._watcher = asyncio.create_task(self._watch(), name="instance-registry")
+
+    async def drain(self) -> None:
+        """Stop reloading and drain every webhook queue; sends keep working"""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        await asyncio.gather(
+            *(instance.drain() for instance in self._instances.values()),
+            return_exceptions=True,
+        )
+
+    async def stop(self) -> None:
+        await self.drain()
+        instances = list(self._instances.values())
+        self._instances.clear()
+        await asyncio.gather(
+            *(instance.stop() for instance in instances),
+            *self._retiring,
+            return_exceptions=True,
+        )
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                await self.reload()
+
+    def _read_file(self) -> List[InstanceConfig]:
+        try:
+            self._mtime = os.stat(self.path).st_mtime
+            with open(self.path, "rb") as f:
+                return _INSTANCE_LIST.validate_json(f.read())
+        except FileNotFoundError:
+            self._mtime = None
+            logger.warning(f"⚠️  Instances file {self.path} not found")
+            return []
+
+    async def reload(self) -> Dict[str, List[str]]:
+        """
+        Re-read the instances file and apply the difference. An unreadable or
+        invalid file leaves the current instances untouched.
+        """
+        async with self._lock:
+            configs = {self.default_name: self._default_config}
+            if self.path:
+                try:
+                    file_configs = self._read_file()
+                except (OSError, ValidationError) as e:
+                    logger.error(f"❌ Could not load instances from {self.path}: {e}")
+                    return {"added": [], "updated": [], "removed": []}
+                for config in file_configs:
+                    if config.name == self.default_name:
+                        logger.warning(
+                            f"⚠️  Ignoring {config.name} in {self.path}: "
+                            "the default instance is configured through the settings"
+                        )
+                        continue
+                    configs[config.name] = config
+            return self._apply(configs)
+
+    def _apply(self, configs: Dict[str, InstanceConfig]) -> Dict[str, List[str]]:
+        changes: Dict[str, List[str]] = {"added": [], "updated": [], "removed": []}
+        for name in list(self._instances):
+            if name not in configs:
+                self._retire(self._instances.pop(name))
+                changes["removed"].append(name)
+
+        for name, config in configs.items():
+            current = self._instances.get(name)
+            if current is not None and current.config == config:
+                continue
+            if current is not None and _only_live_fields_changed(
+                current.config, config
+            ):
+                current.config = config
+            else:
+                instance = Instance(config, self.settings, self._handler)
+                instance.start()
+                self._instances[name] = instance
+                if current is not None:
+                    self._retire(current)
+            changes["updated" if current is not None else "added"].append(name)
+
+        for kind, names in changes.items():
+            if names:
+                logger.info(f"🔄 Instances {kind}: {', '.join(names)}")
+        return changes
+
+    def _retire(self, instance: Instance) -> None:
+        """Drain a removed/replaced instance without blocking new traffic"""
+        task = asyncio.create_task(instance.stop(), name=f"retire-{instance.name}")
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    @property
+    def webhook_depth(self) -> int:
+        return sum(instance.pool.depth for instance in self._instances.values())
+
+    @property
+    def outbound_depth(self) -> int:
+        return sum(instance.outbound.depth for instance in self._instances.values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: instance.stats() for name, instance in self._instances.items()}
+
+
+def _only_live_fields_changed(old: InstanceConfig, new: InstanceConfig) -> bool:
+    old_fields = old.model_dump(exclude=_LIVE_FIELDS)
+    return old_fields == new.model_dump(exclude=_LIVE_FIELDS)
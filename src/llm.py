@@ -0,0 +1,257 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any, AsyncIterator, BinaryIO, Dict, List, Optional
+from src.config import Settings
+from src.metrics import LLM_ROUTE_TOKENS, LLM_TOKENS
+from src.resilience import CircuitBreaker, LatencyTracker, RetryBudget, UpstreamPolicy
+
+if TYPE_CHECKING:
+    from groq import AsyncGroq
+
+logger = logging.getLogger(__name__)
+
+
+def record_usage(usage, route: Optional[str] = None) -> None:
+    """Add a completion's token usage to the metrics (and its route's, if routed)"""
+    if usage is None:
+        return
+    LLM_TOKENS.inc("in", amount=usage.prompt_tokens or 0)
+    LLM_TOKENS.inc("out", amount=usage.completion_tokens or 0)
+    if route is not None:
+        LLM_ROUTE_TOKENS.inc(route, "in", amount=usage.prompt_tokens or 0)
+        LLM_ROUTE_TOKENS.inc(route, "out", amount=usage.completion_tokens or 0)
+
+
+def _groq_retryable(error: Exception) -> bool:
+    """Connection errors, timeouts, 429 and 5xx are worth another attempt"""
+    import groq  # already loaded: the error came from the SDK
+
+    if isinstance(error, groq.APIConnectionError):
+        return True
+    return isinstance(error, groq.APIStatusError) and (
+        error.status_code == 429 or error.status_code >= 500
+    )
+
+
+def _groq_failure(error: Exception) -> bool:
+    """Errors that mean Groq is unhealthy (a 4xx, 429 included, does not)"""
+    import groq
+
+    if isinstance(error, groq.APIStatusError):
+        return error.status_code >= 500
+    return True
+
+
+class LLMClient:
+    """
+    Shared AsyncGroq client owned by the app lifespan.
+    A semaphore caps in-flight completions so a burst of conversations
+    overlaps its LLM latency without exceeding the provider limits.
+    Calls go through an UpstreamPolicy: a circuit breaker that fails fast
+    while Groq is down, budgeted retries and optional p95 hedging.
+
+    The groq SDK is imported and its client built on first use (or by
+    `prewarm`), not at startup: both are slow and a cold pod should start
+    serving webhooks first.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        *,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        max_concurrency: int = 32,
+        base_url: Optional[str] = None,
+        breaker_failures: int = 5,
+        breaker_reset: float = 30.0,
+        retry_budget_ratio: float = 0.2,
+        hedge: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_delay: float = 0.5,
+    ):
+        self.model = model
+        # Retries happen in the policy (budgeted), not inside the SDK
+        self._client_options: Dict[str, Any] = {
+            "api_key": api_key,
+            "timeout": timeout,
+            "max_retries": 0,
+            "base_url": base_url,
+        }
+        self._client: Optional["AsyncGroq"] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = CircuitBreaker(
+            "groq", failure_threshold=breaker_failures, reset_timeout=breaker_reset
+        )
+        self.policy = UpstreamPolicy(
+            "groq",
+            breaker=self.breaker,
+            budget=RetryBudget(retry_budget_ratio),
+            max_retries=max_retries,
+            retryable=_groq_retryable,
+            is_failure=_groq_failure,
+            latency=(
+                LatencyTracker(percentile=hedge_percentile, min_delay=hedge_min_delay)
+                if hedge
+                else None
+            ),
+        )
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "LLMClient":
+        return cls(
+            settings.GROQ_API_KEY,
+            settings.GROQ_MODEL,
+            timeout=settings.GROQ_TIMEOUT,
+            max_retries=settings.GROQ_MAX_RETRIES,
+            max_concurrency=settings.GROQ_MAX_CONCURRENCY,
+            base_url=settings.GROQ_BASE_URL,
+            breaker_failures=settings.GROQ_BREAKER_FAILURES,
+            breaker_reset=settings.GROQ_BREAKER_RESET,
+            retry_budget_ratio=settings.GROQ_RETRY_BUDGET_RATIO,
+            hedge=settings.GROQ_HEDGE,
+            hedge_percentile=settings.GROQ_HEDGE_PERCENTILE,
+            hedge_min_delay=settings.GROQ_HEDGE_MIN_DELAY,
+        )
+
+    def _build_client(self) -> "AsyncGroq":
+        from groq import AsyncGroq
+
+        return AsyncGroq(**self._client_options)
+
+    @property
+    def client(self) -> "AsyncGroq":
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    async def prewarm(self, timeout: float = 5.0) -> None:
+        """
+        Import the SDK and build the client off the event loop, then open a
+        connection (TLS included) with a cheap models call. Errors are logged:
+        the first real call simply pays the cost instead.
+        """
+        try:
+            if self._client is None:
+                client = await asyncio.to_thread(self._build_client)
+                # A call may have built one meanwhile; keep that one
+                if self._client is None:
+                    self._client = client
+                else:
+                    await client.close()
+            await self.client.models.list(timeout=timeout)
+        except Exception as e:
+            logger.warning(f"⚠️  Groq pre-warm failed: {e}")
+
+    async def complete(
+        self,
+        messages: List[Dict[str, Any]],
+        *,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        timeout: Optional[float] = None,
+        route: Optional[str] = None,
+    ) -> str:
+        """
+        Run one chat completion and return the reply text.
+        Raises CircuitOpenError without calling Groq while the circuit is open.
+        `route` labels the token usage (see src/routing.py).
+        """
+        options = {"timeout": timeout} if timeout is not None else {}
+
+        async def attempt() -> str:
+            async with self._semaphore:
+                chat_completion = await self.client.chat.completions.create(
+                    messages=messages,
+                    model=model or self.model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    **options,
+                )
+            record_usage(chat_completion.usage, route)
+            return chat_completion.choices[0].message.content or ""
+
+        return await self.policy.call(attempt)
+
+    async def transcribe(
+        self,
+        file: BinaryIO,
+        *,
+        filename: str,
+        mimetype: str,
+        model: str,
+        timeout: Optional[float] = None,
+    ) -> str:
+        """
+        Speech to text for an audio file. `file` is uploaded in chunks by
+        the HTTP client, so it can be a temp file of any size.
+        """
+        options = {"timeout": timeout} if timeout is not None else {}
+
+        async def attempt() -> str:
+            # Rewound on every attempt: a retry uploads it again
+            file.seek(0)
+            async with self._semaphore:
+                transcription = await self.client.audio.transcriptions.create(
+                    file=(filename, file, mimetype), model=model, **options
+                )
+            return transcription.text or ""
+
+        return await self.policy.call(attempt)
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 500,
+        timeout: Optional[float] = None,
+        route: Optional[str] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Run one streamed chat completion, yielding content deltas as they arrive.
+        Retried only while nothing has been yielded; not hedged.
+        """
+        options = {"timeout": timeout} if timeout is not None else {}
+        self.policy.before_call()
+        attempt = 0
+        yielded = False
+        while True:
+            try:
+                async with self._semaphore:
+                    stream = await self.client.chat.completions.create(
+                        messages=messages,
+                        model=model or self.model,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        **options,
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            yielded = True
+                            yield chunk.choices[0].delta.content
+                        # Groq reports usage on the final chunk
+                        usage = chunk.usage or (
+                            chunk.x_groq.usage if chunk.x_groq else None
+                        )
+                        if usage is not None:
+                            record_usage(usage, route)
+            except (asyncio.CancelledError, GeneratorExit):
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                self.policy.record(e)
+                if not yielded and await self.policy.should_retry(e, attempt):
+                    attempt += 1
+                    continue
+                raise
+            self.policy.record(None)
+            return
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.close()
@@ -0,0 +1,186 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+import pydantic_core
+
+from src.config import Settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Configured by uvicorn with their own stream handlers and propagate=False
+SERVER_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+# LogRecord attributes; anything else on a record came in through `extra=`
+_RECORD_FIELDS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {
+    "message",
+    "asctime",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields become top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return pydantic_core.to_json(entry, fallback=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the records below WARNING per logger (and its
+    children): a rate of 0.1 passes about one in ten. Warnings and errors
+    always pass. Rates can be changed at runtime.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self._rates: Dict[str, float] = dict(rates or {})
+        # logger name -> effective rate, so each name walks its parents once
+        self._resolved: Dict[str, float] = {}
+        self.dropped = 0
+
+    @property
+    def rates(self) -> Dict[str, float]:
+        return dict(self._rates)
+
+    def set_rate(self, name: str, rate: float) -> None:
+        if rate >= 1.0:
+            self._rates.pop(name, None)
+        else:
+            self._rates[name] = max(0.0, rate)
+        self._resolved = {}
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = self._rates.get("", 1.0)
+            probe = name
+            while probe:
+                if probe in self._rates:
+                    rate = self._rates[probe]
+                    break
+                probe = probe.rpartition(".")[0]
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Hands records to the listener thread unformatted, so `%`-style
+    arguments are only rendered there, off the event loop. Records are
+    dropped (and counted) instead of blocking when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingControl:
+    """Runtime view of the logging setup: levels, sampling and queue counters"""
+
+    def __init__(
+        self,
+        handler: _DeferredQueueHandler,
+        sampler: SamplingFilter,
+        listener: QueueListener,
+        log_format: str,
+    ):
+        self.handler = handler
+        self.sampler = sampler
+        self.listener = listener
+        self.log_format = log_format
+
+    def set_level(self, name: str, level: str) -> None:
+        """Level of logger `name` ("" is the root logger)"""
+        logging.getLogger(name or None).setLevel(level.upper())
+
+    def set_sample_rate(self, name: str, rate: float) -> None:
+        self.sampler.set_rate(name, rate)
+
+    def stats(self) -> Dict[str, Any]:
+        root = logging.getLogger()
+        levels = {"": logging.getLevelName(root.level)}
+        for name, logger in logging.Logger.manager.loggerDict.items():
+            if isinstance(logger, logging.Logger) and logger.level != logging.NOTSET:
+                levels[name] = logging.getLevelName(logger.level)
+        return {
+            "format": self.log_format,
+            "levels": levels,
+            "sampling": self.sampler.rates,
+            "queued": self.handler.queue.qsize(),
+            "dropped_queue_full": self.handler.dropped,
+            "dropped_sampled": self.sampler.dropped,
+        }
+
+
+def configure_logging(settings: Settings) -> LoggingControl:
+    """
+    Route all logging through a bounded queue drained by a background
+    thread, so request handlers never wait on log I/O. LOG_FORMAT=json
+    writes one JSON object per line. uvicorn's loggers (the access log is
+    written once per request) lose their own handlers and propagate to the
+    queue; this relies on uvicorn setting them up before the app is
+    imported, as the `uvicorn app:app` CLI does.
+    """
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    handler = _DeferredQueueHandler(log_queue)
+    sampler = SamplingFilter(settings.LOG_SAMPLING)
+    handler.addFilter(sampler)
+
+    output = logging.StreamHandler(sys.stderr)
+    if settings.LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+    listener = QueueListener(log_queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    # Their levels are kept; one left without handlers (--no-access-log) stays off
+    for name in SERVER_LOGGERS:
+        server_logger = logging.getLogger(name)
+        if server_logger.handlers:
+            for existing in server_logger.handlers[:]:
+                server_logger.removeHandler(existing)
+            server_logger.propagate = True
+
+    listener.start()
+    atexit.register(listener.stop)
+    return LoggingControl(handler, sampler, listener, settings.LOG_FORMAT)
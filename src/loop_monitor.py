@@ -0,0 +1,58 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: how late a periodic sleep wakes up compared to
+    when it asked to. Anything blocking the loop (sync I/O, CPU-heavy work)
+    shows up here directly. Keeps a window of recent samples.
+    """
+
+    def __init__(self, interval: float = 0.1, window: int = 600):
+        self.interval = interval
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self._samples.append(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+
+    def reset(self) -> None:
+        self._samples.clear()
+        self.max_lag = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0}
+
+        def pct(p: float) -> float:
+            return round(
+                samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3
+            )
+
+        return {
+            "samples": len(samples),
+            "interval_ms": self.interval * 1000,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(self.max_lag * 1000, 3),
+        }
@@ -0,0 +1,476 @@
+import asyncio
+import base64
+import binascii
+import codecs
+import logging
+import re
+import tempfile
+import time
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import urlsplit
+
+from src.config import Settings
+from src.evolution import EvolutionClient
+from src.llm import LLMClient
+from src.metrics import MEDIA_BYTES, MEDIA_JOBS, STAGE_SECONDS
+from src.models import IncomingMessage, MediaRef
+from src.utils import clean_llm_response
+from src.workers import WorkerPool
+
+if TYPE_CHECKING:
+    from src.instances import Instance, MessageHandler
+    from src.processor import MessageProcessor
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FAILURE_REPLY = "Sorry, I couldn't open that file. Could you send it as text?"
+
+CHUNK_BYTES = 64 * 1024
+
+IMAGE_PROMPT = "Describe this image in detail, including any text it contains."
+
+# Documents read as text; anything else is described by name and type only
+_TEXT_MIMETYPES = (
+    "text/",
+    "application/json",
+    "application/xml",
+    "application/csv",
+    "application/x-yaml",
+)
+
+
+class MediaTooLarge(Exception):
+    """Raised when a media file exceeds the configured size limit"""
+
+
+class Base64StreamDecoder:
+    """
+    Decodes base64 text fed in arbitrary chunks, keeping at most four
+    undecoded characters between calls. Whitespace and the JSON escapes
+    a base64 string can contain (`\\/`, and `\\n` etc. in wrapped lines)
+    are dropped.
+    """
+
+    _DROP = b" \t\r\n\\"
+    _ESCAPES = re.compile(rb"\\[nrt]")
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._pending = b""
+
+    def _decode(self, data: bytes) -> bytes:
+        decoded = binascii.a2b_base64(data)
+        self.size += len(decoded)
+        if self.size > self.max_bytes:
+            raise MediaTooLarge(f"Media larger than {self.max_bytes} bytes")
+        return decoded
+
+    def feed(self, data: bytes) -> bytes:
+        data = self._pending + data
+        # An escape split across chunks is completed by the next one
+        hold = b"\\" if data.endswith(b"\\") else b""
+        data = self._ESCAPES.sub(b"", data[: len(data) - len(hold)])
+        data = data.translate(None, self._DROP)
+        cut = len(data) - len(data) % 4
+        self._pending = data[cut:] + hold
+        return self._decode(data[:cut]) if cut else b""
+
+    def flush(self) -> bytes:
+        pending, self._pending = self._pending.rstrip(b"\\"), b""
+        if not pending:
+            return b""
+        # Tolerate missing padding
+        return self._decode(pending + b"=" * (-len(pending) % 4))
+
+
+class JsonBase64Field:
+    """
+    Pulls one base64 string field out of a JSON document as it streams in
+    and decodes it, without holding either the document or the file in
+    memory. Other fields are skipped. A `data:<type>;base64,` prefix on
+    the value is removed.
+    """
+
+    _TAIL = 64
+
+    def __init__(self, field: str, max_bytes: int):
+        self._start = re.compile(rb'"' + re.escape(field.encode()) + rb'"\s*:\s*"')
+        self._decoder = Base64StreamDecoder(max_bytes)
+        self._buffer = b""
+        self._state = "seek"  # seek -> prefix -> value -> done
+        self.found = False
+
+    @property
+    def size(self) -> int:
+        return self._decoder.size
+
+    def feed(self, chunk: bytes) -> bytes:
+        if self._state == "done":
+            return b""
+        if self._state == "seek":
+            data = self._buffer + chunk
+            match = self._start.search(data)
+            if match is None:
+                # Keep enough to match a key split across two chunks
+                self._buffer = data[-self._TAIL :]
+                return b""
+            self._buffer = b""
+            self.found = True
+            self._state = "prefix"
+            chunk = data[match.end() :]
+        if self._state == "prefix":
+            data = self._buffer + chunk
+            if len(data) < 5 and b'"' not in data:
+                self._buffer = data
+                return b""
+            self._buffer = b""
+            self._state = "value"
+            chunk = data
+            if data.startswith(b"data:"):
+                comma = data.find(b",", 0, 256)
+                if comma < 0:
+                    if len(data) >= 256:
+                        raise ValueError("Malformed data URL in media response")
+                    self._buffer = data
+                    self._state = "prefix"
+                    return b""
+                chunk = data[comma + 1 :]
+        end = chunk.find(b'"')
+        if end < 0:
+            return self._decoder.feed(chunk)
+        self._state = "done"
+        return self._decoder.feed(chunk[:end]) + self._decoder.flush()
+
+    @property
+    def complete(self) -> bool:
+        return self._state == "done"
+
+
+def _spool(max_memory: int) -> IO[bytes]:
+    """Temp file kept in memory up to `max_memory` bytes, then on disk"""
+    return tempfile.SpooledTemporaryFile(max_size=max_memory, prefix="wa-media-")
+
+
+async def _write(spool: IO[bytes], data: bytes, max_memory: int) -> None:
+    """In-memory writes inline; the rollover and disk writes on a thread"""
+    if spool.tell() + len(data) > max_memory:
+        await asyncio.to_thread(spool.write, data)
+    else:
+        spool.write(data)
+
+
+def trusted_url(url: Optional[str], hosts: Collection[str]) -> bool:
+    """
+    Whether `url` may be fetched directly: http(s) on one of `hosts`. The
+    link comes from the (unauthenticated) webhook body, so anything else
+    could point the bot at internal services.
+    """
+    if not url or not hosts:
+        return False
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return False
+    return parts.scheme in ("http", "https") and parts.hostname in hosts
+
+
+async def fetch_media(
+    client: EvolutionClient,
+    message_id: str,
+    media: MediaRef,
+    *,
+    max_bytes: int,
+    spool_bytes: int,
+    url_hosts: Collection[str] = (),
+    keep_bytes: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Tuple[IO[bytes], int]:
+    """
+    Download a message's media into a spooled temp file, rewound and ready
+    to read; returns the file and its size. The media URL is used only when it is on one of `url_hosts`
+    (the S3/MinIO storage); otherwise Evolution is asked for the media by
+    message id. Evolution's base64 JSON is decoded chunk by chunk as it
+    arrives, so at most one network chunk is in memory besides the spool;
+    writes past `spool_bytes` go to disk on a thread. With `keep_bytes` the
+    download stops once that many bytes are kept, leaving the file cut
+    short. The caller closes the file.
+    """
+    if keep_bytes is None and media.size is not None and media.size > max_bytes:
+        raise MediaTooLarge(f"Media of {media.size} bytes exceeds {max_bytes}")
+    spool = _spool(spool_bytes)
+    kept = 0
+    try:
+        if trusted_url(media.url, url_hosts):
+            size = 0
+            async with client.stream_url(media.url, timeout=timeout) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(CHUNK_BYTES):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise MediaTooLarge(f"Media larger than {max_bytes} bytes")
+                    if keep_bytes is not None:
+                        chunk = chunk[: keep_bytes - kept]
+                    await _write(spool, chunk, spool_bytes)
+                    kept += len(chunk)
+                    if kept == keep_bytes:
+                        break
+        else:
+            field = JsonBase64Field("base64", max_bytes)
+            async with client.stream_media(message_id, timeout=timeout) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(CHUNK_BYTES):
+                    decoded = field.feed(chunk)
+                    if keep_bytes is not None:
+                        decoded = decoded[: keep_bytes - kept]
+                    if decoded:
+                        await _write(spool, decoded, spool_bytes)
+                        kept += len(decoded)
+                    if field.complete or kept == keep_bytes:
+                        break
+            if not (field.complete or kept == keep_bytes) or field.size == 0:
+                raise ValueError("No base64 media in Evolution response")
+            size = field.size
+        MEDIA_BYTES.inc(media.kind, amount=size)
+        spool.seek(0)
+        return spool, kept
+    except BaseException:
+        spool.close()
+        raise
+
+
+def iter_chunks(file: IO[bytes], size: int = CHUNK_BYTES) -> Iterator[bytes]:
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def image_data_url(file: IO[bytes], mimetype: str) -> str:
+    """Base64 data URL of an image, encoded in 3-byte-aligned chunks"""
+    parts: List[str] = [f"data:{mimetype};base64,"]
+    # A multiple of 3 so each chunk encodes without padding
+    for chunk in iter_chunks(file, 3 * 16 * 1024):
+        parts.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(parts)
+
+
+def read_text(file: IO[bytes], max_chars: int) -> Tuple[str, bool]:
+    """Up to `max_chars` of UTF-8 text; True when the file was cut short"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts: List[str] = []
+    length = 0
+    for chunk in iter_chunks(file):
+        text = decoder.decode(chunk)
+        parts.append(text)
+        length += len(text)
+        if length >= max_chars:
+            return "".join(parts)[:max_chars], True
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)[:max_chars], False
+
+
+def _is_text(mimetype: str) -> bool:
+    return mimetype.startswith(_TEXT_MIMETYPES)
+
+
+class MediaPipeline:
+    """
+    Turns images, voice notes and documents into text the reply pipeline
+    understands: voice notes are transcribed, images described by a vision
+    model and text documents read. Files are streamed from Evolution into
+    spooled temp files, so a job holds at most MEDIA_SPOOL_BYTES in memory
+    (images sent to the vision model excepted, capped at
+    MEDIA_IMAGE_MAX_BYTES). Jobs run on their own worker pool, so slow
+    downloads and transcriptions never take a text worker.
+    """
+
+    def __init__(
+        self,
+        llm: LLMClient,
+        processor: "MessageProcessor",
+        *,
+        workers: int = 4,
+        queue_size: int = 100,
+        max_bytes: int = 25 * 1024 * 1024,
+        spool_bytes: int = 1024 * 1024,
+        # Groq accepts base64 images up to 4MB in a chat message
+        image_max_bytes: int = 4 * 1024 * 1024,
+        document_max_chars: int = 8000,
+        fetch_timeout: float = 60.0,
+        url_hosts: Iterable[str] = (),
+        transcribe_model: str = "whisper-large-v3-turbo",
+        vision_model: str = "meta-llama/llama-4-scout-17b-16e-instruct",
+    ):
+        self.llm = llm
+        self.processor = processor
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.image_max_bytes = image_max_bytes
+        self.document_max_chars = document_max_chars
+        self.fetch_timeout = fetch_timeout
+        self.url_hosts = frozenset(host.lower() for host in url_hosts)
+        self.transcribe_model = transcribe_model
+        self.vision_model = vision_model
+        self.pool = WorkerPool(
+            self._run, num_workers=workers, max_queue_size=queue_size, name="media"
+        )
+        self._runner: Optional["MessageHandler"] = None
+        self.spilled = 0
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, llm: LLMClient, processor: "MessageProcessor"
+    ) -> "MediaPipeline":
+        return cls(
+            llm,
+            processor,
+            workers=settings.MEDIA_WORKERS,
+            queue_size=settings.MEDIA_QUEUE_SIZE,
+            max_bytes=settings.MEDIA_MAX_BYTES,
+            spool_bytes=settings.MEDIA_SPOOL_BYTES,
+            image_max_bytes=settings.MEDIA_IMAGE_MAX_BYTES,
+            document_max_chars=settings.MEDIA_DOCUMENT_MAX_CHARS,
+            fetch_timeout=settings.MEDIA_FETCH_TIMEOUT,
+            url_hosts=settings.MEDIA_URL_HOSTS,
+            transcribe_model=settings.MEDIA_TRANSCRIBE_MODEL,
+            vision_model=settings.MEDIA_VISION_MODEL,
+        )
+
+    @property
+    def depth(self) -> int:
+        return self.pool.depth
+
+    def start(self, runner: Optional["MessageHandler"] = None) -> None:
+        """
+        Start the workers. Jobs go to `runner` (default: `handle`); the
+        sender coalescer passes its `run` so the sender's lane stays held
+        while the job runs and its later messages wait their turn.
+        """
+        self._runner = runner or self.handle
+        self.pool.start()
+
+    async def stop(self, drain_timeout: float = 25.0) -> None:
+        await self.pool.stop(drain_timeout=drain_timeout)
+
+    def submit(self, instance: "Instance", message: IncomingMessage) -> bool:
+        """Queue a media message; False when the media queue is full"""
+        return self.pool.submit((instance, message))
+
+    async def _run(self, job: Tuple["Instance", IncomingMessage]) -> None:
+        await self._runner(*job)
+
+    async def handle(self, instance: "Instance", message: IncomingMessage) -> None:
+        """Read the media as text, then answer it like a text message"""
+        media = message.media
+        started = time.perf_counter()
+        try:
+            text = await self._extract(instance, message)
+            outcome = "ok"
+        except MediaTooLarge as e:
+            logger.warning("⚠️  %s from %s: %s", media.kind, message.sender_jid, e)
+            text, outcome = None, "too_large"
+        except Exception:
+            logger.exception("❌ Could not read %s %s", media.kind, message.message_id)
+            text, outcome = None, "failed"
+        STAGE_SECONDS.observe(time.perf_counter() - started, "media")
+        MEDIA_JOBS.inc(media.kind, outcome)
+
+        if text is None:
+            if not message.text:
+                await self.processor.send_reply(
+                    instance, message.sender_jid, MEDIA_FAILURE_REPLY
+                )
+                return
+            # The caption alone still gets an answer
+            text = message.text
+        elif message.text:
+            text = f"{text}\n{message.text}"
+        logger.info("📎 %s from %s read as text", media.kind, message.sender_jid)
+        await self.processor.process(
+            instance, message.model_copy(update={"text": text, "media": None})
+        )
+
+    async def _extract(self, instance: "Instance", message: IncomingMessage) -> str:
+        media = message.media
+        if media.kind == "image" and (media.size or 0) > self.image_max_bytes:
+            raise MediaTooLarge(
+                f"Image of {media.size} bytes exceeds {self.image_max_bytes}"
+            )
+        name = media.file_name or "document"
+        keep_bytes = None
+        if media.kind == "document":
+            if not _is_text(media.mimetype):
+                # Only its name and type are used: don't download it
+                return f"[Document: {name}, {media.mimetype}]"
+            # Enough bytes for document_max_chars even if every one is 4 bytes
+            keep_bytes = 4 * self.document_max_chars
+        file, size = await fetch_media(
+            instance.client,
+            message.message_id,
+            media,
+            max_bytes=self.image_max_bytes if media.kind == "image" else self.max_bytes,
+            spool_bytes=self.spool_bytes,
+            url_hosts=self.url_hosts,
+            keep_bytes=keep_bytes,
+            timeout=self.fetch_timeout,
+        )
+        # The spool rolls over to disk once it holds more than spool_bytes
+        if size > self.spool_bytes:
+            self.spilled += 1
+        with file:
+            if media.kind == "audio":
+                transcript = await self.llm.transcribe(
+                    file,
+                    filename=media.file_name or "voice.ogg",
+                    mimetype=media.mimetype,
+                    model=self.transcribe_model,
+                )
+                return f"[Voice note] {transcript.strip()}"
+            if media.kind == "image":
+                description = await self.llm.complete(
+                    [
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": IMAGE_PROMPT},
+                                {
+                                    "type": "image_url",
+                                    "image_url": {
+                                        "url": await asyncio.to_thread(
+                                            image_data_url, file, media.mimetype
+                                        )
+                                    },
+                                },
+                            ],
+                        }
+                    ],
+                    model=self.vision_model,
+                    max_tokens=400,
+                )
+                return f"[Image] {clean_llm_response(description)}"
+            text, truncated = await asyncio.to_thread(
+                read_text, file, self.document_max_chars
+            )
+            suffix = "\n[... truncated]" if truncated else ""
+            return f"[Document: {name}]\n{text}{suffix}"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.pool.stats(),
+            "spilled_to_disk": self.spilled,
+            "spool_bytes": self.spool_bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,332 @@
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets (seconds) covering fast parses up to slow LLM generations
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Exposition lines for every label set"""
+
+
+class Counter(_Metric):
+    """Monotonic counter; label values are passed positionally"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Unlabelled metrics are exported as 0 before their first update
+        self._values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        # Unlabelled metrics are exported as 0 before their first update
+        self._values: Dict[Tuple[str, ...], float] = {} if labelnames else {(): 0}
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set_function(self, func: Callable[[], float], *labels: str) -> None:
+        """Compute the value at scrape time (e.g. a queue depth)"""
+        self._callbacks[labels] = func
+
+    def unset_function(self, func: Callable[[], float], *labels: str) -> None:
+        """Drop the callback for `labels` if it is still `func`"""
+        if self._callbacks.get(labels) == func:
+            del self._callbacks[labels]
+
+    def remove(self, *labels: str) -> None:
+        self._values.pop(labels, None)
+        self._callbacks.pop(labels, None)
+
+    def value(self, *labels: str) -> float:
+        if labels in self._callbacks:
+            return self._callbacks[labels]()
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        for labels in {**self._values, **self._callbacks}:
+            value = self.value(*labels)
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram. `observe` is a bisect plus two additions, cheap
+    enough to call on every request in production.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the elapsed wall time of its block"""
+        return _Timer(self, labels)
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield (
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} "
+                    f"{cumulative}"
+                )
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {_format_value(total)}"
+            yield f"{self.name}_count{label_str} {count}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Tuple[str, ...]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Histogram:
+        return self.register(
+            Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS)
+        )
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry, like `settings`: import the metric objects where they are recorded
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "whatsapp_bot_stage_seconds",
+    "Time spent in each reply pipeline stage (parse, llm, sanitize, send)",
+    ["stage"],
+)
+WEBHOOK_EVENTS = registry.counter(
+    "whatsapp_bot_webhook_events_total", "Webhook events received by type", ["event"]
+)
+LLM_TOKENS = registry.counter(
+    "whatsapp_bot_llm_tokens_total",
+    "LLM tokens used (in = prompt, out = completion)",
+    ["direction"],
+)
+SEND_FAILURES = registry.counter(
+    "whatsapp_bot_send_failures_total", "Outbound WhatsApp sends that failed for good"
+)
+SEND_RETRIES = registry.counter(
+    "whatsapp_bot_send_retries_total",
+    "Outbound sends retried (Evolution 429s and outbox backoff)",
+)
+OUTBOX_DEAD_LETTERS = registry.counter(
+    "whatsapp_bot_outbox_dead_letters_total",
+    "Outbox messages given up on after their last attempt",
+)
+UPSTREAM_RETRIES = registry.counter(
+    "whatsapp_bot_upstream_retries_total",
+    "Groq/Evolution calls retried by the resilience layer",
+    ["upstream"],
+)
+RETRY_BUDGET_EXHAUSTED = registry.counter(
+    "whatsapp_bot_retry_budget_exhausted_total",
+    "Retries skipped because the upstream's retry budget was used up",
+    ["upstream"],
+)
+HEDGED_REQUESTS = registry.counter(
+    "whatsapp_bot_hedged_requests_total",
+    "Hedged LLM requests (sent = backup started, won = backup answered first)",
+    ["outcome"],
+)
+CIRCUIT_STATE = registry.gauge(
+    "whatsapp_bot_circuit_state",
+    "Upstream circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["upstream"],
+)
+LLM_ROUTE_SECONDS = registry.histogram(
+    "whatsapp_bot_llm_route_seconds",
+    "LLM call latency by route (simple, complex) and the model that served it",
+    ["route", "model"],
+)
+LLM_ROUTE_TOKENS = registry.counter(
+    "whatsapp_bot_llm_route_tokens_total",
+    "LLM tokens used by route (in = prompt, out = completion)",
+    ["route", "direction"],
+)
+LLM_ROUTE_FALLBACKS = registry.counter(
+    "whatsapp_bot_llm_route_fallbacks_total",
+    "LLM calls sent to a fallback model because the routed one was over its latency budget",
+    ["route"],
+)
+COALESCED_BATCHES = registry.counter(
+    "whatsapp_bot_coalesced_batches_total",
+    "LLM requests made for per-sender message batches",
+)
+COALESCED_MESSAGES = registry.counter(
+    "whatsapp_bot_coalesced_messages_total",
+    "Messages answered through per-sender batches (÷ batches = messages per request)",
+)
+MEDIA_JOBS = registry.counter(
+    "whatsapp_bot_media_jobs_total",
+    "Media messages read by kind and outcome (ok, too_large, failed)",
+    ["kind", "outcome"],
+)
+MEDIA_BYTES = registry.counter(
+    "whatsapp_bot_media_bytes_total", "Media bytes downloaded by kind", ["kind"]
+)
+STARTUP_SECONDS = registry.gauge(
+    "whatsapp_bot_startup_seconds",
+    "Cold start time by phase (import, lifespan steps, ready, first_request)",
+    ["phase"],
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    "whatsapp_bot_http_requests_in_flight", "HTTP requests currently being served"
+)
+QUEUE_DEPTH = registry.gauge(
+    "whatsapp_bot_queue_depth", "Jobs waiting in internal queues", ["queue"]
+)
+
+
+class InFlightMiddleware:
+    """Pure ASGI middleware tracking in-flight HTTP requests (no per-request allocation)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            HTTP_IN_FLIGHT.dec()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 
 class WhatsAppMessage(BaseModel):
     number: str
@@ -15,6 +15,139 @@ class WebhookPayload(BaseModel):
     instance: str
     data: Dict[str, Any]
 
+class MediaRef(BaseModel):
+    """Media attached to an inbound message; the file itself is fetched later"""
+    kind: str  # "image", "audio" or "document"
+    mimetype: str = "application/octet-stream"
+    file_name: Optional[str] = None
+    size: Optional[int] = None
+    # Direct download link when Evolution stores media in S3/MinIO; untrusted,
+    # only followed to the hosts in MEDIA_URL_HOSTS
+    url: Optional[str] = None
+
+class IncomingMessage(BaseModel):
+    """Accepted inbound message handed from the webhook to the workers"""
+    instance: str
+    message_id: str
+    sender_jid: str
+    push_name: str
+    text: str
+    # Set for images, voice notes and documents; `text` is then the caption
+    media: Optional[MediaRef] = None
+
+    @property
+    def conversation_id(self) -> str:
+        """History key: the same contact talking to two of our numbers is two chats"""
+        return f"{self.instance}/{self.sender_jid}"
+
+# Typed messages.upsert payload; unknown fields are ignored
+MESSAGES_UPSERT = "messages.upsert"
+
+class MessageKey(BaseModel):
+    remoteJid: str = ""
+    fromMe: bool = False
+    id: str = ""
+    # Group sender, and the phone JID Evolution adds when remoteJid is a LID
+    participant: Optional[str] = None
+    remoteJidAlt: Optional[str] = None
+    senderPn: Optional[str] = None
+
+class ExtendedTextMessage(BaseModel):
+    text: Optional[str] = None
+
+class MediaMessage(BaseModel):
+    mimetype: Optional[str] = None
+    caption: Optional[str] = None
+    fileName: Optional[str] = None
+    # Protobuf uint64: a number, a string or {"low", "high", "unsigned"}
+    fileLength: Any = None
+
+    @property
+    def size(self) -> Optional[int]:
+        value = self.fileLength
+        if isinstance(value, dict):
+            return (int(value.get("high", 0)) << 32) | (int(value.get("low", 0)) & 0xFFFFFFFF)
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+
+class DocumentWithCaption(BaseModel):
+    message: Optional["MessageContent"] = None
+
+class MessageContent(BaseModel):
+    conversation: Optional[str] = None
+    extendedTextMessage: Optional[ExtendedTextMessage] = None
+    imageMessage: Optional[MediaMessage] = None
+    audioMessage: Optional[MediaMessage] = None
+    documentMessage: Optional[MediaMessage] = None
+    # Documents sent with a caption are wrapped one level deeper
+    documentWithCaptionMessage: Optional[DocumentWithCaption] = None
+    # Set by Evolution when media is stored in S3/MinIO
+    mediaUrl: Optional[str] = None
+
+    @property
+    def text(self) -> Optional[str]:
+        if self.conversation:
+            return self.conversation
+        if self.extendedTextMessage:
+            return self.extendedTextMessage.text
+        return None
+
+    @property
+    def media(self) -> Optional[MediaRef]:
+        document = self.documentMessage
+        if document is None and self.documentWithCaptionMessage is not None:
+            inner = self.documentWithCaptionMessage.message
+            document = inner.documentMessage if inner else None
+        for kind, media in (
+            ("image", self.imageMessage),
+            ("audio", self.audioMessage),
+            ("document", document),
+        ):
+            if media is not None:
+                return MediaRef(
+                    kind=kind,
+                    mimetype=media.mimetype or "application/octet-stream",
+                    file_name=media.fileName,
+                    size=media.size,
+                    url=self.mediaUrl,
+                )
+        return None
+
+    @property
+    def caption(self) -> Optional[str]:
+        document = self.documentWithCaptionMessage
+        if document is not None and document.message and document.message.documentMessage:
+            return document.message.documentMessage.caption
+        for media in (self.imageMessage, self.documentMessage):
+            if media is not None and media.caption:
+                return media.caption
+        return None
+
+class MessagesUpsertData(BaseModel):
+    key: MessageKey = Field(default_factory=MessageKey)
+    pushName: Optional[str] = None
+    message: Optional[MessageContent] = None
+
+class MessagesUpsertPayload(BaseModel):
+    event: str
+    instance: str = ""
+    data: MessagesUpsertData = Field(default_factory=MessagesUpsertData)
+
+# connection.update payload: data.state is "open", "connecting" or "close"
+CONNECTION_UPDATE = "connection.update"
+QRCODE_UPDATED = "qrcode.updated"
+
+class ConnectionUpdateData(BaseModel):
+    state: Optional[str] = None
+    statusReason: Optional[int] = None
+
+class ConnectionUpdatePayload(BaseModel):
+    event: str
+    instance: str = ""
+    data: ConnectionUpdateData = Field(default_factory=ConnectionUpdateData)
+
 class HealthResponse(BaseModel):
     status: str
     bot: str
@@ -31,4 +164,14 @@ class TestMessageResponse(BaseModel):
 class WebhookResponse(BaseModel):
     status: str
     message: str
-    your_number: str
\ No newline at end of file
+    your_number: str
+
+class BulkRecipient(BaseModel):
+    number: str
+    message: Optional[str] = None
+
+class BulkSendRequest(BaseModel):
+    """Broadcast body; a recipient's own message overrides `message`"""
+    message: Optional[str] = None
+    recipients: List[Union[str, BulkRecipient]]
+    instance: Optional[str] = None
@@ -0,0 +1,423 @@
+import asyncio
+import logging
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from src.metrics import OUTBOX_DEAD_LETTERS, SEND_RETRIES
+from src.resilience import CircuitOpenError
+from src.scheduler import PRIORITY_REPLY, OutboundQueueFull
+from src.utils import send_whatsapp_message
+
+if TYPE_CHECKING:
+    from src.instances import InstanceRegistry
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+DELIVERED = "delivered"
+DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    instance TEXT NOT NULL,
+    number TEXT NOT NULL,
+    text TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS outbox_recipient ON outbox (instance, number, id);
+"""
+
+# Due rows, skipping any recipient whose earlier message is still waiting
+# (backing off or being sent elsewhere) so each chat stays in order
+_CLAIM = """
+SELECT id, instance, number, text, priority, attempts FROM outbox AS o
+WHERE ((status = 'pending' AND next_attempt_at <= :now)
+       OR (status = 'sending' AND lease_until <= :now))
+  AND NOT EXISTS (
+    SELECT 1 FROM outbox AS e
+    WHERE e.instance = o.instance AND e.number = o.number AND e.id < o.id
+      AND ((e.status = 'pending' AND e.next_attempt_at > :now)
+           OR (e.status = 'sending' AND e.lease_until > :now))
+  )
+ORDER BY priority, id
+LIMIT :limit
+"""
+
+
+class _Row:
+    __slots__ = ("id", "instance", "number", "text", "priority", "attempts")
+
+    def __init__(self, id, instance, number, text, priority, attempts):
+        self.id = id
+        self.instance = instance
+        self.number = number
+        self.text = text
+        self.priority = priority
+        self.attempts = attempts
+
+
+class Outbox:
+    """
+    Durable queue of outbound WhatsApp messages in a local SQLite table.
+    Messages are committed before `enqueue` returns, so they survive a
+    crash or restart. A background dispatcher claims due rows in batches,
+    sends them through the instance's outbound scheduler and marks each one
+    delivered, retries it later with exponential backoff and jitter, or
+    moves it to the dead letters once it runs out of attempts.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        batch_size: int = 100,
+        max_in_flight: int = 500,
+        poll_interval: float = 1.0,
+        max_attempts: int = 8,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        lease_seconds: float = 120.0,
+        retention: float = 86400.0,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.retention = retention
+
+        self.instances: Optional["InstanceRegistry"] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._batches: set = set()
+        self._wakeup = asyncio.Event()
+        # ids claimed by this process and not yet settled
+        self._in_flight: set = set()
+
+        self.enqueued = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dead = 0
+
+    def _run(self, func, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self) -> None:
+        """Open the database; `enqueue` works from here on"""
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="outbox-sqlite")
+        await self._run(self._open)
+
+    def _open(self) -> None:
+        conn = sqlite3.connect(
+            self.path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+
+    def start(self, instances: "InstanceRegistry") -> None:
+        """Deliver through `instances`, starting with rows left from a restart"""
+        self.instances = instances
+        self._dispatcher = asyncio.create_task(
+            self._dispatch_loop(), name="outbox-dispatcher"
+        )
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Send what is due (up to `drain_timeout`), then release unsent rows"""
+        deadline = time.monotonic() + drain_timeout
+        while self._batches and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for task in list(self._batches):
+            task.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._in_flight:
+            # Let the next start (or another process) pick them up right away
+            await self._run(self._release, list(self._in_flight))
+            self._in_flight.clear()
+
+    async def close(self) -> None:
+        if self._executor is None:
+            return
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    async def enqueue(
+        self, instance: str, number: str, text: str, priority: int = PRIORITY_REPLY
+    ) -> int:
+        """Persist a message for delivery; returns its outbox id"""
+        row_id = await self._run(self._insert, instance, number, text, priority)
+        self.enqueued += 1
+        self._wakeup.set()
+        return row_id
+
+    def _insert(self, instance: str, number: str, text: str, priority: int) -> int:
+        now = time.time()
+        cursor = self._conn.execute(
+            "INSERT INTO outbox (instance, number, text, priority, status, "
+            "next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (instance, number, text, priority, PENDING, now, now, now),
+        )
+        return cursor.lastrowid
+
+    def _claim(self, limit: int) -> List[_Row]:
+        conn = self._conn
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [
+                _Row(*row) for row in conn.execute(_CLAIM, {"now": now, "limit": limit})
+            ]
+            conn.executemany(
+                "UPDATE outbox SET status = ?, lease_until = ?, updated_at = ? "
+                "WHERE id = ?",
+                [(SENDING, now + self.lease_seconds, now, row.id) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def _settle(
+        self, updates: List[Tuple[str, int, float, Optional[str], int]]
+    ) -> None:
+        """Apply (status, attempts, next_attempt_at, last_error, id) in one transaction"""
+        now = time.time()
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, "
+                "last_error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                [
+                    (status, attempts, next_at, error, now, row_id)
+                    for status, attempts, next_at, error, row_id in updates
+                ],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _release(self, ids: List[int]) -> None:
+        self._conn.executemany(
+            "UPDATE outbox SET status = ?, lease_until = NULL WHERE id = ? AND status = ?",
+            [(PENDING, row_id, SENDING) for row_id in ids],
+        )
+
+    def _renew(self, ids: List[int]) -> None:
+        until = time.time() + self.lease_seconds
+        self._conn.executemany(
+            "UPDATE outbox SET lease_until = ? WHERE id = ? AND status = ?",
+            [(until, row_id, SENDING) for row_id in ids],
+        )
+
+    def _purge(self) -> None:
+        self._conn.execute(
+            "DELETE FROM outbox WHERE status = ? AND updated_at <= ?",
+            (DELIVERED, time.time() - self.retention),
+        )
+
+    async def _dispatch_loop(self) -> None:
+        next_renew = time.monotonic() + self.lease_seconds / 3
+        next_purge = time.monotonic()
+        while True:
+            # Cleared before claiming so an enqueue during the claim is not missed
+            self._wakeup.clear()
+            room = self.max_in_flight - len(self._in_flight)
+            rows: List[_Row] = []
+            if room > 0:
+                try:
+                    rows = await self._run(self._claim, min(room, self.batch_size))
+                except sqlite3.Error as e:
+                    logger.error(f"❌ Outbox claim failed: {e}")
+            if rows:
+                self._in_flight.update(row.id for row in rows)
+                task = asyncio.create_task(self._send_batch(rows))
+                self._batches.add(task)
+                task.add_done_callback(self._batches.discard)
+                if len(rows) == self.batch_size:
+                    continue
+            else:
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=self.poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+            now = time.monotonic()
+            try:
+                if self._in_flight and now >= next_renew:
+                    await self._run(self._renew, list(self._in_flight))
+                    next_renew = now + self.lease_seconds / 3
+                if now >= next_purge:
+                    await self._run(self._purge)
+                    next_purge = now + 3600
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️  Outbox maintenance failed: {e}")
+
+    async def _send_batch(self, rows: List[_Row]) -> None:
+        # One sequential lane per recipient keeps each chat in order
+        lanes: Dict[Tuple[str, str], List[_Row]] = {}
+        for row in rows:
+            lanes.setdefault((row.instance, row.number), []).append(row)
+        cancelled = False
+        try:
+            results = await asyncio.gather(
+                *(self._send_lane(lane) for lane in lanes.values()),
+                return_exceptions=True,
+            )
+            updates = []
+            for lane, result in zip(lanes.values(), results):
+                if isinstance(result, BaseException):
+                    # Settle what the other lanes did; this lane is retried
+                    logger.error(
+                        f"❌ Outbox lane to {lane[0].number} failed: {result!r}"
+                    )
+                    result = [
+                        (PENDING, row.attempts, time.time(), repr(result), row.id)
+                        for row in lane
+                    ]
+                updates.extend(result)
+            try:
+                await self._run(self._settle, updates)
+            except sqlite3.Error as e:
+                # Rows stay leased and are retried once the lease runs out
+                logger.error(f"❌ Outbox update of {len(updates)} rows failed: {e}")
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                # Cancelled at shutdown: left in flight for stop() to release
+                self._in_flight.difference_update(row.id for row in rows)
+        self._wakeup.set()
+
+    async def _send_lane(
+        self, lane: List[_Row]
+    ) -> List[Tuple[str, int, float, Optional[str], int]]:
+        updates = []
+        for index, row in enumerate(lane):
+            status, next_at, error = await self._send_row(row)
+            updates.append((status, row.attempts + 1, next_at, error, row.id))
+            if status == PENDING:
+                # Hold the rest of this chat behind the failed message
+                updates.extend(
+                    (PENDING, later.attempts, next_at, None, later.id)
+                    for later in lane[index + 1 :]
+                )
+                break
+        return updates
+
+    async def _send_row(self, row: _Row) -> Tuple[str, float, Optional[str]]:
+        instance = self.instances.get(row.instance) if self.instances else None
+        if instance is None:
+            return self._dead(row, f"Unknown instance {row.instance!r}")
+        try:
+            await send_whatsapp_message(
+                instance.outbound, row.number, row.text, priority=row.priority
+            )
+        except httpx.HTTPStatusError as e:
+            status_code = e.response.status_code
+            if 400 <= status_code < 500 and status_code != 429:
+                return self._dead(row, f"HTTP {status_code}: {e.response.text[:200]}")
+            return self._retry(row, f"HTTP {status_code}")
+        except (httpx.HTTPError, OutboundQueueFull, CircuitOpenError) as e:
+            return self._retry(row, f"{type(e).__name__}: {e}")
+        except Exception as e:
+            # e.g. a proxy answering 200 with HTML; never leave the row leased
+            logger.exception(f"❌ Unexpected error sending outbox message {row.id}")
+            return self._retry(row, f"{type(e).__name__}: {e}")
+        self.delivered += 1
+        return DELIVERED, time.time(), None
+
+    def _retry(self, row: _Row, error: str) -> Tuple[str, float, Optional[str]]:
+        attempts = row.attempts + 1
+        if attempts >= self.max_attempts:
+            return self._dead(row, error)
+        # Exponential backoff with jitter in [delay/2, delay]
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        delay = delay / 2 + random.uniform(0, delay / 2)
+        self.retried += 1
+        SEND_RETRIES.inc()
+        logger.warning(
+            f"⏳ Outbox message {row.id} failed ({error}), retry {attempts} in {delay:.1f}s"
+        )
+        return PENDING, time.time() + delay, error
+
+    def _dead(self, row: _Row, error: str) -> Tuple[str, float, Optional[str]]:
+        self.dead += 1
+        OUTBOX_DEAD_LETTERS.inc()
+        logger.error(
+            f"💀 Outbox message {row.id} to {row.number} dead-lettered: {error}"
+        )
+        return DEAD, time.time(), error
+
+    async def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self._run(self._dead_letters, limit)
+
+    def _dead_letters(self, limit: int) -> List[Dict[str, Any]]:
+        cursor = self._conn.execute(
+            "SELECT id, instance, number, text, attempts, last_error, created_at, "
+            "updated_at FROM outbox WHERE status = ? ORDER BY id DESC LIMIT ?",
+            (DEAD, limit),
+        )
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    async def requeue(self, row_id: int) -> bool:
+        """Give a dead letter a fresh set of attempts; False if there is no such row"""
+        requeued = await self._run(self._requeue, row_id)
+        self._wakeup.set()
+        return requeued
+
+    def _requeue(self, row_id: int) -> bool:
+        cursor = self._conn.execute(
+            "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ?, "
+            "updated_at = ? WHERE id = ? AND status = ?",
+            (PENDING, time.time(), time.time(), row_id, DEAD),
+        )
+        return cursor.rowcount == 1
+
+    async def stats(self) -> Dict[str, Any]:
+        counts = await self._run(self._counts)
+        return {
+            "by_status": counts,
+            "in_flight": len(self._in_flight),
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dead_lettered": self.dead,
+        }
+
+    def _counts(self) -> Dict[str, int]:
+        rows = self._conn.execute(
+            "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+        ).fetchall()
+        return {status: count for status, count in rows}
@@ -0,0 +1,45 @@
+import re
+from typing import Container, Optional, Tuple
+
+from fastapi import Request
+
+# Evolution puts "event" first in its payloads, so it shows up in the first chunk
+_EVENT_RE = re.compile(rb'"event"\s*:\s*"([^"\\]{1,64})"')
+_PEEK_BYTES = 1024
+
+
+class PayloadTooLarge(Exception):
+    """Raised when a webhook body exceeds the configured limit"""
+
+
+def peek_event(prefix: bytes) -> Optional[str]:
+    """Event name from the start of a raw webhook body, if present there"""
+    match = _EVENT_RE.search(prefix)
+    return match.group(1).decode("utf-8") if match else None
+
+
+async def read_webhook_body(
+    request: Request, events: Container[str], max_bytes: int
+) -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    Stream the request body, stopping as soon as the leading "event" field
+    shows it is not one of `events`. Returns (peeked event, body); body is
+    None for skipped events, which are never fully read into memory.
+    """
+    chunks = []
+    size = 0
+    peeked: Optional[str] = None
+    peeking = True
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > max_bytes:
+            raise PayloadTooLarge(f"Webhook body larger than {max_bytes} bytes")
+        if peeking:
+            peeked = peek_event(b"".join(chunks)[:_PEEK_BYTES])
+            if peeked is not None and peeked not in events:
+                return peeked, None
+            peeking = peeked is None and size < _PEEK_BYTES
+    return peeked, b"".join(chunks)
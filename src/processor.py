@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+from src.config import settings
+from src.history import estimate_tokens, select_context
+from src.instances import Instance
+from src.llm import LLMClient
+from src.metrics import STAGE_SECONDS
+from src.models import IncomingMessage
+from src.outbox import Outbox
+from src.response_cache import ResponseCache, normalize_prompt
+from src.routing import ModelRouter, Route
+from src.state import StateBackend
+from src.streaming import SentenceChunker, TagStripper
+from src.utils import (
+    LLM_FALLBACK_REPLY,
+    SYSTEM_PROMPT,
+    build_llm_messages,
+    clean_llm_response,
+    get_llm_response,
+    send_whatsapp_message,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MessageProcessor:
+    """
+    Background side of the webhook: generates the AI reply for an accepted
+    message and sends it back through the instance it arrived on. Runs on
+    that instance's worker pool, never in the request.
+    """
+
+    def __init__(
+        self,
+        llm: LLMClient,
+        state: StateBackend,
+        response_cache: Optional[ResponseCache] = None,
+        outbox: Optional[Outbox] = None,
+        router: Optional[ModelRouter] = None,
+    ):
+        self.llm = llm
+        self.state = state
+        self.response_cache = response_cache
+        self.outbox = outbox
+        self.router = router
+
+    def _route(self, instance: Instance, message: IncomingMessage) -> Route:
+        """Model and token limit for this message (the instance model unrouted)"""
+        if self.router is None:
+            return Route("default", instance.model, 500)
+        return self.router.choose(message.text, instance.model)
+
+    def _observe(self, route: Route, started: float) -> None:
+        if self.router is not None:
+            self.router.observe(route, time.perf_counter() - started)
+
+    def _cache_key(
+        self, route: Route, message: IncomingMessage, context: List[Dict[str, str]]
+    ) -> Optional[str]:
+        """
+        Response cache key for `message`, or None when it should not be cached.
+        Only short prompts ("hi", "thanks") are cached, keyed on the context
+        sent with them so a reply never reaches another conversation; longer
+        prompts always hit the LLM, and so do emoji or punctuation alone
+        ("👍", "?"), which normalize to nothing.
+        """
+        if self.response_cache is None:
+            return None
+        normalized = normalize_prompt(message.text)
+        if not normalized or len(normalized) > settings.RESPONSE_CACHE_MAX_PROMPT_CHARS:
+            return None
+        return ResponseCache.make_key(message.text, route.model, SYSTEM_PROMPT, context)
+
+    async def _context(self, message: IncomingMessage) -> List[Dict[str, str]]:
+        """Recent turns that fit in the prompt token budget"""
+        budget = (
+            settings.HISTORY_TOKEN_BUDGET
+            - estimate_tokens(SYSTEM_PROMPT)
+            - estimate_tokens(message.text)
+        )
+        if budget <= 0:
+            return []
+        return select_context(await self.state.turns(message.conversation_id), budget)
+
+    async def generate_reply(
+        self, route: Route, message: IncomingMessage, context: List[Dict[str, str]]
+    ) -> Optional[str]:
+        """Cleaned AI reply for `message`, or None when the LLM call failed"""
+        started = time.perf_counter()
+        response_text = await get_llm_response(
+            self.llm,
+            message.text,
+            context,
+            model=route.model,
+            max_tokens=route.max_tokens,
+            route=route.name,
+        )
+        STAGE_SECONDS.observe(time.perf_counter() - started, "llm")
+        self._observe(route, started)
+        # Full text only at DEBUG; formatted lazily on the logging thread
+        logger.debug("💡 AI Response: %s", response_text)
+        if response_text == LLM_FALLBACK_REPLY:
+            return None
+        with STAGE_SECONDS.time("sanitize"):
+            return clean_llm_response(response_text)
+
+    async def stream_reply(
+        self,
+        instance: Instance,
+        route: Route,
+        message: IncomingMessage,
+        context: List[Dict[str, str]],
+    ) -> Optional[str]:
+        """
+        Stream the AI reply and send each finished sentence or paragraph as
+        soon as it is complete. Sends run in order on a separate task so
+        generation is never blocked on Evolution. Returns the full cleaned
+        reply, or None when the LLM stream failed.
+        """
+        stripper = TagStripper()
+        chunker = SentenceChunker(min_chars=settings.STREAM_MIN_CHUNK_CHARS)
+        chunks: asyncio.Queue = asyncio.Queue()
+        sender = asyncio.create_task(
+            self._send_chunks(instance, message.sender_jid, chunks)
+        )
+        visible: List[str] = []
+        sent_any = False
+        # Time spent stripping/chunking, accumulated across the stream
+        sanitize_seconds = 0.0
+        llm_started = time.perf_counter()
+
+        try:
+            async for delta in self.llm.stream(
+                build_llm_messages(message.text, context),
+                model=route.model,
+                temperature=0.7,
+                max_tokens=route.max_tokens,
+                route=route.name,
+            ):
+                started = time.perf_counter()
+                text = stripper.feed(delta)
+                visible.append(text)
+                for chunk in chunker.feed(text):
+                    chunks.put_nowait(chunk)
+                    sent_any = True
+                sanitize_seconds += time.perf_counter() - started
+            STAGE_SECONDS.observe(time.perf_counter() - llm_started, "llm")
+            STAGE_SECONDS.observe(sanitize_seconds, "sanitize")
+            text = stripper.flush()
+            visible.append(text)
+            for chunk in chunker.feed(text):
+                chunks.put_nowait(chunk)
+            tail = chunker.flush()
+            if tail:
+                chunks.put_nowait(tail)
+        except Exception as e:
+            logger.error("❌ Groq API error: %s", e)
+            if not sent_any:
+                chunks.put_nowait(LLM_FALLBACK_REPLY)
+            return None
+        finally:
+            self._observe(route, llm_started)
+            chunks.put_nowait(None)
+            await sender
+
+        response_text = "".join(visible).strip()
+        logger.debug("💡 AI Response: %s", response_text)
+        return response_text
+
+    async def _send_chunks(
+        self, instance: Instance, sender_jid: str, chunks: asyncio.Queue
+    ) -> None:
+        while True:
+            chunk = await chunks.get()
+            if chunk is None:
+                return
+            await self.send_reply(instance, sender_jid, chunk)
+
+    async def send_reply(self, instance: Instance, sender_jid: str, text: str) -> None:
+        try:
+            if self.outbox is not None:
+                # Committed before we return; the dispatcher delivers and retries it
+                await self.outbox.enqueue(instance.name, sender_jid, text)
+                logger.info("📤 Reply queued for delivery")
+                return
+            await send_whatsapp_message(instance.outbound, sender_jid, text)
+            logger.info("✅ Reply sent successfully!")
+        except Exception:
+            logger.exception("❌ Failed to send reply")
+
+    async def process(self, instance: Instance, message: IncomingMessage) -> None:
+        logger.info(
+            "💬 From: %s (%s) via %s",
+            message.push_name,
+            message.sender_jid,
+            instance.name,
+        )
+        logger.debug("📝 Message: %s", message.text)
+
+        route = self._route(instance, message)
+        context = await self._context(message)
+        cache_key = self._cache_key(route, message, context)
+        cached = self.response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            logger.info("⚡ AI Response served from cache")
+            await self.send_reply(instance, message.sender_jid, cached)
+            await self._remember(message, cached)
+            return
+
+        # Get LLM response
+        logger.info("🤖 Generating AI response (%s, %s)...", route.name, route.model)
+        if settings.STREAM_REPLIES:
+            reply = await self.stream_reply(instance, route, message, context)
+        else:
+            reply = await self.generate_reply(route, message, context)
+            await self.send_reply(
+                instance, message.sender_jid, reply or LLM_FALLBACK_REPLY
+            )
+
+        if reply:
+            if cache_key:
+                self.response_cache.put(cache_key, reply)
+            await self._remember(message, reply)
+
+    async def _remember(self, message: IncomingMessage, reply: str) -> None:
+        await self.state.append_turns(
+            message.conversation_id, [("user", message.text), ("assistant", reply)]
+        )
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, TypeVar
+
+from src.metrics import (
+    CIRCUIT_STATE,
+    HEDGED_REQUESTS,
+    RETRY_BUDGET_EXHAUSTED,
+    UPSTREAM_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Exported as the circuit state gauge value
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and then fails
+    fast for `reset_timeout` seconds. After that one probe call is let
+    through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    def __init__(
+        self, name: str, *, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        CIRCUIT_STATE.set_function(self._state_value, name)
+
+    def _state_value(self) -> int:
+        return _STATE_VALUES[self.current_state]
+
+    @property
+    def current_state(self) -> str:
+        if (
+            self.state == OPEN
+            and time.monotonic() - self.opened_at >= self.reset_timeout
+        ):
+            return HALF_OPEN
+        return self.state
+
+    def check(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now"""
+        state = self.current_state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self.state = HALF_OPEN
+            self._probe_in_flight = True
+            return
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"✅ {self.name} circuit closed")
+        self.state = CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """The probe call was abandoned (cancelled) without an outcome"""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or (
+            self.state == CLOSED and self.failures >= self.failure_threshold
+        ):
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            logger.warning(
+                f"🔌 {self.name} circuit opened after {self.failures} failures, "
+                f"failing fast for {self.reset_timeout:.0f}s"
+            )
+
+    def unregister(self) -> None:
+        CIRCUIT_STATE.unset_function(self._state_value, self.name)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.current_state,
+            "consecutive_failures": self.failures,
+            "times_opened": self.times_opened,
+        }
+
+
+class RetryBudget:
+    """
+    Caps retries (and hedges) at `ratio` of the calls made in the last
+    `window` seconds, plus `min_per_second`, so a struggling upstream gets
+    at most that much extra load instead of N times the traffic.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, *, min_per_second: float = 1.0, window: float = 10.0
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._calls: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window
+        for events in (self._calls, self._retries):
+            while events and events[0] < cutoff:
+                events.popleft()
+
+    def record_call(self) -> None:
+        self._calls.append(time.monotonic())
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False when it is used up"""
+        now = time.monotonic()
+        self._trim(now)
+        allowed = len(self._calls) * self.ratio + self.min_per_second * self.window
+        if len(self._retries) >= allowed:
+            return False
+        self._retries.append(now)
+        return True
+
+
+class LatencyTracker:
+    """Rolling latency percentile used as the hedging delay"""
+
+    def __init__(
+        self,
+        *,
+        percentile: float = 95.0,
+        window: int = 200,
+        min_samples: int = 20,
+        min_delay: float = 0.05,
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._cached: Optional[float] = None
+        self._since_compute = 0
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._since_compute += 1
+
+    def delay(self) -> Optional[float]:
+        """Current percentile, or None until there are enough samples"""
+        if len(self._samples) < self.min_samples:
+            return None
+        # Re-sorting on every call is wasteful; the percentile moves slowly
+        if self._cached is None or self._since_compute >= 10:
+            ordered = sorted(self._samples)
+            index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+            self._cached = max(self.min_delay, ordered[index])
+            self._since_compute = 0
+        return self._cached
+
+
+class UpstreamPolicy:
+    """
+    Shared resilience layer for one upstream: circuit breaker, budgeted
+    retries with jittered backoff and, when a LatencyTracker is given,
+    hedging (a second attempt once the first is slower than the tracked
+    percentile; the first to succeed wins).
+
+    `retryable(e)` says whether an error may be retried; `is_failure(e)`
+    whether it counts against the breaker (a 4xx means the upstream is up).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        breaker: CircuitBreaker,
+        budget: RetryBudget,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        retryable: Callable[[Exception], bool] = lambda e: True,
+        is_failure: Callable[[Exception], bool] = lambda e: True,
+        latency: Optional[LatencyTracker] = None,
+    ):
+        self.name = name
+        self.breaker = breaker
+        self.budget = budget
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retryable = retryable
+        self.is_failure = is_failure
+        self.latency = latency
+
+    def before_call(self) -> None:
+        self.breaker.check()
+        self.budget.record_call()
+
+    def record(self, error: Optional[Exception]) -> None:
+        if error is None or not self.is_failure(error):
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    async def should_retry(self, error: Exception, attempt: int) -> bool:
+        """Decide on (and wait before) retry number `attempt + 1`"""
+        if attempt >= self.max_retries or not self.retryable(error):
+            return False
+        if self.breaker.current_state != CLOSED:
+            return False
+        if not self.budget.try_spend():
+            RETRY_BUDGET_EXHAUSTED.inc(self.name)
+            return False
+        UPSTREAM_RETRIES.inc(self.name)
+        delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+        await asyncio.sleep(random.uniform(delay / 2, delay))
+        return True
+
+    async def call(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Run `func` under the policy; raises CircuitOpenError when open"""
+        self.before_call()
+        attempt = 0
+        while True:
+            try:
+                result = await (
+                    self._hedged(func) if self.latency else self._timed(func)
+                )
+            except asyncio.CancelledError:
+                self.breaker.release_probe()
+                raise
+            except Exception as e:
+                self.record(e)
+                if await self.should_retry(e, attempt):
+                    attempt += 1
+                    continue
+                raise
+            self.record(None)
+            return result
+
+    async def _timed(self, func: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await func()
+        if self.latency is not None:
+            self.latency.observe(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, func: Callable[[], Awaitable[T]]) -> T:
+        delay = self.latency.delay()
+        primary_started = time.monotonic()
+        primary = asyncio.ensure_future(self._timed(func))
+        if delay is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self.budget.try_spend():
+            return await primary
+
+        HEDGED_REQUESTS.inc("sent")
+        backup_started = time.monotonic()
+        backup = asyncio.ensure_future(self._timed(func))
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            HEDGED_REQUESTS.inc("won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            now = time.monotonic()
+            for task, started in ((primary, primary_started), (backup, backup_started)):
+                if not task.done():
+                    task.cancel()
+                    # The loser took at least this long; tracking winners
+                    # only would pull the percentile (the hedge delay) down
+                    self.latency.observe(now - started)
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# Rough per-entry bookkeeping cost on top of the reply bytes
+_ENTRY_OVERHEAD = 128
+
+
+def normalize_prompt(text: str) -> str:
+    """Fold case, punctuation and spacing so near-identical prompts share a key"""
+    text = _PUNCTUATION_RE.sub(" ", text.casefold())
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+class ResponseCache:
+    """
+    LRU + TTL cache of LLM replies keyed on the normalized prompt, model,
+    system prompt and conversation context, bounded by total size in bytes.
+    It can be persisted to a JSON lines file so hot entries survive restarts.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 8 * 1024 * 1024,
+        ttl: float = 86400.0,
+        path: Optional[str] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path = path
+        # key -> (expires_at wall clock, reply)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        text: str,
+        model: str,
+        system_prompt: str,
+        context: Sequence[Dict[str, str]] = (),
+    ) -> str:
+        """
+        `context` is the conversation history sent with the prompt: a reply
+        is only reused for the same prompt after the same turns ("yes" means
+        something else in every conversation).
+        """
+        history = json.dumps(list(context), ensure_ascii=False, sort_keys=True)
+        raw = f"{model}\0{system_prompt}\0{history}\0{normalize_prompt(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _entry_size(reply: str) -> int:
+        return len(reply.encode("utf-8")) + _ENTRY_OVERHEAD
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, reply = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return reply
+
+    def put(self, key: str, reply: str, expires_at: Optional[float] = None) -> None:
+        size = self._entry_size(reply)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at or time.time() + self.ttl, reply)
+        self.size_bytes += size
+        while self.size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, reply = self._entries.pop(key)
+        self.size_bytes -= self._entry_size(reply)
+
+    def load(self) -> int:
+        """Load unexpired entries from `path`; returns how many were restored"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        now = time.time()
+        restored = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["expires_at"] > now:
+                        self.put(record["key"], record["reply"], record["expires_at"])
+                        restored += 1
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"⚠️  Could not load response cache from {self.path}: {e}")
+        return restored
+
+    def save(self) -> int:
+        """Write unexpired entries to `path` atomically; returns how many were saved"""
+        if not self.path:
+            return 0
+        now = time.time()
+        tmp_path = f"{self.path}.tmp"
+        saved = 0
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                # LRU order, so a reload keeps the same recency
+                for key, (expires_at, reply) in self._entries.items():
+                    if expires_at > now:
+                        f.write(
+                            json.dumps(
+                                {"key": key, "expires_at": expires_at, "reply": reply}
+                            )
+                            + "\n"
+                        )
+                        saved += 1
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"⚠️  Could not save response cache to {self.path}: {e}")
+        return saved
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,14 @@
+from typing import Any
+
+import pydantic_core
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by pydantic-core's Rust serializer instead of the
+    stdlib json module. Handles models, datetimes and other types natively.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return pydantic_core.to_json(content)
@@ -1,27 +1,26 @@
-from fastapi import APIRouter, HTTPException
-import requests
+from fastapi import APIRouter, Depends, HTTPException
 import logging
 from src.config import settings
+from src.dependencies import get_evolution_client, get_outbound_scheduler
+from src.evolution import EvolutionClient
+from src.scheduler import PRIORITY_TEST, OutboundScheduler
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/debug", tags=["Debug"])
 
 
 @router.get("/test-connection")
-async def test_evolution_connection():
+async def test_evolution_connection(
+    client: EvolutionClient = Depends(get_evolution_client),
+):
     """Test Evolution API connection directly"""
     try:
-        base_url = settings.EVOLUTION_API_URL.rstrip("/")
-        url = f"{base_url}/instance/connectionState/{settings.INSTANCE_NAME}"
+        path = f"/instance/connectionState/{settings.INSTANCE_NAME}"
+        url = client.url(path)
 
         logger.info(f"Testing connection to: {url}")
 
-        response = requests.get(
-            url,
-            headers=settings.evolution_headers,
-            timeout=10,
-            verify=settings.SSL_VERIFY,
-        )
+        response = await client.request("GET", path, timeout=10)
 
         return {
             "url": url,
@@ -36,13 +35,18 @@ async def test_evolution_connection():
 
 
 @router.post("/test-send")
-async def test_send_message():
+async def test_send_message(
+    scheduler: OutboundScheduler = Depends(get_outbound_scheduler),
+):
     """Test sending a message with detailed logging"""
     try:
         from src.utils import send_whatsapp_message
 
-        result = send_whatsapp_message(
-            settings.YOUR_PHONE_NUMBER, "Test message from debug endpoint"
+        result = await send_whatsapp_message(
+            scheduler,
+            settings.YOUR_PHONE_NUMBER,
+            "Test message from debug endpoint",
+            priority=PRIORITY_TEST,
         )
 
         return {"status": "success", "message": "Test message sent", "result": result}
@@ -71,12 +75,11 @@ async def show_config():
 
 
 @router.get("/test-api-key")
-async def test_api_key():
+async def test_api_key(client: EvolutionClient = Depends(get_evolution_client)):
     """Test if API key is working"""
     try:
-        base_url = settings.EVOLUTION_API_URL.rstrip("/")
-
-        url = f"{base_url}/instance/fetchInstances"
+        path = "/instance/fetchInstances"
+        url = client.url(path)
 
         logger.info(f"Testing API key with URL: {url}")
         logger.info(
@@ -94,15 +97,9 @@ async def test_api_key():
 
         # Log actual headers being sent
         actual_headers = settings.evolution_headers.copy()
-        print(actual_headers)  # For immediate visibility in console
-        logger.info(f"Headers being sent: {actual_headers}")
-
-        response = requests.get(
-            url,
-            headers=actual_headers,
-            timeout=10,
-            verify=settings.SSL_VERIFY,
-        )
+        logger.info("Headers being sent: %s", list(actual_headers))
+
+        response = await client.request("GET", path, headers=actual_headers, timeout=10)
 
         # Also check what the server received
         logger.info(f"Response status: {response.status_code}")
@@ -135,10 +132,12 @@ async def test_api_key():
 
 
 @router.get("/test-headers")
-async def test_different_headers():
+async def test_different_headers(
+    client: EvolutionClient = Depends(get_evolution_client),
+):
     """Test different header variations to find the correct format"""
-    base_url = settings.EVOLUTION_API_URL.rstrip("/")
-    url = f"{base_url}/instance/fetchInstances"
+    path = "/instance/fetchInstances"
+    url = client.url(path)
 
     results = []
 
@@ -156,9 +155,7 @@ async def test_different_headers():
 
     for i, headers in enumerate(header_variations):
         try:
-            response = requests.get(
-                url, headers=headers, timeout=10, verify=settings.SSL_VERIFY
-            )
+            response = await client.request("GET", path, headers=headers, timeout=10)
             header_name = list(headers.keys())[0]  # Get first key name
             results.append(
                 {
@@ -1,49 +1,74 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse
 import json
 import os
-import requests
 from src.config import settings
+from src.connection_monitor import ConnectionMonitor
+from src.dependencies import get_connection_monitor, get_loop_monitor, get_startup_report
+from src.loop_monitor import LoopLagMonitor
 from src.models import HealthResponse
+from src.startup import StartupReport
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/health", tags=["Health"])
 
 @router.get("/", response_model=HealthResponse)
-async def health_check():
-    """Check Evolution API connection and bot status"""
-    try:
-        # Check instance connection state
-        url = f"{settings.EVOLUTION_API_URL}/instance/connectionState/{settings.INSTANCE_NAME}"
-        response = requests.get(
-            url, 
-            headers=settings.evolution_headers, 
-            timeout=10,
-            verify=settings.SSL_VERIFY
-        )
-        state_info = response.json()
-        
+async def health_check(monitor: ConnectionMonitor = Depends(get_connection_monitor)):
+    """Bot status and the cached Evolution API connection state"""
+    snapshot = monitor.snapshot()
+    if snapshot["connected"]:
         return HealthResponse(
             status="healthy",
             bot="running",
             your_number=settings.YOUR_PHONE_NUMBER,
             evolution_api={
-                "connected": True,
-                "state": state_info.get("state"),
+                **snapshot,
                 "instance": settings.INSTANCE_NAME,
                 "url": settings.EVOLUTION_API_URL
             },
             timestamp=json.dumps({"timestamp": os.times()}, default=str)
         )
-    except Exception as e:
-        return HealthResponse(
-            status="partially_healthy",
-            bot="running",
-            your_number=settings.YOUR_PHONE_NUMBER,
-            evolution_api={
-                "connected": False,
-                "error": str(e),
-                "url": settings.EVOLUTION_API_URL
-            },
-            timestamp=json.dumps({"timestamp": os.times()}, default=str)
-        )
\ No newline at end of file
+    return HealthResponse(
+        status="partially_healthy",
+        bot="running",
+        your_number=settings.YOUR_PHONE_NUMBER,
+        evolution_api={
+            **snapshot,
+            "url": settings.EVOLUTION_API_URL
+        },
+        timestamp=json.dumps({"timestamp": os.times()}, default=str)
+    )
+
+@router.get("/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@router.get("/ready")
+async def readiness(monitor: ConnectionMonitor = Depends(get_connection_monitor)):
+    """
+    Readiness probe: Evolution API was reachable on the last recent check
+    (and WhatsApp logged in, with HEALTH_READY_REQUIRES_WHATSAPP)
+    """
+    if monitor.is_ready:
+        return {"status": "ready", "state": monitor.state}
+    return JSONResponse(
+        status_code=503,
+        content={"status": "not_ready", "state": monitor.state, "error": monitor.error},
+    )
+
+@router.get("/loop")
+async def event_loop_lag(
+    reset: bool = False, monitor: LoopLagMonitor = Depends(get_loop_monitor)
+):
+    """Recent event-loop lag percentiles; `reset=true` starts a new window"""
+    stats = monitor.stats()
+    if reset:
+        monitor.reset()
+    return stats
+
+@router.get("/startup")
+async def startup_timings(report: StartupReport = Depends(get_startup_report)):
+    """Where cold start time went: import, each startup step, ready and first request"""
+    return report.report()
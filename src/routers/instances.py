@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from src.dependencies import get_instance_registry
+from src.instances import InstanceRegistry
+
+router = APIRouter(prefix="/instances", tags=["Instances"])
+
+
+@router.get("/")
+async def list_instances(
+    instances: InstanceRegistry = Depends(get_instance_registry),
+):
+    """Instances served by this deployment with their queue and send counters"""
+    return {"default": instances.default_name, "instances": instances.stats()}
+
+
+@router.post("/reload")
+async def reload_instances(
+    instances: InstanceRegistry = Depends(get_instance_registry),
+):
+    """Re-read INSTANCES_FILE now instead of waiting for the next poll"""
+    return await instances.reload()
@@ -0,0 +1,39 @@
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+
+from src.dependencies import get_logging_control
+from src.logging_setup import LoggingControl
+
+router = APIRouter(prefix="/logging", tags=["Logging"])
+
+
+class LoggingUpdate(BaseModel):
+    logger: str = ""  # "" is the root logger
+    level: Optional[str] = None
+    sample_rate: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+
+
+@router.get("/")
+async def logging_settings(control: LoggingControl = Depends(get_logging_control)):
+    """Logger levels, sampling rates and log queue counters"""
+    return control.stats()
+
+
+@router.put("/")
+async def update_logging(
+    update: LoggingUpdate,
+    control: LoggingControl = Depends(get_logging_control),
+):
+    """Change a logger's level and/or sampling rate without a restart"""
+    if update.level is not None:
+        if not isinstance(logging.getLevelName(update.level.upper()), int):
+            raise HTTPException(
+                status_code=422, detail=f"Unknown level: {update.level}"
+            )
+        control.set_level(update.logger, update.level)
+    if update.sample_rate is not None:
+        control.set_sample_rate(update.logger, update.sample_rate)
+    return control.stats()
@@ -1,19 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile
+from typing import AsyncIterator, Optional
+from src.broadcast import BroadcastManager, parse_upload
 from src.config import settings
+from src.dependencies import (
+    get_broadcasts, get_instance_registry, get_outbound_scheduler, get_outbox
+)
+from src.instances import InstanceRegistry
+from src.outbox import Outbox
+from src.scheduler import PRIORITY_BULK, PRIORITY_TEST, OutboundScheduler
 from src.utils import send_whatsapp_message
-from src.models import TestMessageResponse
+from src.models import BulkRecipient, BulkSendRequest, TestMessageResponse
 import logging
+import pydantic_core
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/messages", tags=["Messages"])
 
 @router.post("/test", response_model=TestMessageResponse)
-async def send_test_message():
+async def send_test_message(
+    scheduler: OutboundScheduler = Depends(get_outbound_scheduler),
+):
     """Send a test message to yourself"""
     try:
-        result = send_whatsapp_message(
+        result = await send_whatsapp_message(
+            scheduler,
             settings.YOUR_PHONE_NUMBER, 
-            "Hello from the bot! This is a test message."
+            "Hello from the bot! This is a test message.",
+            priority=PRIORITY_TEST,
         )
         return TestMessageResponse(
             status="success",
@@ -27,10 +43,21 @@ async def send_test_message():
         )
 
 @router.post("/send")
-async def send_custom_message(number: str, message: str):
-    """Send a custom message to any number (for testing)"""
+async def send_custom_message(
+    number: str,
+    message: str,
+    instance: Optional[str] = None,
+    instances: InstanceRegistry = Depends(get_instance_registry),
+):
+    """Send a custom message to any number (for testing), optionally from another instance"""
+    sender = instances.get(instance)
+    if sender is None:
+        raise HTTPException(status_code=404, detail=f"Unknown instance: {instance}")
+    scheduler = sender.outbound
     try:
-        result = send_whatsapp_message(number, message)
+        result = await send_whatsapp_message(
+            scheduler, number, message, priority=PRIORITY_BULK
+        )
         return {
             "status": "success",
             "message": f"Message sent to {number}",
@@ -40,4 +67,138 @@ async def send_custom_message(number: str, message: str):
         raise HTTPException(
             status_code=500,
             detail=f"Failed to send message: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+async def _ndjson(first: dict, events: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    yield pydantic_core.to_json(first) + b"\n"
+    async for event in events:
+        yield pydantic_core.to_json(event) + b"\n"
+
+async def _bulk_response(broadcasts: BroadcastManager, job_id: str, stream: bool):
+    if not stream:
+        return {"job_id": job_id, **(await broadcasts.status(job_id))}
+    # Subscribe before the job gets a chance to send anything
+    events = broadcasts.follow(job_id)
+    status = await broadcasts.status(job_id)
+    return StreamingResponse(
+        _ndjson({"job_id": job_id, **status}, events),
+        media_type="application/x-ndjson",
+    )
+
+@router.post("/send-bulk")
+async def send_bulk_message(
+    request: Request,
+    stream: bool = True,
+    instances: InstanceRegistry = Depends(get_instance_registry),
+    broadcasts: BroadcastManager = Depends(get_broadcasts),
+):
+    """
+    Send one message to many recipients. Accepts a JSON body
+    (`message`, `recipients`, `instance`) or a multipart upload with a
+    CSV/JSONL `file` plus `message`/`instance` form fields. Streams one
+    NDJSON line per recipient (the first line has the job id, the last
+    the totals); `stream=false` returns the job id right away instead.
+    """
+    content_type = request.headers.get("content-type", "")
+    form = None
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise HTTPException(status_code=422, detail="Missing file upload")
+            message = form.get("message") or None
+            instance_name = form.get("instance") or None
+            recipients = parse_upload(upload.file, upload.filename, upload.content_type)
+        else:
+            try:
+                body = BulkSendRequest.model_validate_json(await request.body())
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+            message = body.message
+            instance_name = body.instance
+            recipients = (
+                (item.number, item.message) if isinstance(item, BulkRecipient) else (item, None)
+                for item in body.recipients
+            )
+        instance = instances.get(instance_name)
+        if instance is None:
+            raise HTTPException(status_code=404, detail=f"Unknown instance: {instance_name}")
+        try:
+            job_id, total = await broadcasts.create(instance.name, message, recipients)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    finally:
+        if form is not None:
+            await form.close()
+
+    await broadcasts.resume(job_id)
+    return await _bulk_response(broadcasts, job_id, stream)
+
+@router.post("/send-bulk/{job_id}/resume")
+async def resume_bulk_message(
+    job_id: str,
+    retry_failed: bool = False,
+    stream: bool = True,
+    broadcasts: BroadcastManager = Depends(get_broadcasts),
+):
+    """Continue an interrupted broadcast; already-sent recipients are skipped"""
+    if not await broadcasts.resume(job_id, retry_failed=retry_failed):
+        raise HTTPException(status_code=404, detail=f"Unknown broadcast: {job_id}")
+    return await _bulk_response(broadcasts, job_id, stream)
+
+@router.get("/send-bulk/{job_id}")
+async def bulk_message_status(
+    job_id: str,
+    broadcasts: BroadcastManager = Depends(get_broadcasts),
+):
+    """Recipient counts (sent, failed, pending) of a broadcast"""
+    status = await broadcasts.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Unknown broadcast: {job_id}")
+    return {"job_id": job_id, **status}
+
+@router.get("/send-bulk/{job_id}/failures")
+async def bulk_message_failures(
+    job_id: str,
+    limit: int = 100,
+    broadcasts: BroadcastManager = Depends(get_broadcasts),
+):
+    """Recipients whose send failed, with the error"""
+    return await broadcasts.failures(job_id, limit)
+
+@router.get("/queue")
+async def outbound_queue_stats(
+    scheduler: OutboundScheduler = Depends(get_outbound_scheduler),
+):
+    """Outbound send queue depth, wait times and rate-limit counters"""
+    return scheduler.stats()
+
+@router.get("/outbox")
+async def outbox_stats(outbox: Optional[Outbox] = Depends(get_outbox)):
+    """Durable outbox row counts by status and dispatcher counters"""
+    if outbox is None:
+        return {"enabled": False}
+    return {"enabled": True, **(await outbox.stats())}
+
+@router.get("/outbox/dead")
+async def outbox_dead_letters(
+    limit: int = 100,
+    outbox: Optional[Outbox] = Depends(get_outbox),
+):
+    """Messages that ran out of delivery attempts, newest first"""
+    if outbox is None:
+        raise HTTPException(status_code=404, detail="Outbox disabled")
+    return await outbox.dead_letters(limit)
+
+@router.post("/outbox/dead/{message_id}/retry")
+async def retry_dead_letter(
+    message_id: int,
+    outbox: Optional[Outbox] = Depends(get_outbox),
+):
+    """Queue a dead-lettered message for delivery again"""
+    if outbox is None:
+        raise HTTPException(status_code=404, detail="Outbox disabled")
+    if not await outbox.requeue(message_id):
+        raise HTTPException(status_code=404, detail=f"No dead letter {message_id}")
+    return {"status": "success", "message": f"Message {message_id} requeued"}
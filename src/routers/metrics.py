@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from src.dependencies import get_model_router
+from src.metrics import registry
+from src.routing import ModelRouter
+
+router = APIRouter(tags=["Metrics"])
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Pipeline stage latencies, event/token/send counters and queue gauges"""
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+
+@router.get("/metrics/routes")
+async def route_stats(model_router: Optional[ModelRouter] = Depends(get_model_router)):
+    """Per-route request counts, latency percentiles and tokens for tuning the router"""
+    if model_router is None:
+        return {"enabled": False}
+    return {"enabled": True, **model_router.stats()}
@@ -1,106 +1,295 @@
-from fastapi import APIRouter, Request, HTTPException
-import json
+from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi.responses import JSONResponse, Response
 import logging
+import time
+import pydantic_core
+from pydantic import ValidationError
 from src.config import settings
-from src.utils import is_my_number, send_whatsapp_message, get_llm_response
-from src.models import WebhookResponse
-import re
+from src.dedup import DedupCache
+from src.access import AccessControl
+from src.capture import WebhookCapture
+from src.coalescer import SenderCoalescer
+from src.dependencies import (
+    get_access_control,
+    get_capture,
+    get_coalescer,
+    get_instance_registry,
+    get_media_pipeline,
+    get_response_cache,
+    get_state_backend,
+)
+from src.events import EventDispatcher, metric_label, normalize_event
+from src.instances import InstanceRegistry
+from src.media import MediaPipeline
+from src.models import (
+    CONNECTION_UPDATE,
+    MESSAGES_UPSERT,
+    QRCODE_UPDATED,
+    ConnectionUpdatePayload,
+    IncomingMessage,
+    MessagesUpsertPayload,
+    WebhookResponse,
+)
+from src.metrics import STAGE_SECONDS, WEBHOOK_EVENTS
+from src.payloads import PayloadTooLarge, read_webhook_body
+from src.response_cache import ResponseCache
+from src.state import StateBackend
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/webhook", tags=["Webhook"])
 
+# Handlers of the events we act on; every other event gets a no-op ack
+dispatcher = EventDispatcher()
+
 # logger.info(f"📨 Received webhook event: {event_type}")
 # # Log the full payload for debugging
 # logger.info(f"📋 Full webhook data: {json.dumps(webhook_data, indent=2)}")
 
 
-@router.post("/messages-upsert", response_model=WebhookResponse)
-async def webhook_handler(request: Request):
+def _response(message: str, status: str = "success") -> WebhookResponse:
+    return WebhookResponse(
+        status=status, message=message, your_number=settings.YOUR_PHONE_NUMBER
+    )
+
+
+# Ignored events are acked with pre-rendered bytes: no model, no serialisation
+_IGNORED_BODY = pydantic_core.to_json(_response("Event ignored"))
+
+
+def _ignored() -> Response:
+    return Response(content=_IGNORED_BODY, media_type="application/json")
+
+
+def _capture(request: Request, event: Optional[str], body: Optional[bytes]) -> None:
+    """Queue the webhook for WEBHOOK_CAPTURE_FILE, when capturing"""
+    capture: Optional[WebhookCapture] = get_capture(request)
+    if capture is not None:
+        capture.record(request.scope["path"], event, body)
+
+
+@router.post("/", response_model=WebhookResponse)
+@router.post("/{event}", response_model=WebhookResponse)
+async def webhook_handler(request: Request, event: Optional[str] = None):
     """
-    Webhook endpoint for Evolution API messages
-    Processes incoming WhatsApp messages and sends auto-reply
+    Webhook endpoint for Evolution API events, both the single URL and the
+    per-event URLs used with `webhook_by_events` (e.g. /webhook/connection-update).
+    Events are dispatched by name; ones without a handler are acknowledged
+    so Evolution does not retry them.
     """
     try:
-        # Parse webhook payload
-        webhook_data = await request.json()
-        event_type = webhook_data.get("event")
-
-        logger.info(f"📨 Event: {event_type}")
-
-        # Process message upsert events
-        if event_type == "messages.upsert":
-            data = webhook_data.get("data", {})
-
-            # Extract message details
-            key = data.get("key", {})
-            sender_jid = key.get("remoteJid", "")
-            from_me = key.get("fromMe", False)
-            push_name = data.get("pushName", "Unknown")
-
-            # # Skip messages sent by the bot
-            # if from_me:
-            #     logger.info("⏭️  Skipping outgoing message")
-            #     return WebhookResponse(
-            #         status="success",
-            #         message="Skipped outgoing message",
-            #         your_number=settings.YOUR_PHONE_NUMBER,
-            #     )
-
-            # Extract message text
-            message_data = data.get("message", {})
-            text = message_data.get("conversation") or message_data.get(
-                "extendedTextMessage", {}
-            ).get("text")
-
-            if text and is_my_number(sender_jid):
-                logger.info(f"💬 From: {push_name} ({sender_jid})")
-                logger.info(f"📝 Message: {text}")
-
-                # Get LLM response
-                logger.info("🤖 Generating AI response...")
-                response_text = get_llm_response(text)
-                cleaned_response = re.sub(
-                    r"<think>.*?</think>", "", response_text, flags=re.DOTALL
-                )
-
-                # Remove <prompt> tags if present
-                cleaned_response = re.sub(
-                    r"<prompt>.*?</prompt>", "", cleaned_response, flags=re.DOTALL
-                )
-
-                # Clean up extra whitespace
-                cleaned_response = cleaned_response.strip()
-                logger.info(f"💡 AI Response: {response_text}")
-
-                try:
-                    # logger.info(f"📤 Sending reply: {response_text}")
-                    result = send_whatsapp_message(sender_jid, cleaned_response)
-                    logger.info(f"✅ Reply sent successfully!")
-                except Exception as e:
-                    logger.error(f"❌ Failed to send reply: {e}")
-                    import traceback
-
-                    logger.error(traceback.format_exc())
-
-        # Return success response
-        return WebhookResponse(
-            status="success",
-            message="Webhook processed",
-            your_number=settings.YOUR_PHONE_NUMBER,
+        if event is not None and event not in dispatcher:
+            # Known from the URL alone: ack without reading the body
+            WEBHOOK_EVENTS.inc(metric_label(normalize_event(event)))
+            _capture(request, event, None)
+            return _ignored()
+
+        # Skip events we don't handle before reading the whole body
+        parse_started = time.perf_counter()
+        peeked_event, body = await read_webhook_body(
+            request, dispatcher, settings.WEBHOOK_MAX_BODY_BYTES
         )
+        _capture(request, event or peeked_event, body)
+        if body is None:
+            WEBHOOK_EVENTS.inc(metric_label(normalize_event(peeked_event)))
+            logger.debug("📨 Event: %s (ignored)", peeked_event)
+            return _ignored()
+
+        name = event or peeked_event
+        handler = dispatcher.get(name) if name else None
+        if handler is None:
+            # No "event" in the first bytes: take it from the parsed body
+            parsed = pydantic_core.from_json(body)
+            name = (parsed.get("event") if isinstance(parsed, dict) else None) or ""
+            handler = dispatcher.get(name)
+            if handler is None:
+                WEBHOOK_EVENTS.inc(metric_label(normalize_event(name)))
+                return _ignored()
+        STAGE_SECONDS.observe(time.perf_counter() - parse_started, "parse")
+        WEBHOOK_EVENTS.inc(normalize_event(name))
+        return await handler(request, body)
 
-    except json.JSONDecodeError:
-        logger.error("❌ Invalid JSON in webhook")
-        return WebhookResponse(
-            status="error",
-            message="Invalid JSON",
-            your_number=settings.YOUR_PHONE_NUMBER,
+    except (ValidationError, ValueError) as e:
+        logger.error("❌ Invalid webhook payload: %s", e)
+        return _response("Invalid payload", status="error")
+    except PayloadTooLarge as e:
+        logger.error("❌ %s", e)
+        return JSONResponse(
+            status_code=413,
+            content=_response(str(e), status="error").model_dump(),
         )
     except Exception as e:
-        logger.error(f"❌ Webhook error: {e}")
-        import traceback
+        logger.exception("❌ Webhook error: %s", e)
+        return _response(str(e), status="error")
 
-        logger.error(traceback.format_exc())
-        return WebhookResponse(
-            status="error", message=str(e), your_number=settings.YOUR_PHONE_NUMBER
+
+@dispatcher.on(MESSAGES_UPSERT)
+async def handle_messages_upsert(request: Request, body: bytes):
+    """Validate an incoming WhatsApp message and queue it for auto-reply"""
+    instances: InstanceRegistry = get_instance_registry(request)
+    store: StateBackend = get_state_backend(request)
+    access: AccessControl = get_access_control(request)
+    media_pipeline: Optional[MediaPipeline] = get_media_pipeline(request)
+    coalescer: SenderCoalescer = get_coalescer(request)
+
+    # Parse and validate the payload in one pass
+    payload = MessagesUpsertPayload.model_validate_json(body)
+    logger.debug("📨 Event: %s", payload.event)
+
+    # Route to the instance (WhatsApp number) the event arrived on
+    instance = instances.get(payload.instance)
+    if instance is None:
+        logger.warning("⚠️  Unknown instance %r, ignoring", payload.instance)
+        return _response("Unknown instance ignored")
+
+    data = payload.data
+
+    # Extract message details
+    key = data.key
+    sender_jid = key.remoteJid
+    from_me = key.fromMe
+    push_name = data.pushName or "Unknown"
+
+    # # Skip messages sent by the bot
+    # if from_me:
+    #     logger.info("⏭️  Skipping outgoing message")
+    #     return _response("Skipped outgoing message")
+
+    # Extract message text; images, voice notes and documents carry a media
+    # reference (fetched later, on the media workers) and an optional caption
+    text = data.message.text if data.message else None
+    media = data.message.media if data.message and media_pipeline else None
+    if media is not None:
+        text = data.message.caption or ""
+
+    allowed = (text or media) and access.allows(
+        sender_jid,
+        owner=instance.config.owner_number,
+        alt_jid=key.remoteJidAlt or key.senderPn,
+    )
+    if allowed:
+        # Drop Evolution redeliveries before any LLM work
+        message_id = key.id
+        dedup_key = DedupCache.make_key(sender_jid, message_id, instance.name)
+        if message_id and await store.seen(dedup_key):
+            logger.info("🔁 Duplicate message %s, skipping", message_id)
+            return _response("Duplicate ignored")
+
+        message = IncomingMessage(
+            instance=instance.name,
+            message_id=message_id,
+            sender_jid=sender_jid,
+            push_name=push_name,
+            text=text,
+            media=media,
         )
+        # Hand off to the worker pool and acknowledge immediately. Same-sender
+        # messages, media included, wait in their lane and are answered in order
+        queued = coalescer.submit(instance, message)
+        if not queued:
+            # Let the redelivery through once there is room again
+            await store.forget(dedup_key)
+            logger.warning(
+                "⏳ Webhook queue for %s full (%d), asking for retry",
+                instance.name,
+                instance.pool.depth + coalescer.depth,
+            )
+            return JSONResponse(
+                status_code=503,
+                headers={"Retry-After": str(settings.WEBHOOK_RETRY_AFTER)},
+                content=_response(
+                    "Queue full, retry later", status="error"
+                ).model_dump(),
+            )
+
+    # Return success response
+    return _response("Webhook accepted")
+
+
+@dispatcher.on(CONNECTION_UPDATE)
+async def handle_connection_update(request: Request, body: bytes):
+    """Push the instance's WhatsApp connection state into its cache"""
+    instances: InstanceRegistry = get_instance_registry(request)
+    payload = ConnectionUpdatePayload.model_validate_json(body)
+    instance = instances.get(payload.instance)
+    if instance is None:
+        return _response("Unknown instance ignored")
+    if payload.data.state:
+        instance.connection.update(payload.data.state, pushed=True)
+    return _response("Connection state updated")
+
+
+@dispatcher.on(QRCODE_UPDATED)
+async def handle_qrcode_updated(request: Request, body: bytes):
+    """A new pairing QR code means the number is logged out"""
+    payload = pydantic_core.from_json(body)
+    instance = payload.get("instance") if isinstance(payload, dict) else None
+    logger.warning(
+        "📷 New QR code for instance %r: WhatsApp needs to be paired again",
+        instance,
+    )
+    return _response("QR code noted")
+
+
+@router.get("/queue")
+async def webhook_queue_stats(
+    instances: InstanceRegistry = Depends(get_instance_registry),
+):
+    """Current webhook queue depth and worker pool counters per instance"""
+    return {instance.name: instance.pool.stats() for instance in instances}
+
+
+@router.get("/capture")
+async def webhook_capture_stats(
+    capture: Optional[WebhookCapture] = Depends(get_capture),
+):
+    """Webhook capture counters (WEBHOOK_CAPTURE_FILE), for bench/replay.py"""
+    if capture is None:
+        return {"enabled": False}
+    return {"enabled": True, **capture.stats()}
+
+
+@router.get("/coalesce")
+async def webhook_coalesce_stats(
+    coalescer: SenderCoalescer = Depends(get_coalescer),
+):
+    """Per-sender lanes and how many messages each LLM request answered"""
+    return coalescer.stats()
+
+
+@router.get("/media")
+async def webhook_media_stats(
+    media: Optional[MediaPipeline] = Depends(get_media_pipeline),
+):
+    """Media worker pool counters and spool limits"""
+    if media is None:
+        return {"enabled": False}
+    return {"enabled": True, **media.stats()}
+
+
+@router.get("/dedup")
+async def webhook_dedup_stats(store: StateBackend = Depends(get_state_backend)):
+    """Redelivery dedup cache size and hit/miss counters"""
+    return {"backend": store.name, **store.stats()["dedup"]}
+
+
+@router.get("/access")
+async def webhook_access_stats(access: AccessControl = Depends(get_access_control)):
+    """Access list size and allowed/denied sender counters"""
+    return access.stats()
+
+
+@router.post("/access/reload")
+async def webhook_access_reload(access: AccessControl = Depends(get_access_control)):
+    """Re-read ACCESS_LIST_FILE now instead of waiting for the next poll"""
+    return await access.reload()
+
+
+@router.get("/response-cache")
+async def webhook_response_cache_stats(
+    cache: Optional[ResponseCache] = Depends(get_response_cache),
+):
+    """LLM response cache size and hit-rate"""
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
@@ -0,0 +1,230 @@
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Sequence, Tuple
+
+from src.config import Settings
+from src.metrics import LLM_ROUTE_FALLBACKS, LLM_ROUTE_SECONDS, LLM_ROUTE_TOKENS
+
+SIMPLE = "simple"
+COMPLEX = "complex"
+
+# Requests for real work go to the large model however short they are
+_COMPLEX_RE = re.compile(
+    r"\b(explain|why|how (?:do|does|can|to)|compare|analy[sz]e|write|code|"
+    r"translate|summari[sz]e|step[- ]by[- ]step|plan|difference|calculate)\b",
+    re.IGNORECASE,
+)
+
+
+def is_simple(text: str, max_chars: int) -> bool:
+    """
+    Small talk and one-liners ("ok thanks", "good morning", "what time do
+    you open?"): short, a single line, and not asking for reasoning.
+    """
+    text = text.strip()
+    return (
+        len(text) <= max_chars
+        and "\n" not in text
+        and "```" not in text
+        and _COMPLEX_RE.search(text) is None
+    )
+
+
+class LatencyWindow:
+    """
+    Latencies seen in the last `window` seconds. Old samples expire, so a
+    model that was slow and stopped receiving traffic becomes eligible
+    again once its bad samples age out.
+    """
+
+    def __init__(self, window: float = 120.0, max_samples: int = 1000):
+        self.window = window
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        # percentile -> (value, computed at); the percentile moves slowly
+        self._cached: Dict[float, Tuple[Optional[float], float]] = {}
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append((time.monotonic(), seconds))
+
+    def _prune(self, now: float) -> None:
+        horizon = now - self.window
+        while self._samples and self._samples[0][0] < horizon:
+            self._samples.popleft()
+
+    def __len__(self) -> int:
+        self._prune(time.monotonic())
+        return len(self._samples)
+
+    def percentile(self, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """Latency percentile over the window, None below `min_samples`"""
+        now = time.monotonic()
+        cached = self._cached.get(percentile)
+        if cached is not None and now - cached[1] < 1.0:
+            value = cached[0]
+        else:
+            self._prune(now)
+            ordered = sorted(seconds for _, seconds in self._samples)
+            value = None
+            if ordered:
+                index = min(len(ordered) - 1, int(len(ordered) * percentile / 100))
+                value = ordered[index]
+            self._cached[percentile] = (value, now)
+        return value if len(self._samples) >= min_samples else None
+
+
+class Route:
+    """Where one LLM call goes: the route name, model and token limit"""
+
+    __slots__ = ("name", "model", "max_tokens", "fallback")
+
+    def __init__(self, name: str, model: str, max_tokens: int, fallback: bool = False):
+        self.name = name
+        self.model = model
+        self.max_tokens = max_tokens
+        self.fallback = fallback
+
+    def __repr__(self) -> str:
+        return f"Route({self.name!r}, {self.model!r}, fallback={self.fallback})"
+
+
+class ModelRouter:
+    """
+    Picks the model for each reply: short, simple messages go to a small
+    fast model, the rest to the large one. When the chosen model's recent
+    latency percentile is over `latency_budget`, the call cascades to the
+    next model in `fallback_models` that is within budget (or, if none
+    is, the fastest of them). Latency and tokens are tracked per route
+    so the thresholds can be tuned from /metrics/routes.
+    """
+
+    def __init__(
+        self,
+        *,
+        large_model: str,
+        small_model: str,
+        simple_max_chars: int = 60,
+        small_max_tokens: int = 200,
+        large_max_tokens: int = 500,
+        latency_budget: float = 0.0,
+        percentile: float = 95.0,
+        window: float = 120.0,
+        min_samples: int = 10,
+        fallback_models: Sequence[str] = (),
+    ):
+        self.large_model = large_model
+        self.small_model = small_model
+        self.simple_max_chars = simple_max_chars
+        self.small_max_tokens = small_max_tokens
+        self.large_max_tokens = large_max_tokens
+        self.latency_budget = latency_budget
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.fallback_models = list(fallback_models)
+        self._window = window
+        self._models: Dict[str, LatencyWindow] = {}
+        self._routes: Dict[str, LatencyWindow] = {}
+        self._requests: Dict[Tuple[str, str], int] = {}
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "ModelRouter":
+        return cls(
+            large_model=settings.GROQ_MODEL,
+            small_model=settings.ROUTER_SMALL_MODEL,
+            simple_max_chars=settings.ROUTER_SIMPLE_MAX_CHARS,
+            small_max_tokens=settings.ROUTER_SMALL_MAX_TOKENS,
+            large_max_tokens=settings.ROUTER_LARGE_MAX_TOKENS,
+            latency_budget=settings.ROUTER_LATENCY_BUDGET,
+            percentile=settings.ROUTER_LATENCY_PERCENTILE,
+            window=settings.ROUTER_LATENCY_WINDOW,
+            min_samples=settings.ROUTER_MIN_SAMPLES,
+            fallback_models=settings.ROUTER_FALLBACK_MODELS,
+        )
+
+    def _latency(self, model: str) -> LatencyWindow:
+        window = self._models.get(model)
+        if window is None:
+            window = self._models[model] = LatencyWindow(self._window)
+        return window
+
+    def model_latency(self, model: str) -> Optional[float]:
+        """Recent latency percentile of `model`, None until it has enough calls"""
+        return self._latency(model).percentile(self.percentile, self.min_samples)
+
+    def _pick(self, primary: str) -> Tuple[str, bool]:
+        """`primary` unless it is over the latency budget; then the cascade"""
+        if self.latency_budget <= 0:
+            return primary, False
+        candidates = [primary] + [m for m in self.fallback_models if m != primary]
+        fastest: Optional[Tuple[float, str]] = None
+        for model in candidates:
+            latency = self.model_latency(model)
+            if latency is None or latency <= self.latency_budget:
+                return model, model != primary
+            if fastest is None or latency < fastest[0]:
+                fastest = (latency, model)
+        return fastest[1], fastest[1] != primary
+
+    def choose(self, text: str, model: Optional[str] = None) -> Route:
+        """Route for a message; `model` overrides the large model (per instance)"""
+        if is_simple(text, self.simple_max_chars):
+            name, primary, max_tokens = SIMPLE, self.small_model, self.small_max_tokens
+        else:
+            name, primary = COMPLEX, model or self.large_model
+            max_tokens = self.large_max_tokens
+        chosen, fallback = self._pick(primary)
+        return Route(name, chosen, max_tokens, fallback)
+
+    def observe(self, route: Route, seconds: float) -> None:
+        """Latency of a finished call (failures included: a timeout is slow)"""
+        key = (route.name, route.model)
+        self._requests[key] = self._requests.get(key, 0) + 1
+        if route.fallback:
+            LLM_ROUTE_FALLBACKS.inc(route.name)
+        self._latency(route.model).observe(seconds)
+        window = self._routes.get(route.name)
+        if window is None:
+            window = self._routes[route.name] = LatencyWindow(self._window)
+        window.observe(seconds)
+        LLM_ROUTE_SECONDS.observe(seconds, route.name, route.model)
+
+    def stats(self) -> Dict[str, Any]:
+        routes: Dict[str, Dict[str, Any]] = {}
+        for (name, model), count in sorted(self._requests.items()):
+            route = routes.setdefault(
+                name,
+                {
+                    "requests": 0,
+                    "fallbacks": LLM_ROUTE_FALLBACKS.value(name),
+                    "tokens_in": LLM_ROUTE_TOKENS.value(name, "in"),
+                    "tokens_out": LLM_ROUTE_TOKENS.value(name, "out"),
+                    "models": {},
+                },
+            )
+            route["requests"] += count
+            route["models"][model] = count
+        for name, route in routes.items():
+            window = self._routes.get(name)
+            route["p50_seconds"] = window.percentile(50) if window else None
+            route["p95_seconds"] = window.percentile(95) if window else None
+        models: Dict[str, Dict[str, Any]] = {}
+        for model, window in self._models.items():
+            latency = self.model_latency(model)
+            models[model] = {
+                "samples": len(window),
+                f"p{self.percentile:g}_seconds": latency,
+                "over_budget": bool(
+                    self.latency_budget > 0
+                    and latency is not None
+                    and latency > self.latency_budget
+                ),
+            }
+        return {
+            "small_model": self.small_model,
+            "large_model": self.large_model,
+            "simple_max_chars": self.simple_max_chars,
+            "latency_budget": self.latency_budget,
+            "fallback_models": self.fallback_models,
+            "routes": routes,
+            "models": models,
+        }
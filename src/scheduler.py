@@ -0,0 +1,313 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from src.evolution import EvolutionClient
+from src.metrics import SEND_FAILURES, SEND_RETRIES, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Lower value = sent first
+PRIORITY_REPLY = 0
+PRIORITY_BULK = 10
+PRIORITY_TEST = 20
+
+
+class OutboundQueueFull(Exception):
+    """Raised when the outbound queue cannot take another message"""
+
+
+class OutboundStopped(OutboundQueueFull):
+    """Raised for sends to a scheduler that has been stopped; it never recovers"""
+
+
+class TokenBucket:
+    """Classic token bucket; `rate` tokens per second up to `capacity`"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if available now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+
+def parse_retry_after(value: Optional[str], default: float) -> float:
+    """Retry-After header as seconds (delta-seconds or HTTP date)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class _OutboundJob:
+    __slots__ = (
+        "seq",
+        "number",
+        "text",
+        "priority",
+        "timeout",
+        "future",
+        "enqueued_at",
+        "attempts",
+    )
+
+    def __init__(
+        self, seq: int, number: str, text: str, priority: int, timeout: Optional[float]
+    ):
+        self.seq = seq
+        self.number = number
+        self.text = text
+        self.priority = priority
+        self.timeout = timeout
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+
+
+class OutboundScheduler:
+    """
+    Paces every Evolution send through a global token bucket and one token
+    bucket per recipient. Sends are prioritised (replies before bulk/test
+    traffic), a recipient that is out of tokens does not block the others,
+    and a 429 pauses all sends for the Retry-After period before retrying.
+    """
+
+    def __init__(
+        self,
+        client: EvolutionClient,
+        *,
+        global_rate: float = 20.0,
+        global_burst: int = 40,
+        recipient_rate: float = 1.0,
+        recipient_burst: int = 5,
+        max_in_flight: int = 50,
+        max_queue_size: int = 10_000,
+        max_retries: int = 3,
+        default_retry_after: float = 5.0,
+        max_recipients: int = 100_000,
+    ):
+        self.client = client
+        self.recipient_rate = recipient_rate
+        self.recipient_burst = recipient_burst
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.default_retry_after = default_retry_after
+        self.max_recipients = max_recipients
+
+        self._global_bucket = TokenBucket(global_rate, global_burst)
+        self._recipient_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # (priority, seq, job) ready to go as soon as tokens allow
+        self._ready: List[Tuple[int, int, _OutboundJob]] = []
+        # (ready_at, seq, job) waiting on a recipient bucket
+        self._deferred: List[Tuple[float, int, _OutboundJob]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._send_tasks: set = set()
+        self._stopped = False
+
+        self.sent = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._ready) + len(self._deferred)
+
+    def start(self) -> None:
+        self._dispatcher = asyncio.create_task(
+            self._dispatch(), name="outbound-dispatcher"
+        )
+
+    async def send(
+        self,
+        number: str,
+        text: str,
+        priority: int = PRIORITY_REPLY,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Queue a text message and wait until Evolution has accepted it"""
+        if self._stopped:
+            raise OutboundStopped("Outbound scheduler stopped")
+        if self.depth >= self.max_queue_size:
+            raise OutboundQueueFull(f"Outbound queue full ({self.depth} messages)")
+        job = _OutboundJob(next(self._seq), number, text, priority, timeout)
+        self._push_ready(job)
+        return await job.future
+
+    def _push_ready(self, job: _OutboundJob) -> None:
+        # Original sequence number keeps FIFO order within a priority, retries included
+        heapq.heappush(self._ready, (job.priority, job.seq, job))
+        self._wakeup.set()
+
+    def _recipient_bucket(self, number: str) -> TokenBucket:
+        bucket = self._recipient_buckets.get(number)
+        if bucket is None:
+            bucket = TokenBucket(self.recipient_rate, self.recipient_burst)
+            self._recipient_buckets[number] = bucket
+            if len(self._recipient_buckets) > self.max_recipients:
+                self._recipient_buckets.popitem(last=False)
+        else:
+            self._recipient_buckets.move_to_end(number)
+        return bucket
+
+    async def _sleep_or_wakeup(self, timeout: Optional[float]) -> None:
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _dispatch(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._deferred and self._deferred[0][0] <= now:
+                _, _, job = heapq.heappop(self._deferred)
+                heapq.heappush(self._ready, (job.priority, job.seq, job))
+
+            if not self._ready:
+                timeout = self._deferred[0][0] - now if self._deferred else None
+                await self._sleep_or_wakeup(timeout)
+                continue
+
+            # Evolution told us to back off: hold every send
+            if self._paused_until > now:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            global_wait = self._global_bucket.wait_time(now)
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            _, _, job = heapq.heappop(self._ready)
+            bucket = self._recipient_bucket(job.number)
+            recipient_wait = bucket.wait_time(now)
+            if recipient_wait > 0:
+                heapq.heappush(self._deferred, (now + recipient_wait, job.seq, job))
+                continue
+
+            await self._slots.acquire()
+            self._global_bucket.consume()
+            bucket.consume()
+            task = asyncio.create_task(self._send(job))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, job: _OutboundJob) -> None:
+        self._in_flight += 1
+        waited = time.monotonic() - job.enqueued_at
+        try:
+            job.attempts += 1
+            with STAGE_SECONDS.time("send"):
+                result = await self.client.send_text(
+                    job.number, job.text, timeout=job.timeout
+                )
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 429 and job.attempts <= self.max_retries:
+                retry_after = parse_retry_after(
+                    e.response.headers.get("Retry-After"), self.default_retry_after
+                )
+                self.rate_limited += 1
+                SEND_RETRIES.inc()
+                self._paused_until = max(
+                    self._paused_until, time.monotonic() + retry_after
+                )
+                logger.warning(
+                    f"⏳ Evolution rate limited, pausing sends for {retry_after:.1f}s"
+                )
+                self._push_ready(job)
+                return
+            self._fail(job, e)
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            self.sent += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    def _fail(self, job: _OutboundJob, error: Exception) -> None:
+        self.failed += 1
+        SEND_FAILURES.inc()
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Let queued sends finish (up to `drain_timeout`), then fail the rest"""
+        self._stopped = True
+        deadline = time.monotonic() + drain_timeout
+        while (self.depth or self._in_flight) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+        for task in list(self._send_tasks):
+            task.cancel()
+        await asyncio.gather(*self._send_tasks, return_exceptions=True)
+        for _, _, job in self._ready + self._deferred:
+            if not job.future.done():
+                job.future.set_exception(OutboundStopped("Outbound scheduler stopped"))
+        if self.depth:
+            logger.warning(f"⚠️  Dropped {self.depth} unsent messages on shutdown")
+        self._ready.clear()
+        self._deferred.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        oldest = min(
+            (job.enqueued_at for _, _, job in self._ready + self._deferred), default=now
+        )
+        return {
+            "queue_depth": self.depth,
+            "ready": len(self._ready),
+            "waiting_on_recipient": len(self._deferred),
+            "in_flight": self._in_flight,
+            "paused_for_seconds": round(max(0.0, self._paused_until - now), 3),
+            "sent": self.sent,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            "avg_wait_seconds": (
+                round(self.total_wait / self.sent, 4) if self.sent else 0.0
+            ),
+            "max_wait_seconds": round(self.max_wait, 4),
+            "oldest_queued_seconds": round(now - oldest, 3),
+        }
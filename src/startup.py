@@ -0,0 +1,93 @@
+import logging
+import os
+import time
+from typing import Any, Dict, Optional
+
+from src.metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux /proc), None elsewhere"""
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            # Field 22 (starttime) follows the parenthesised command name
+            fields = f.read().rsplit(b")", 1)[1].split()
+        with open("/proc/uptime", "rb") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupReport:
+    """
+    Time spent getting to the first served request: importing the app,
+    each lifespan step, ready (lifespan done) and the first request. Marks
+    are durations since the previous mark; totals are since the import of
+    app.py began (plus interpreter start-up, where /proc shows it).
+    """
+
+    def __init__(self, started: float):
+        self.started = started
+        self._last = started
+        # Interpreter and site start-up before app.py ran
+        age = process_age()
+        self.before_import = (
+            max(0.0, age - (time.perf_counter() - started)) if age is not None else 0.0
+        )
+        self.phases: Dict[str, float] = {}
+        self.ready_after: Optional[float] = None
+        self.first_request_after: Optional[float] = None
+
+    def mark(self, phase: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.phases[phase] = elapsed
+        STARTUP_SECONDS.set(round(elapsed, 6), phase)
+        return elapsed
+
+    def _since_start(self) -> float:
+        return self.before_import + time.perf_counter() - self.started
+
+    def ready(self) -> None:
+        self.ready_after = self._since_start()
+        STARTUP_SECONDS.set(round(self.ready_after, 6), "ready")
+        steps = ", ".join(
+            f"{name} {seconds:.3f}s" for name, seconds in self.phases.items()
+        )
+        logger.info(f"⏱️  Ready in {self.ready_after:.3f}s ({steps})")
+
+    def first_request(self) -> None:
+        if self.first_request_after is not None:
+            return
+        self.first_request_after = self._since_start()
+        STARTUP_SECONDS.set(round(self.first_request_after, 6), "first_request")
+        logger.info(
+            f"⏱️  First request served {self.first_request_after:.3f}s after start"
+        )
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "before_import_seconds": round(self.before_import, 6),
+            "phases": {
+                name: round(seconds, 6) for name, seconds in self.phases.items()
+            },
+            "ready_seconds": self.ready_after,
+            "first_request_seconds": self.first_request_after,
+        }
+
+
+class FirstRequestMiddleware:
+    """Pure ASGI middleware recording when the first HTTP request completes"""
+
+    def __init__(self, app, report: StartupReport):
+        self.app = app
+        self.report = report
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+        if scope["type"] == "http" and self.report.first_request_after is None:
+            self.report.first_request()
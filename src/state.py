@@ -0,0 +1,480 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import Settings
+from src.dedup import DedupCache
+from src.history import ConversationStore, Turn
+
+logger = logging.getLogger(__name__)
+
+
+class StateBackend(ABC):
+    """
+    Dedup keys and conversation history. Every uvicorn worker that points
+    at the same backend sees the same state.
+    """
+
+    name = "base"
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def seen(self, key: str) -> bool:
+        """Record a dedup `key`; True if it was already recorded within the TTL"""
+
+    @abstractmethod
+    async def forget(self, key: str) -> None:
+        """Drop a dedup `key` so a redelivery is accepted again"""
+
+    @abstractmethod
+    async def append_turns(self, conversation_id: str, turns: List[Turn]) -> None:
+        pass
+
+    @abstractmethod
+    async def turns(self, conversation_id: str) -> List[Turn]:
+        """Stored turns of a conversation, oldest first"""
+
+    @abstractmethod
+    async def clear(self, conversation_id: str) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryStateBackend(StateBackend):
+    """Process-local state; fastest, but each uvicorn worker has its own"""
+
+    name = "memory"
+
+    def __init__(self, dedup: DedupCache, history: ConversationStore):
+        self.dedup = dedup
+        self.history = history
+
+    async def seen(self, key: str) -> bool:
+        return self.dedup.check_and_add(key)
+
+    async def forget(self, key: str) -> None:
+        self.dedup.discard(key)
+
+    async def append_turns(self, conversation_id: str, turns: List[Turn]) -> None:
+        for role, content in turns:
+            self.history.append(conversation_id, role, content)
+
+    async def turns(self, conversation_id: str) -> List[Turn]:
+        return self.history.turns(conversation_id)
+
+    async def clear(self, conversation_id: str) -> None:
+        self.history.clear(conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "dedup": self.dedup.stats(),
+            "history": self.history.stats(),
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dedup (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dedup_expires ON dedup (expires_at);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_conversation ON turns (conversation_id, id);
+"""
+
+# Oldest turns of a conversation past its char cap, always keeping the newest
+_TRIM_CHARS = """
+DELETE FROM turns WHERE id IN (
+  SELECT id FROM (
+    SELECT id,
+           ROW_NUMBER() OVER (ORDER BY id DESC) AS n,
+           SUM(LENGTH(content)) OVER (ORDER BY id DESC) AS chars
+    FROM turns WHERE conversation_id = :cid
+  ) WHERE n > 1 AND chars > :max_chars
+)
+"""
+
+# Least recently active conversations past the count or total chars cap
+_IDLE_CONVERSATIONS = """
+SELECT conversation_id FROM (
+  SELECT conversation_id,
+         ROW_NUMBER() OVER (ORDER BY last DESC) AS n,
+         SUM(chars) OVER (ORDER BY last DESC) AS total
+  FROM (
+    SELECT conversation_id, MAX(id) AS last, SUM(LENGTH(content)) AS chars
+    FROM turns GROUP BY conversation_id
+  )
+) WHERE n > 1 AND (n > :max_conversations OR total > :max_total_chars)
+"""
+
+
+class _CachedTurns:
+    __slots__ = ("turns", "fetched_at")
+
+    def __init__(self, turns: List[Turn], fetched_at: float):
+        self.turns = turns
+        self.fetched_at = fetched_at
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    State in a local SQLite database in WAL mode, shared by every process on
+    the host. Dedup checks are a single atomic upsert (with a local cache of
+    keys already seen); history appends are buffered and written in batches,
+    and history reads are cached for `cache_ttl` seconds. All SQLite calls
+    run on one dedicated thread so the event loop never blocks on disk.
+    History has the memory backend's caps: turns and chars per conversation
+    on every write, conversation count and total chars (idle conversations
+    deleted first) every `purge_interval` seconds.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        dedup_ttl: float = 3600.0,
+        max_turns: int = 20,
+        max_chars_per_conversation: int = 8000,
+        max_conversations: int = 10_000,
+        max_total_chars: int = 50_000_000,
+        flush_interval: float = 0.05,
+        flush_batch: int = 500,
+        cache_ttl: float = 2.0,
+        cache_size: int = 10_000,
+        purge_interval: float = 60.0,
+    ):
+        self.path = path
+        self.dedup_ttl = dedup_ttl
+        self.max_turns = max_turns
+        self.max_chars_per_conversation = max_chars_per_conversation
+        self.max_conversations = max_conversations
+        self.max_total_chars = max_total_chars
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.purge_interval = purge_interval
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flush_now = asyncio.Event()
+        # (conversation_id, role, content, created_at) not yet written
+        self._pending: List[Tuple[str, str, str, float]] = []
+        # dedup key -> expires_at, for keys this process knows are taken
+        self._seen_cache: "OrderedDict[str, float]" = OrderedDict()
+        self._turn_cache: "OrderedDict[str, _CachedTurns]" = OrderedDict()
+
+        self.dedup_hits = 0
+        self.dedup_misses = 0
+        self.dedup_local_hits = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.evictions = 0
+
+    def _run(self, func, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def start(self) -> None:
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="state-sqlite")
+        await self._run(self._open)
+        self._flusher = asyncio.create_task(self._flush_loop(), name="state-flusher")
+
+    def _open(self) -> None:
+        conn = sqlite3.connect(
+            self.path, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: commits skip fsync, the WAL is synced at checkpoints
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        self._conn = conn
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+        if self._executor is None:
+            return
+        await self.flush()
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    # Dedup
+
+    async def seen(self, key: str) -> bool:
+        now = time.time()
+        expires_at = self._seen_cache.get(key)
+        if expires_at is not None and expires_at > now:
+            self.dedup_hits += 1
+            self.dedup_local_hits += 1
+            return True
+        seen = await self._run(self._db_seen, key, now)
+        if seen:
+            self.dedup_hits += 1
+        else:
+            self.dedup_misses += 1
+        self._seen_cache[key] = now + self.dedup_ttl
+        self._seen_cache.move_to_end(key)
+        if len(self._seen_cache) > self.cache_size:
+            self._seen_cache.popitem(last=False)
+        return seen
+
+    def _db_seen(self, key: str, now: float) -> bool:
+        # Inserts a new key or takes over an expired one; no row changed
+        # means another request (in any process) holds it
+        cursor = self._conn.execute(
+            "INSERT INTO dedup (key, expires_at) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET expires_at = excluded.expires_at "
+            "WHERE dedup.expires_at <= ?",
+            (key, now + self.dedup_ttl, now),
+        )
+        return cursor.rowcount == 0
+
+    async def forget(self, key: str) -> None:
+        self._seen_cache.pop(key, None)
+        await self._run(self._execute, "DELETE FROM dedup WHERE key = ?", (key,))
+
+    def _execute(self, sql: str, params: tuple = ()) -> None:
+        self._conn.execute(sql, params)
+
+    # History
+
+    async def append_turns(self, conversation_id: str, turns: List[Turn]) -> None:
+        now = time.time()
+        self._pending.extend((conversation_id, role, c, now) for role, c in turns)
+        # Write-through so this process reads its own writes before the flush
+        cached = self._turn_cache.get(conversation_id)
+        if cached is not None:
+            cached.turns.extend(turns)
+            self._trim(cached.turns)
+        if len(self._pending) >= self.flush_batch:
+            self._flush_now.set()
+
+    async def turns(self, conversation_id: str) -> List[Turn]:
+        now = time.monotonic()
+        cached = self._turn_cache.get(conversation_id)
+        if cached is not None and now - cached.fetched_at <= self.cache_ttl:
+            self.cache_hits += 1
+            self._turn_cache.move_to_end(conversation_id)
+            return list(cached.turns)
+
+        self.cache_misses += 1
+        # Make our own buffered writes visible to the query
+        await self.flush()
+        turns = await self._run(self._db_turns, conversation_id)
+        self._turn_cache[conversation_id] = _CachedTurns(turns, now)
+        self._turn_cache.move_to_end(conversation_id)
+        if len(self._turn_cache) > self.cache_size:
+            self._turn_cache.popitem(last=False)
+        return list(turns)
+
+    def _trim(self, turns: List[Turn]) -> None:
+        """Apply the per-conversation caps the flush applies to the table"""
+        del turns[: -self.max_turns]
+        chars = sum(len(content) for _, content in turns)
+        while chars > self.max_chars_per_conversation and len(turns) > 1:
+            chars -= len(turns.pop(0)[1])
+
+    def _db_turns(self, conversation_id: str) -> List[Turn]:
+        rows = self._conn.execute(
+            "SELECT role, content FROM turns WHERE conversation_id = ? "
+            "ORDER BY id DESC LIMIT ?",
+            (conversation_id, self.max_turns),
+        ).fetchall()
+        rows.reverse()
+        return [(role, content) for role, content in rows]
+
+    async def clear(self, conversation_id: str) -> None:
+        self._turn_cache.pop(conversation_id, None)
+        self._pending = [row for row in self._pending if row[0] != conversation_id]
+        await self._run(
+            self._execute,
+            "DELETE FROM turns WHERE conversation_id = ?",
+            (conversation_id,),
+        )
+
+    async def flush(self) -> None:
+        """Write buffered history turns in one transaction"""
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await self._run(self._db_append, batch)
+        except sqlite3.Error as e:
+            logger.error(f"❌ State flush of {len(batch)} turns failed: {e}")
+            # Keep them for the next flush, ahead of anything newer
+            self._pending[:0] = batch
+            return
+        self.flushes += 1
+        self.rows_written += len(batch)
+
+    def _db_append(self, batch: List[Tuple[str, str, str, float]]) -> None:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO turns (conversation_id, role, content, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            # Keep only the newest max_turns (and max chars) of each
+            # conversation touched
+            touched = {row[0] for row in batch}
+            conn.executemany(
+                "DELETE FROM turns WHERE conversation_id = ? AND id <= ("
+                "SELECT id FROM turns WHERE conversation_id = ? "
+                "ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                [(cid, cid, self.max_turns) for cid in touched],
+            )
+            conn.executemany(
+                _TRIM_CHARS,
+                [
+                    {"cid": cid, "max_chars": self.max_chars_per_conversation}
+                    for cid in touched
+                ],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def _flush_loop(self) -> None:
+        next_purge = time.monotonic() + self.purge_interval
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._flush_now.wait(), timeout=self.flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+            if time.monotonic() >= next_purge:
+                next_purge = time.monotonic() + self.purge_interval
+                try:
+                    await self._run(
+                        self._execute,
+                        "DELETE FROM dedup WHERE expires_at <= ?",
+                        (time.time(),),
+                    )
+                except sqlite3.Error as e:
+                    logger.warning(f"⚠️  Dedup purge failed: {e}")
+                try:
+                    await self.evict_idle()
+                except sqlite3.Error as e:
+                    logger.warning(f"⚠️  History eviction failed: {e}")
+
+    async def evict_idle(self) -> int:
+        """Delete the idle conversations over the global caps; returns how many"""
+        evicted = await self._run(self._db_evict_idle)
+        for conversation_id in evicted:
+            self._turn_cache.pop(conversation_id, None)
+        self.evictions += len(evicted)
+        return len(evicted)
+
+    def _db_evict_idle(self) -> List[str]:
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            evicted = [
+                row[0]
+                for row in conn.execute(
+                    _IDLE_CONVERSATIONS,
+                    {
+                        "max_conversations": self.max_conversations,
+                        "max_total_chars": self.max_total_chars,
+                    },
+                )
+            ]
+            conn.executemany(
+                "DELETE FROM turns WHERE conversation_id = ?",
+                [(cid,) for cid in evicted],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        dedup_total = self.dedup_hits + self.dedup_misses
+        cache_total = self.cache_hits + self.cache_misses
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "dedup": {
+                "hits": self.dedup_hits,
+                "misses": self.dedup_misses,
+                "local_hits": self.dedup_local_hits,
+                "hit_rate": (
+                    round(self.dedup_hits / dedup_total, 4) if dedup_total else 0.0
+                ),
+                "ttl_seconds": self.dedup_ttl,
+            },
+            "history": {
+                "pending_writes": len(self._pending),
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+                "cached_conversations": len(self._turn_cache),
+                "cache_hit_rate": (
+                    round(self.cache_hits / cache_total, 4) if cache_total else 0.0
+                ),
+                "max_turns": self.max_turns,
+                "max_conversations": self.max_conversations,
+                "max_total_chars": self.max_total_chars,
+                "evictions": self.evictions,
+            },
+        }
+
+
+def create_state_backend(settings: Settings) -> StateBackend:
+    """Backend selected by STATE_BACKEND ("memory" or "sqlite")"""
+    if settings.STATE_BACKEND == "sqlite":
+        return SQLiteStateBackend(
+            settings.STATE_SQLITE_PATH,
+            dedup_ttl=settings.DEDUP_TTL,
+            max_turns=settings.HISTORY_MAX_TURNS,
+            max_chars_per_conversation=settings.HISTORY_MAX_CHARS,
+            max_conversations=settings.HISTORY_MAX_CONVERSATIONS,
+            max_total_chars=settings.HISTORY_MAX_TOTAL_CHARS,
+            flush_interval=settings.STATE_FLUSH_INTERVAL,
+            flush_batch=settings.STATE_FLUSH_BATCH,
+            cache_ttl=settings.STATE_READ_CACHE_TTL,
+            cache_size=settings.STATE_READ_CACHE_SIZE,
+        )
+    if settings.STATE_BACKEND != "memory":
+        raise ValueError(f"Unknown STATE_BACKEND: {settings.STATE_BACKEND!r}")
+    return MemoryStateBackend(
+        DedupCache(max_entries=settings.DEDUP_MAX_ENTRIES, ttl=settings.DEDUP_TTL),
+        ConversationStore(
+            max_turns=settings.HISTORY_MAX_TURNS,
+            max_chars_per_conversation=settings.HISTORY_MAX_CHARS,
+            max_conversations=settings.HISTORY_MAX_CONVERSATIONS,
+            max_total_chars=settings.HISTORY_MAX_TOTAL_CHARS,
+        ),
+    )
@@ -0,0 +1,104 @@
+import re
+from typing import List, Optional, Tuple
+
+_SENTENCE_END_RE = re.compile(r"[.!?…](?=\s)|\n\n")
+
+
+class TagStripper:
+    """
+    Incrementally removes <think>...</think> and <prompt>...</prompt> blocks
+    from a token stream. Text that might be the start of a tag is held back
+    until the next chunk decides it, so tags split across chunks are handled.
+    """
+
+    def __init__(self, tags: Tuple[str, ...] = ("think", "prompt")):
+        self._open_tags = {f"<{tag}>": f"</{tag}>" for tag in tags}
+        self._buffer = ""
+        # Closing tag we are waiting for while inside a block
+        self._closing: Optional[str] = None
+
+    def feed(self, chunk: str) -> str:
+        """Consume `chunk` and return the text that is safe to show"""
+        self._buffer += chunk
+        out: List[str] = []
+        while self._buffer:
+            if self._closing is not None:
+                end = self._buffer.find(self._closing)
+                if end == -1:
+                    # Drop the hidden text, keeping a tail that could start the closing tag
+                    keep = len(self._closing) - 1
+                    self._buffer = self._buffer[-keep:] if keep else ""
+                    break
+                self._buffer = self._buffer[end + len(self._closing):]
+                self._closing = None
+                continue
+
+            start = self._buffer.find("<")
+            if start == -1:
+                out.append(self._buffer)
+                self._buffer = ""
+                break
+            out.append(self._buffer[:start])
+            self._buffer = self._buffer[start:]
+
+            matched = False
+            pending = False
+            for open_tag, close_tag in self._open_tags.items():
+                if self._buffer.startswith(open_tag):
+                    self._buffer = self._buffer[len(open_tag):]
+                    self._closing = close_tag
+                    matched = True
+                    break
+                if open_tag.startswith(self._buffer):
+                    pending = True
+            if matched:
+                continue
+            if pending:
+                # Partial opening tag at the end of the chunk, wait for more
+                break
+            out.append("<")
+            self._buffer = self._buffer[1:]
+        return "".join(out)
+
+    def flush(self) -> str:
+        """Return any held-back text; an unterminated block is dropped"""
+        rest = "" if self._closing is not None else self._buffer
+        self._buffer = ""
+        self._closing = None
+        return rest
+
+
+class SentenceChunker:
+    """
+    Groups streamed text into sendable messages, cutting at paragraph breaks
+    or at sentence ends once at least `min_chars` have accumulated.
+    """
+
+    def __init__(self, min_chars: int = 80):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        chunks: List[str] = []
+        search_from = 0
+        while True:
+            match = _SENTENCE_END_RE.search(self._buffer, search_from)
+            if match is None:
+                break
+            end = match.end()
+            is_paragraph = match.group() == "\n\n"
+            if is_paragraph or end >= self.min_chars:
+                chunk = self._buffer[:end].strip()
+                self._buffer = self._buffer[end:]
+                search_from = 0
+                if chunk:
+                    chunks.append(chunk)
+            else:
+                search_from = end
+        return chunks
+
+    def flush(self) -> Optional[str]:
+        chunk = self._buffer.strip()
+        self._buffer = ""
+        return chunk or None
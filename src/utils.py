@@ -1,11 +1,18 @@
-import requests
+import httpx
 import logging
-from typing import Dict, Any
-from groq import Groq
+import re
+from typing import Dict, Any, List, Optional
+from src.access import USER, normalize_jid
 from src.config import settings
+from src.llm import LLMClient
+from src.resilience import CircuitOpenError
+from src.scheduler import PRIORITY_REPLY, OutboundQueueFull, OutboundScheduler
 
 logger = logging.getLogger(__name__)
 
+THINK_TAG_RE = re.compile(r"<think>.*?</think>", flags=re.DOTALL)
+PROMPT_TAG_RE = re.compile(r"<prompt>.*?</prompt>", flags=re.DOTALL)
+
 
 def clean_phone_number(phone: str) -> str:
     """Clean phone number by removing + and @s.whatsapp.net"""
@@ -15,74 +22,88 @@ def clean_phone_number(phone: str) -> str:
     return clean
 
 
-def is_my_number(sender_jid: str) -> bool:
-    """Check if sender is your phone number"""
-    clean_sender = clean_phone_number(sender_jid)
-    clean_my_number = clean_phone_number(settings.YOUR_PHONE_NUMBER)
-    return clean_sender == clean_my_number
+def is_my_number(sender_jid: str, my_number: Optional[str] = None) -> bool:
+    """Check if sender is your phone number (or the instance owner's `my_number`)"""
+    kind, sender = normalize_jid(sender_jid)
+    return kind == USER and sender == normalize_jid(my_number or settings.YOUR_PHONE_NUMBER)[1]
 
 
-def send_whatsapp_message(phone_number: str, text: str) -> Dict[str, Any]:
+async def send_whatsapp_message(
+    scheduler: OutboundScheduler,
+    phone_number: str,
+    text: str,
+    priority: int = PRIORITY_REPLY,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
     """
     Send WhatsApp message using Evolution API format
     POST https://{server-url}/message/sendText/{instance}
+    Goes through the outbound scheduler, which applies rate limits and priority.
     """
-    # Ensure URL doesn't have double slashes
-    base_url = settings.EVOLUTION_API_URL.rstrip("/")
-    url = f"{base_url}/message/sendText/{settings.INSTANCE_NAME}"
-
     # Clean the phone number
     clean_number = clean_phone_number(phone_number)
 
-    # Prepare payload according to Evolution API format
-    payload = {
-        "number": clean_number,
-        "text": text,
-        "options": {"delay": 1000, "presence": "composing", "linkPreview": False},
-    }
     try:
-        response = requests.post(
-            url,
-            json=payload,
-            headers=settings.evolution_headers,
-            timeout=30,
-            verify=settings.SSL_VERIFY,
+        result = await scheduler.send(
+            clean_number, text, priority=priority, timeout=timeout
         )
-        response.raise_for_status()
-        result = response.json()
-        logger.info(f"Message sent successfully")
+        logger.debug("Message sent successfully")
         return result
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to send message: {str(e)}")
-        if hasattr(e, "response") and e.response is not None:
-            logger.error(f"Response status: {e.response.status_code}")
-            logger.error(f"Response content: {e.response.text}")
+    except (httpx.HTTPError, OutboundQueueFull, CircuitOpenError) as e:
+        logger.error("Failed to send message: %s", e)
+        if isinstance(e, httpx.HTTPStatusError):
+            logger.error("Response status: %s", e.response.status_code)
+            logger.error("Response content: %s", e.response.text)
         raise
 
-def get_llm_response(user_message: str) -> str:
+
+def clean_llm_response(response_text: str) -> str:
+    """Strip <think>/<prompt> blocks and surrounding whitespace from a reply"""
+    cleaned = THINK_TAG_RE.sub("", response_text)
+    cleaned = PROMPT_TAG_RE.sub("", cleaned)
+    return cleaned.strip()
+
+
+SYSTEM_PROMPT = "You are a helpful WhatsApp assistant. Keep responses concise and friendly. Do not include any thinking process or internal reasoning in your response."
+
+LLM_FALLBACK_REPLY = "Sorry, I couldn't process your message right now."
+
+
+def build_llm_messages(
+    user_message: str, history: Optional[List[Dict[str, str]]] = None
+) -> List[Dict[str, str]]:
+    """System prompt, earlier turns (oldest first), then the new user message"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *(history or []),
+        {"role": "user", "content": user_message},
+    ]
+
+
+async def get_llm_response(
+    llm: LLMClient,
+    user_message: str,
+    history: Optional[List[Dict[str, str]]] = None,
+    model: Optional[str] = None,
+    max_tokens: int = 500,
+    route: Optional[str] = None,
+) -> str:
     """
     Get response from Groq LLM
+    `history` holds earlier turns of the conversation, oldest first.
     """
     try:
-        client = Groq(api_key=settings.GROQ_API_KEY)
-        
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful WhatsApp assistant. Keep responses concise and friendly. Do not include any thinking process or internal reasoning in your response."
-                },
-                {
-                    "role": "user",
-                    "content": user_message
-                }
-            ],
-            model=settings.GROQ_MODEL,
+        return await llm.complete(
+            build_llm_messages(user_message, history),
+            model=model,
             temperature=0.7,
-            max_tokens=500,
+            max_tokens=max_tokens,
+            route=route,
         )
-        
-        return chat_completion.choices[0].message.content
+    except CircuitOpenError as e:
+        # Groq is down: answer with the fallback right away instead of waiting
+        logger.warning(f"🔌 {e}, serving fallback reply")
+        return LLM_FALLBACK_REPLY
     except Exception as e:
         logger.error(f"❌ Groq API error: {e}")
-        return "Sorry, I couldn't process your message right now."
+        return LLM_FALLBACK_REPLY
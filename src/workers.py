@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """
+    Bounded in-process job queue drained by a fixed pool of asyncio workers.
+    `submit` never waits: when the queue is full it returns False so the
+    caller can push back (HTTP 503) instead of buffering without limit.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Any], Awaitable[None]],
+        *,
+        num_workers: int = 8,
+        max_queue_size: int = 1000,
+        name: str = "worker",
+    ):
+        self._handler = handler
+        self._num_workers = num_workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self._workers: List[asyncio.Task] = []
+        self._name = name
+        self._busy = 0
+        self._accepting = False
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def accepting(self) -> bool:
+        return self._accepting
+
+    def start(self) -> None:
+        self._accepting = True
+        for i in range(self._num_workers):
+            self._workers.append(
+                asyncio.create_task(self._run(), name=f"{self._name}-{i}")
+            )
+
+    def submit(self, job: Any) -> bool:
+        """Enqueue a job; False means the queue is full or shutting down"""
+        if not self._accepting:
+            self.rejected += 1
+            return False
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._busy += 1
+            try:
+                await self._handler(job)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception(f"❌ {self._name} job failed")
+            finally:
+                self._busy -= 1
+                self._queue.task_done()
+
+    async def stop(self, drain_timeout: float = 25.0) -> None:
+        """Stop accepting jobs, drain what is queued, then cancel the workers"""
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"⚠️  {self._name} drain timed out with {self.depth} jobs still queued"
+            )
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self._num_workers,
+            "busy": self._busy,
+            "queue_depth": self.depth,
+            "queue_capacity": self._queue.maxsize,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
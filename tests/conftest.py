@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Required settings, set before src.config is imported
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("EVOLUTION_API_KEY", "test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
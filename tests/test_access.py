@@ -0,0 +1,60 @@
+import pytest
+
+from src.access import GROUP, LID, OTHER, USER, AccessControl, AccessList, parse_jid
+
+
+@pytest.mark.parametrize(
+    "jid, expected",
+    [
+        ("+962 7874-99976", (USER, "962787499976")),
+        ("962787499976:3@s.whatsapp.net", (USER, "962787499976")),
+        ("962787499976@c.us", (USER, "962787499976")),
+        ("120363000000000001@g.us", (GROUP, "120363000000000001@g.us")),
+        ("215400000000001@LID", (LID, "215400000000001@lid")),
+        ("status@broadcast", (OTHER, "status")),
+    ],
+)
+def test_parse_jid(jid, expected):
+    assert parse_jid(jid) == expected
+
+
+def test_access_list_entries():
+    access = AccessList(
+        [
+            "962787499976  # owner's second phone",
+            "",
+            "# comment only",
+            "44*",
+            "120363000000000001@g.us",
+        ]
+    )
+    assert len(access) == 3
+    assert access.allows(USER, "962787499976")
+    assert access.allows(USER, "447700900000")
+    assert not access.allows(USER, "14155550000")
+    assert access.allows(GROUP, "120363000000000001@g.us")
+    # Prefix rules are for phone numbers only
+    assert not access.allows(LID, "44000@lid")
+
+
+def test_prefix_rules_need_digits():
+    with pytest.raises(ValueError):
+        AccessList(["abc*"])
+
+
+def test_control_matches_lid_by_its_phone_and_never_answers_broadcasts():
+    control = AccessControl()
+    control.access_list = AccessList(["962*"])
+    assert control.allows("215400000000001@lid", alt_jid="962700000001@s.whatsapp.net")
+    assert not control.allows("215400000000001@lid")
+    assert control.allows("15550000000@s.whatsapp.net", owner="+1 555 000 0000")
+    assert not control.allows("status@broadcast")
+
+
+def test_lid_entry_matches_even_when_the_phone_is_known():
+    control = AccessControl()
+    control.access_list = AccessList(["215400000000001@lid"])
+    assert control.allows("215400000000001@lid", alt_jid="14155550000@s.whatsapp.net")
+    assert not control.allows(
+        "215400000000002@lid", alt_jid="14155550000@s.whatsapp.net"
+    )
@@ -0,0 +1,128 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from src import broadcast as broadcast_module
+from src.broadcast import BroadcastManager
+from src.resilience import CircuitOpenError
+from src.scheduler import OutboundQueueFull, OutboundStopped
+
+
+def test_open_circuit_waits_and_bad_response_fails_one(tmp_path, monkeypatch):
+    calls = {"n": 0}
+
+    async def send(outbound, number, text, **kwargs):
+        calls["n"] += 1
+        if calls["n"] <= 20:
+            raise CircuitOpenError("evolution:bot circuit is open")
+        if number == "15550000003":
+            raise json.JSONDecodeError("Expecting value", "<html>", 0)
+        return {"key": {"id": f"ID{number}"}}
+
+    monkeypatch.setattr(broadcast_module, "send_whatsapp_message", send)
+
+    async def scenario():
+        manager = BroadcastManager(
+            str(tmp_path / "bc.db"), concurrency=4, queue_full_wait=0.01
+        )
+        await manager.open()
+        manager.start({"bot": SimpleNamespace(outbound=None)})
+        recipients = [(f"1555000000{i}", None) for i in range(10)]
+        job_id, total = await manager.create("bot", "hello", recipients)
+        assert total == 10
+        await manager.resume(job_id)
+        events = [event async for event in manager.follow(job_id)]
+        status = await manager.status(job_id)
+        jobs_left = dict(manager._jobs)
+        await manager.stop()
+        await manager.close()
+        return events, status, jobs_left
+
+    events, status, jobs_left = asyncio.run(scenario())
+    assert events[-1]["done"] is True
+    assert status["status"] == "completed"
+    assert status["sent"] == 9
+    assert status["failed"] == 1
+    failed = [event for event in events if event.get("status") == "failed"]
+    assert [event["number"] for event in failed] == ["15550000003"]
+    assert jobs_left == {}
+
+
+def run_job(tmp_path, instances, recipients, **options):
+    async def scenario():
+        manager = BroadcastManager(
+            str(tmp_path / "bc.db"), concurrency=2, queue_full_wait=0.01, **options
+        )
+        await manager.open()
+        manager.start(instances)
+        job_id, _ = await manager.create("bot", "hello", recipients)
+        await manager.resume(job_id)
+        events = [event async for event in manager.follow(job_id)]
+        status = await manager.status(job_id)
+        await manager.stop()
+        await manager.close()
+        return events, status
+
+    return asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+
+
+def test_reloaded_instance_is_picked_up(tmp_path, monkeypatch):
+    old, new = SimpleNamespace(outbound="old"), SimpleNamespace(outbound="new")
+    instances = {"bot": old}
+    used = []
+
+    async def send(outbound, number, text, **kwargs):
+        if outbound == "old":
+            # The reload retired the old scheduler and registered a new one
+            instances["bot"] = new
+            raise OutboundStopped("Outbound scheduler stopped")
+        used.append(outbound)
+        return {}
+
+    monkeypatch.setattr(broadcast_module, "send_whatsapp_message", send)
+    recipients = [(f"1555000000{i}", None) for i in range(4)]
+    events, status = run_job(tmp_path, instances, recipients)
+    assert status["status"] == "completed"
+    assert status["sent"] == 4
+    assert used == ["new"] * 4
+
+
+def test_stopped_or_removed_instance_interrupts_the_job(tmp_path, monkeypatch):
+    instances = {"bot": SimpleNamespace(outbound=None)}
+
+    async def send(outbound, number, text, **kwargs):
+        raise OutboundStopped("Outbound scheduler stopped")
+
+    monkeypatch.setattr(broadcast_module, "send_whatsapp_message", send)
+    events, status = run_job(tmp_path, instances, [("15550000001", None)])
+    assert events[-1]["interrupted"] is True
+    assert status["status"] == "created"
+    assert status["pending"] == 1
+
+    async def removed(outbound, number, text, **kwargs):
+        instances.clear()
+        raise OutboundQueueFull("Outbound queue full (1000 messages)")
+
+    monkeypatch.setattr(broadcast_module, "send_whatsapp_message", removed)
+    events, status = run_job(tmp_path, instances, [("15550000001", None)])
+    assert "Unknown instance" in events[-1]["error"]
+
+
+def test_back_pressure_wait_is_bounded(tmp_path, monkeypatch):
+    async def send(outbound, number, text, **kwargs):
+        if number.endswith("1"):
+            return {}
+        raise CircuitOpenError("evolution:bot circuit is open")
+
+    monkeypatch.setattr(broadcast_module, "send_whatsapp_message", send)
+    recipients = [("15550000001", None), ("15550000002", None)]
+    events, status = run_job(
+        tmp_path, {"bot": SimpleNamespace(outbound=None)}, recipients, max_wait=0.1
+    )
+    assert events[-1]["interrupted"] is True
+    assert "Gave up" in events[-1]["error"]
+    assert (status["status"], status["sent"], status["pending"]) == (
+        "interrupted",
+        1,
+        1,
+    )
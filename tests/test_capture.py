@@ -0,0 +1,49 @@
+import json
+import threading
+import time
+
+from src.capture import WebhookCapture
+
+
+def test_records_are_written_as_jsonl(tmp_path):
+    path = tmp_path / "webhooks.jsonl"
+    capture = WebhookCapture(str(path))
+    capture.start()
+    capture.record("/webhook/", "messages.upsert", b'{"event": "messages.upsert"}')
+    capture.record("/webhook/", "presence.update", None)
+    capture.record("/webhook/", None, b"not json")
+    capture.stop()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["body"] for line in lines] == [
+        {"event": "messages.upsert"},
+        None,
+        "not json",
+    ]
+    assert capture.stats()["written"] == 3
+
+
+def test_write_errors_are_counted_and_the_writer_survives(tmp_path):
+    capture = WebhookCapture(str(tmp_path / "missing-dir" / "webhooks.jsonl"))
+    capture.start()
+    for _ in range(5):
+        capture.record("/webhook/", "messages.upsert", b"{}")
+        time.sleep(0.01)
+    capture.stop(timeout=2)
+    stats = capture.stats()
+    assert stats["write_errors"] >= 1
+    assert stats["dropped"] == 5
+    assert stats["queued"] == 0
+
+
+def test_stop_does_not_hang_on_a_stuck_writer(tmp_path):
+    release = threading.Event()
+    capture = WebhookCapture(str(tmp_path / "webhooks.jsonl"), queue_size=2)
+    capture._write_loop = release.wait
+    capture.start()
+    for _ in range(5):
+        capture.record("/webhook/", "messages.upsert", b"{}")
+    started = time.monotonic()
+    capture.stop(timeout=0.2)
+    assert time.monotonic() - started < 1.0
+    assert capture.stats()["dropped"] == 3
+    release.set()
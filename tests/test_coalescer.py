@@ -0,0 +1,125 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import List, Optional
+
+from src.coalescer import SenderCoalescer
+from src.models import IncomingMessage, MediaRef
+from src.workers import WorkerPool
+
+
+def make_message(
+    sender: str, text: str, media: Optional[str] = None
+) -> IncomingMessage:
+    return IncomingMessage(
+        instance="bot",
+        message_id=f"{sender}-{text}",
+        sender_jid=f"{sender}@s.whatsapp.net",
+        push_name=sender,
+        text=text,
+        media=MediaRef(kind=media, mimetype="audio/ogg") if media else None,
+    )
+
+
+class FakeMedia:
+    """Media pipeline stand-in: slow extraction on its own pool"""
+
+    def __init__(self, answered: List[str], delay: float):
+        self.answered = answered
+        self.delay = delay
+        self.pool = WorkerPool(self._run, num_workers=2, name="media")
+        self.runner = None
+
+    def start(self, runner):
+        self.runner = runner
+        self.pool.start()
+
+    def submit(self, instance, message) -> bool:
+        return self.pool.submit((instance, message))
+
+    async def _run(self, job):
+        await self.runner(*job)
+
+    async def handle(self, instance, message):
+        await asyncio.sleep(self.delay)
+        self.answered.append(f"{message.sender_jid[0]}:[voice]")
+
+
+async def run_lanes(
+    messages, *, window=0.05, media_delay=0.2, gap=0.01, handler_delay=0.01
+):
+    answered: List[str] = []
+
+    async def handler(instance, message):
+        await asyncio.sleep(handler_delay)
+        answered.append(f"{message.sender_jid[0]}:{message.text}")
+
+    media = FakeMedia(answered, media_delay)
+    coalescer = SenderCoalescer(handler, media=media, window=window, max_wait=1.0)
+    instance = SimpleNamespace(name="bot")
+    instance.pool = WorkerPool(
+        lambda message: coalescer.run(instance, message), num_workers=4, name="bot"
+    )
+    instance.pool.start()
+    media.start(coalescer.run)
+    for message in messages:
+        assert coalescer.submit(instance, message)
+        await asyncio.sleep(gap)
+    for _ in range(200):
+        if not coalescer._lanes:
+            break
+        await asyncio.sleep(0.02)
+    await instance.pool.stop()
+    await media.pool.stop()
+    return answered, coalescer
+
+
+def test_follow_ups_are_answered_once_in_order():
+    messages = [make_message("a", text) for text in ("one", "two", "three")]
+    answered, coalescer = asyncio.run(run_lanes(messages, handler_delay=0.1))
+    assert answered == ["a:one", "a:two\nthree"]
+    assert coalescer.depth == 0
+
+
+def test_lone_message_does_not_wait_for_the_window():
+    async def scenario():
+        started = time.monotonic()
+        answered, _ = await run_lanes([make_message("a", "hello")], window=5.0)
+        return answered, time.monotonic() - started
+
+    answered, elapsed = asyncio.run(scenario())
+    assert answered == ["a:hello"]
+    assert elapsed < 1.0
+
+
+def test_media_keeps_its_place_in_the_lane():
+    messages = [
+        make_message("a", "before"),
+        make_message("a", "", media="audio"),
+        make_message("a", "after"),
+    ]
+    # Each message arrives after the previous one's debounce has ended
+    answered, _ = asyncio.run(run_lanes(messages, gap=0.1))
+    assert answered == ["a:before", "a:[voice]", "a:after"]
+
+
+def test_text_burst_stops_at_media():
+    messages = [
+        make_message("a", "one"),
+        make_message("a", "", media="audio"),
+        make_message("a", "two"),
+        make_message("a", "three"),
+    ]
+    answered, _ = asyncio.run(run_lanes(messages))
+    assert answered == ["a:one", "a:[voice]", "a:two\nthree"]
+
+
+def test_other_senders_are_not_held_by_a_slow_media_job():
+    messages = [
+        make_message("a", "", media="audio"),
+        make_message("a", "after"),
+        make_message("b", "hello"),
+    ]
+    answered, _ = asyncio.run(run_lanes(messages, media_delay=0.3))
+    assert answered.index("b:hello") < answered.index("a:[voice]")
+    assert answered.index("a:[voice]") < answered.index("a:after")
@@ -0,0 +1,51 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.connection_monitor import ConnectionMonitor
+from src.evolution import EvolutionClient
+
+
+def make_monitor(status_code: int, body: dict, **options) -> ConnectionMonitor:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status_code, json=body)
+
+    client = EvolutionClient("http://evolution.test", "key", "bot")
+    client._client = httpx.AsyncClient(
+        base_url=client.base_url, transport=httpx.MockTransport(handler)
+    )
+    return ConnectionMonitor(client, **options)
+
+
+@pytest.mark.parametrize(
+    "status_code, body, connected, reachable",
+    [
+        (200, {"instance": {"instanceName": "bot", "state": "open"}}, True, True),
+        (200, {"instance": {"instanceName": "bot", "state": "close"}}, False, True),
+        (200, {"instance": {"state": "connecting"}}, False, True),
+        (401, {"status": 401, "error": "Unauthorized"}, False, False),
+        (404, {"status": 404, "error": "Not Found"}, False, False),
+    ],
+)
+def test_connected_only_when_open(status_code, body, connected, reachable):
+    monitor = make_monitor(status_code, body)
+    asyncio.run(monitor.refresh())
+    assert monitor.connected is connected
+    assert monitor.reachable is reachable
+    assert (monitor.error is None) is connected
+    # A logged-out number stays ready so its webhooks keep arriving
+    assert monitor.is_ready is reachable
+
+    strict = make_monitor(status_code, body, require_open=True)
+    asyncio.run(strict.refresh())
+    assert strict.is_ready is connected
+
+
+def test_pushed_close_is_reported():
+    monitor = make_monitor(200, {"instance": {"state": "open"}}, require_open=True)
+    asyncio.run(monitor.refresh())
+    monitor.update("close", pushed=True)
+    assert not monitor.connected
+    assert not monitor.is_ready
+    assert monitor.state == "close"
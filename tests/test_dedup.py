@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import dedup as dedup_module
+from src.dedup import DedupCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        dedup_module, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+def test_redelivery_is_seen_within_the_ttl(clock):
+    cache = DedupCache(ttl=60)
+    key = DedupCache.make_key("1@s.whatsapp.net", "ABC", "bot")
+    assert not cache.check_and_add(key)
+    clock.now += 59
+    assert cache.check_and_add(key)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_keys_expire_after_the_ttl(clock):
+    cache = DedupCache(ttl=60)
+    cache.check_and_add("a")
+    clock.now += 30
+    cache.check_and_add("b")
+    clock.now += 31
+    assert not cache.check_and_add("a")
+    # "b" is still within its TTL; "a" expired and was dropped before re-adding
+    assert cache.check_and_add("b")
+    assert len(cache) == 2
+
+
+def test_a_hit_extends_the_ttl(clock):
+    cache = DedupCache(ttl=60)
+    cache.check_and_add("a")
+    clock.now += 50
+    assert cache.check_and_add("a")
+    clock.now += 50
+    assert cache.check_and_add("a")
+
+
+def test_oldest_key_is_evicted_when_full(clock):
+    cache = DedupCache(max_entries=2, ttl=60)
+    cache.check_and_add("a")
+    cache.check_and_add("b")
+    cache.check_and_add("a")
+    cache.check_and_add("c")
+    assert cache.evictions == 1
+    assert len(cache) == 2
+    assert cache.check_and_add("a")
+    assert not cache.check_and_add("b")
+
+
+def test_discarded_key_is_processed_again(clock):
+    cache = DedupCache()
+    cache.check_and_add("a")
+    cache.discard("a")
+    cache.discard("missing")
+    assert not cache.check_and_add("a")
+
+
+def test_keys_are_scoped_to_the_instance_and_chat():
+    keys = {
+        DedupCache.make_key("1@s.whatsapp.net", "ABC", "bot"),
+        DedupCache.make_key("1@s.whatsapp.net", "ABC", "other"),
+        DedupCache.make_key("2@s.whatsapp.net", "ABC", "bot"),
+    }
+    assert len(keys) == 3
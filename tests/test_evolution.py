@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.evolution import EvolutionClient
+from src.resilience import CircuitOpenError
+
+
+def make_client(name, handler, **options):
+    client = EvolutionClient("http://evolution.test/", "secret", name, **options)
+    client._client = httpx.AsyncClient(
+        base_url=client.base_url, transport=httpx.MockTransport(handler)
+    )
+    return client
+
+
+def test_send_text_posts_to_the_instance_with_the_api_key():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(201, json={"key": {"id": "ABC"}})
+
+    async def scenario():
+        client = make_client("send", handler)
+        pool = client.client
+        first = await client.send_text("15550000001", "hello")
+        await client.send_text("15550000002", "again")
+        # One pooled client for every call
+        assert client.client is pool
+        await client.aclose()
+        return first
+
+    assert asyncio.run(scenario()) == {"key": {"id": "ABC"}}
+    request = requests[0]
+    assert request.method == "POST"
+    assert request.url == "http://evolution.test/message/sendText/send"
+    assert request.headers["apikey"] == "secret"
+    body = json.loads(request.content)
+    assert (body["number"], body["text"]) == ("15550000001", "hello")
+    assert len(requests) == 2
+
+
+def test_connect_errors_are_retried_but_timeouts_are_not():
+    attempts = {"connect": 0, "read": 0}
+
+    def handler(request):
+        kind = "connect" if request.url.path.endswith("/connect") else "read"
+        attempts[kind] += 1
+        if kind == "connect" and attempts[kind] == 1:
+            raise httpx.ConnectError("refused", request=request)
+        if kind == "read":
+            # The message may have been sent: never sent twice
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(200, json={})
+
+    async def scenario():
+        connect = make_client("connect", handler)
+        await connect.send_text("1", "hi")
+        read = make_client("read", handler)
+        with pytest.raises(httpx.ReadTimeout):
+            await read.send_text("1", "hi")
+        await connect.aclose()
+        await read.aclose()
+
+    asyncio.run(scenario())
+    assert attempts == {"connect": 2, "read": 1}
+
+
+def test_server_errors_open_the_circuit_and_client_errors_do_not():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        status = 400 if request.url.path.endswith("/client") else 503
+        return httpx.Response(status, json={})
+
+    async def scenario():
+        client = make_client("client", handler, breaker_failures=2)
+        for _ in range(3):
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.send_text("1", "hi")
+        assert client.breaker.current_state == "closed"
+        await client.aclose()
+
+        server = make_client("server", handler, breaker_failures=2)
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await server.send_text("1", "hi")
+        sent = len(calls)
+        with pytest.raises(CircuitOpenError):
+            await server.send_text("1", "hi")
+        assert len(calls) == sent
+        await server.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_open_builds_the_pool_once():
+    async def scenario():
+        client = EvolutionClient("http://evolution.test", "secret", "open")
+        await client.open()
+        pool = client.client
+        await client.open()
+        assert client.client is pool
+        await client.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+from src.history import ConversationStore, estimate_tokens, select_context
+
+
+def test_context_keeps_the_newest_turns_that_fit_oldest_first():
+    turns = [("user", "a" * 40), ("assistant", "b" * 40), ("user", "c" * 40)]
+    cost = estimate_tokens("a" * 40)
+    assert select_context(turns, 2 * cost) == [
+        {"role": "assistant", "content": "b" * 40},
+        {"role": "user", "content": "c" * 40},
+    ]
+    assert select_context(turns, 3 * cost)[0]["content"] == "a" * 40
+    assert select_context(turns, cost - 1) == []
+
+
+def test_context_stops_at_the_first_turn_over_budget():
+    # An old short turn must not be sent without the long one after it
+    turns = [("user", "hi"), ("assistant", "x" * 400), ("user", "ok")]
+    budget = estimate_tokens("ok") + estimate_tokens("hi")
+    assert select_context(turns, budget) == [{"role": "user", "content": "ok"}]
+
+
+def test_each_conversation_keeps_its_last_turns():
+    store = ConversationStore(max_turns=3)
+    for i in range(5):
+        store.append("alice", "user", f"msg {i}")
+    store.append("bob", "user", "hello")
+    assert [content for _, content in store.turns("alice")] == [
+        "msg 2",
+        "msg 3",
+        "msg 4",
+    ]
+    assert store.turns("bob") == [("user", "hello")]
+    assert store.turns("nobody") == []
+
+
+def test_char_cap_drops_old_turns_but_keeps_the_newest():
+    store = ConversationStore(max_chars_per_conversation=10)
+    store.append("alice", "user", "12345")
+    store.append("alice", "assistant", "67890")
+    store.append("alice", "user", "x" * 20)
+    assert store.turns("alice") == [("user", "x" * 20)]
+    assert store.total_chars == 20
+
+
+def test_idle_conversations_are_evicted_first():
+    store = ConversationStore(max_conversations=2)
+    store.append("alice", "user", "hi")
+    store.append("bob", "user", "hi")
+    # Reading alice's context makes bob the least recently used
+    store.context("alice", 100)
+    store.append("carol", "user", "hi")
+    assert store.turns("bob") == []
+    assert store.turns("alice") and store.turns("carol")
+    assert store.evictions == 1
+
+
+def test_total_char_cap_evicts_whole_conversations():
+    store = ConversationStore(max_total_chars=25)
+    store.append("alice", "user", "a" * 10)
+    store.append("bob", "user", "b" * 10)
+    store.append("carol", "user", "c" * 10)
+    assert len(store) == 2
+    assert store.total_chars == 20
+    store.clear("bob")
+    assert store.total_chars == 10
+
+
+def test_no_budget_means_no_context():
+    store = ConversationStore()
+    store.append("alice", "user", "hi")
+    assert store.context("alice", 0) == []
+    assert store.context("nobody", 100) == []
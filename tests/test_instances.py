@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+from src.config import settings
+from src.instances import InstanceConfig, InstanceRegistry
+
+# No background Evolution polling while the registry is up
+SETTINGS = settings.model_copy(
+    update={"HEALTH_REFRESH_INTERVAL": 3600.0, "HEALTH_PUSH_REFRESH_INTERVAL": 3600.0}
+)
+DEFAULT = InstanceConfig(name="main", api_key="k0", owner_number="100")
+
+
+async def handler(instance, message):
+    pass
+
+
+def write(path, *configs):
+    path.write_text(
+        json.dumps([{"api_key": "k", "owner_number": "1", **c} for c in configs])
+    )
+
+
+def test_webhooks_are_routed_to_their_instance(tmp_path):
+    path = tmp_path / "instances.json"
+    write(path, {"name": "sales"}, {"name": "support"}, {"name": "main"})
+
+    async def scenario():
+        registry = InstanceRegistry(DEFAULT, SETTINGS, handler, path=str(path))
+        await registry.start()
+        try:
+            # The default comes from the settings, not from the file
+            assert registry.get(None) is registry.default
+            assert registry.get("main").config == DEFAULT
+            assert registry.get("sales").name == "sales"
+            assert registry.get("unknown") is None
+            assert len(registry) == 3
+            # Every instance has its own connection pool and worker pool
+            assert registry.get("sales").client is not registry.get("support").client
+            assert registry.get("sales").pool is not registry.get("support").pool
+        finally:
+            await registry.stop()
+
+    asyncio.run(scenario())
+
+
+def test_reload_applies_only_the_difference(tmp_path):
+    path = tmp_path / "instances.json"
+    write(path, {"name": "sales"}, {"name": "support"})
+
+    async def scenario():
+        registry = InstanceRegistry(DEFAULT, SETTINGS, handler, path=str(path))
+        await registry.start()
+        try:
+            sales, support = registry.get("sales"), registry.get("support")
+            write(
+                path,
+                {"name": "sales", "model": "small"},
+                {"name": "support", "api_key": "rotated"},
+                {"name": "billing"},
+            )
+            changes = await registry.reload()
+            assert changes == {
+                "added": ["billing"],
+                "updated": ["sales", "support"],
+                "removed": [],
+            }
+            # A model change is picked up in place; a new key rebuilds the pools
+            assert registry.get("sales") is sales
+            assert sales.model == "small"
+            assert registry.get("support") is not support
+            await asyncio.sleep(0.05)
+            assert not support.pool.accepting
+
+            write(path, {"name": "sales", "model": "small"})
+            changes = await registry.reload()
+            assert changes["removed"] == ["support", "billing"]
+            assert len(registry) == 2
+        finally:
+            await registry.stop()
+
+    asyncio.run(scenario())
+
+
+def test_invalid_file_keeps_the_current_instances(tmp_path):
+    path = tmp_path / "instances.json"
+    write(path, {"name": "sales"})
+
+    async def scenario():
+        registry = InstanceRegistry(DEFAULT, SETTINGS, handler, path=str(path))
+        await registry.start()
+        try:
+            sales = registry.get("sales")
+            path.write_text('[{"name": "sales"}]')
+            assert await registry.reload() == {
+                "added": [],
+                "updated": [],
+                "removed": [],
+            }
+            assert registry.get("sales") is sales
+        finally:
+            await registry.stop()
+
+    asyncio.run(scenario())
+
+
+def test_file_changes_are_picked_up_by_the_watcher(tmp_path):
+    path = tmp_path / "instances.json"
+
+    async def scenario():
+        registry = InstanceRegistry(
+            DEFAULT, SETTINGS, handler, path=str(path), reload_interval=0.02
+        )
+        await registry.start()
+        try:
+            assert len(registry) == 1
+            write(path, {"name": "sales"})
+            for _ in range(50):
+                if registry.get("sales") is not None:
+                    break
+                await asyncio.sleep(0.02)
+            assert registry.get("sales") is not None
+        finally:
+            await registry.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from src.llm import LLMClient
+from src.resilience import CircuitOpenError
+from src.utils import LLM_FALLBACK_REPLY, SYSTEM_PROMPT, get_llm_response
+
+
+class FakeCompletions:
+    def __init__(self, delay: float = 0.0, error: Exception = None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.in_flight -= 1
+        message = SimpleNamespace(content=f"reply {len(self.calls)}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def make_llm(completions: FakeCompletions, **options) -> LLMClient:
+    llm = LLMClient("key", "big-model", **options)
+    llm._client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return llm
+
+
+def test_groq_is_not_imported_until_the_client_is_needed():
+    # A fresh interpreter: other tests may have loaded the SDK already
+    code = (
+        "import sys; from src.llm import LLMClient; "
+        "llm = LLMClient('key', 'big-model'); "
+        "assert 'groq' not in sys.modules; "
+        "llm.client; assert 'groq' in sys.modules"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+def test_one_client_serves_every_call():
+    completions = FakeCompletions()
+    llm = make_llm(completions)
+    shared = llm.client
+
+    async def scenario():
+        return [await get_llm_response(llm, text) for text in ("hi", "bye")]
+
+    assert asyncio.run(scenario()) == ["reply 1", "reply 2"]
+    assert llm.client is shared
+    first = completions.calls[0]
+    assert first["model"] == "big-model"
+    assert first["messages"][0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert first["messages"][-1] == {"role": "user", "content": "hi"}
+
+
+def test_concurrent_calls_overlap_up_to_the_cap():
+    completions = FakeCompletions(delay=0.05)
+    llm = make_llm(completions, max_concurrency=3)
+
+    async def scenario():
+        return await asyncio.gather(*(get_llm_response(llm, str(i)) for i in range(10)))
+
+    replies = asyncio.run(scenario())
+    assert len(replies) == 10
+    assert completions.peak == 3
+
+
+def test_history_is_sent_between_the_system_prompt_and_the_message():
+    completions = FakeCompletions()
+    llm = make_llm(completions)
+    history = [
+        {"role": "user", "content": "book it"},
+        {"role": "assistant", "content": "Which day?"},
+    ]
+    asyncio.run(get_llm_response(llm, "friday", history=history, model="small"))
+    call = completions.calls[0]
+    assert call["model"] == "small"
+    assert call["messages"][1:] == [*history, {"role": "user", "content": "friday"}]
+
+
+def test_errors_and_an_open_circuit_get_the_fallback_reply():
+    failing = make_llm(FakeCompletions(error=RuntimeError("boom")), max_retries=0)
+    assert asyncio.run(get_llm_response(failing, "hi")) == LLM_FALLBACK_REPLY
+
+    completions = FakeCompletions()
+    llm = make_llm(completions)
+
+    async def open_circuit():
+        raise CircuitOpenError("groq circuit is open")
+
+    llm.complete = lambda *args, **kwargs: open_circuit()
+    assert asyncio.run(get_llm_response(llm, "hi")) == LLM_FALLBACK_REPLY
+    assert completions.calls == []
@@ -0,0 +1,52 @@
+import logging
+import logging.config
+from types import SimpleNamespace
+
+import pytest
+from uvicorn.config import LOGGING_CONFIG
+
+from src.logging_setup import SERVER_LOGGERS, configure_logging
+
+SETTINGS = SimpleNamespace(
+    LOG_QUEUE_SIZE=100, LOG_SAMPLING={}, LOG_FORMAT="text", LOG_LEVEL="INFO"
+)
+
+
+@pytest.fixture
+def restore_logging():
+    names = ("",) + SERVER_LOGGERS
+    saved = {
+        name: (
+            logging.getLogger(name or None).handlers[:],
+            logging.getLogger(name or None).propagate,
+        )
+        for name in names
+    }
+    level = logging.getLogger().level
+    yield
+    for name, (handlers, propagate) in saved.items():
+        logger = logging.getLogger(name or None)
+        logger.handlers = handlers
+        logger.propagate = propagate
+    logging.getLogger().setLevel(level)
+
+
+def test_uvicorn_loggers_go_through_the_queue(restore_logging):
+    # What `uvicorn app:app` does before importing the app
+    logging.config.dictConfig(LOGGING_CONFIG)
+    control = configure_logging(SETTINGS)
+    for name in SERVER_LOGGERS:
+        logger = logging.getLogger(name)
+        assert logger.handlers == []
+        assert logger.propagate
+    assert logging.getLogger().handlers == [control.handler]
+
+
+def test_disabled_access_log_stays_off(restore_logging):
+    logging.config.dictConfig(LOGGING_CONFIG)
+    # uvicorn --no-access-log
+    access = logging.getLogger("uvicorn.access")
+    access.handlers = []
+    access.propagate = False
+    configure_logging(SETTINGS)
+    assert not access.propagate
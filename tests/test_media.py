@@ -0,0 +1,176 @@
+import asyncio
+import base64
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from src.media import JsonBase64Field, MediaPipeline, MediaTooLarge, fetch_media
+from src.models import IncomingMessage, MediaRef
+
+PAYLOAD = os.urandom(1000)
+
+
+def feed_in_chunks(document: bytes, size: int, max_bytes: int = 10_000) -> bytes:
+    field = JsonBase64Field("base64", max_bytes)
+    out = []
+    for i in range(0, len(document), size):
+        out.append(field.feed(document[i : i + size]))
+        if field.complete:
+            break
+    assert field.complete
+    assert field.size == len(PAYLOAD)
+    return b"".join(out)
+
+
+def evolution_response(value: str) -> bytes:
+    # Other fields around the value, one of them with "base64" in its text
+    return (
+        '{"mediaType": "audioMessage", "caption": "\\"base64\\" here", '
+        f'"base64" : "{value}", "mimetype": "audio/ogg"}}'
+    ).encode()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 5, 7, 64, 65, 4096])
+def test_decodes_across_any_chunk_boundary(size):
+    document = evolution_response(base64.b64encode(PAYLOAD).decode())
+    assert feed_in_chunks(document, size) == PAYLOAD
+
+
+@pytest.mark.parametrize("size", [1, 3, 6, 11])
+def test_strips_data_url_prefix_and_json_escapes(size):
+    encoded = base64.b64encode(PAYLOAD).decode()
+    # JSON encoders may escape "/" as "\/" and wrap long base64 lines
+    escaped = encoded.replace("/", "\\/")
+    value = "data:audio/ogg;base64," + escaped[:500] + "\\n" + escaped[500:]
+    assert feed_in_chunks(evolution_response(value), size) == PAYLOAD
+
+
+def test_rejects_oversized_media():
+    document = evolution_response(base64.b64encode(PAYLOAD).decode())
+    with pytest.raises(MediaTooLarge):
+        feed_in_chunks(document, 64, max_bytes=len(PAYLOAD) - 1)
+
+
+def test_binary_document_is_not_downloaded():
+    def stream_media(*args, **kwargs):
+        raise AssertionError("a binary document must not be fetched")
+
+    pipeline = MediaPipeline(llm=None, processor=None)
+    instance = SimpleNamespace(client=SimpleNamespace(stream_media=stream_media))
+    message = IncomingMessage(
+        instance="bot",
+        message_id="DOC1",
+        sender_jid="1@s.whatsapp.net",
+        push_name="a",
+        text="",
+        media=MediaRef(
+            kind="document", mimetype="application/pdf", file_name="a.pdf", size=10**7
+        ),
+    )
+    text = asyncio.run(pipeline._extract(instance, message))
+    assert text == "[Document: a.pdf, application/pdf]"
+
+
+class FakeStream:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.sent = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def aiter_bytes(self, size):
+        for i in range(0, len(self.body), size):
+            self.sent += size
+            yield self.body[i : i + size]
+
+
+class FakeClient:
+    def __init__(self):
+        self.fetched = []
+
+    def stream_media(self, message_id, timeout=None):
+        self.fetched.append(("id", message_id))
+        return FakeStream(evolution_response(base64.b64encode(PAYLOAD).decode()))
+
+    def stream_url(self, url, timeout=None):
+        self.fetched.append(("url", url))
+        return FakeStream(PAYLOAD)
+
+
+@pytest.mark.parametrize(
+    "url, fetched",
+    [
+        (
+            "https://media.example.com/bucket/a.ogg",
+            ("url", "https://media.example.com/bucket/a.ogg"),
+        ),
+        ("http://169.254.169.254/latest/meta-data/", ("id", "AUD1")),
+        ("http://localhost:8000/health", ("id", "AUD1")),
+        ("file:///etc/passwd", ("id", "AUD1")),
+        ("https://media.example.com.evil.test/a.ogg", ("id", "AUD1")),
+    ],
+)
+def test_media_links_are_followed_only_to_storage_hosts(url, fetched):
+    client = FakeClient()
+    media = MediaRef(kind="audio", mimetype="audio/ogg", url=url)
+
+    async def fetch():
+        file, size = await fetch_media(
+            client,
+            "AUD1",
+            media,
+            max_bytes=10_000,
+            spool_bytes=100,
+            url_hosts={"media.example.com"},
+        )
+        with file:
+            return file.read(), size
+
+    assert asyncio.run(fetch()) == (PAYLOAD, len(PAYLOAD))
+    assert client.fetched == [fetched]
+
+
+@pytest.mark.parametrize("by_url", [False, True])
+def test_text_document_download_stops_at_the_char_limit(by_url):
+    body = b"line of text\n" * 100_000
+    stream = FakeStream(body)
+    if not by_url:
+        stream.body = evolution_response(base64.b64encode(body).decode())
+    client = SimpleNamespace(
+        stream_media=lambda *args, **kwargs: stream,
+        stream_url=lambda *args, **kwargs: stream,
+    )
+    pipeline = MediaPipeline(
+        llm=None,
+        processor=None,
+        document_max_chars=100,
+        max_bytes=len(body) // 2,
+        url_hosts=["media.example.com"],
+    )
+    message = IncomingMessage(
+        instance="bot",
+        message_id="DOC2",
+        sender_jid="1@s.whatsapp.net",
+        push_name="a",
+        text="",
+        media=MediaRef(
+            kind="document",
+            mimetype="text/plain",
+            file_name="notes.txt",
+            size=len(body),
+            url="https://media.example.com/notes.txt" if by_url else None,
+        ),
+    )
+    text = asyncio.run(pipeline._extract(SimpleNamespace(client=client), message))
+    assert text == "[Document: notes.txt]\n" + body.decode()[:100] + "\n[... truncated]"
+    # Over max_bytes in total, but only the first chunk was read
+    assert stream.sent <= 64 * 1024
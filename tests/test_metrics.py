@@ -0,0 +1,91 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.metrics import Counter, Gauge, Histogram, MetricsRegistry, _Metric
+from src.routers import metrics
+
+
+def test_metric_without_samples_cannot_be_built():
+    with pytest.raises(TypeError):
+        _Metric("whatsapp_bot_bare", "No samples")
+
+
+def test_counter_and_gauge_exposition():
+    registry = MetricsRegistry()
+    sends = registry.counter("test_sends_total", "Sends")
+    events = registry.counter("test_events_total", "Events", ["event"])
+    depth = registry.gauge("test_queue_depth", "Queue depth", ["queue"])
+    sends.inc()
+    sends.inc(amount=2)
+    events.inc('say "hi"\n')
+    depth.set(3, "text")
+    depth.set_function(lambda: 7, "media")
+    assert registry.render().splitlines() == [
+        "# HELP test_sends_total Sends",
+        "# TYPE test_sends_total counter",
+        "test_sends_total 3",
+        "# HELP test_events_total Events",
+        "# TYPE test_events_total counter",
+        'test_events_total{event="say \\"hi\\"\\n"} 1',
+        "# HELP test_queue_depth Queue depth",
+        "# TYPE test_queue_depth gauge",
+        'test_queue_depth{queue="text"} 3',
+        'test_queue_depth{queue="media"} 7',
+    ]
+
+
+def test_gauge_callback_is_only_dropped_by_its_owner():
+    gauge = Gauge("test_depth", "Depth", ["pool"])
+
+    def old():
+        return 1
+
+    def new():
+        return 2
+
+    gauge.set_function(old, "bot")
+    gauge.set_function(new, "bot")
+    # A replaced pool stopping late must not remove its successor's gauge
+    gauge.unset_function(old, "bot")
+    assert gauge.value("bot") == 2
+    gauge.unset_function(new, "bot")
+    assert list(gauge.samples()) == []
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Latency", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "llm")
+    assert list(histogram.samples()) == [
+        'test_seconds_bucket{stage="llm",le="0.1"} 2',
+        'test_seconds_bucket{stage="llm",le="1.0"} 3',
+        'test_seconds_bucket{stage="llm",le="+Inf"} 4',
+        'test_seconds_sum{stage="llm"} 2.65',
+        'test_seconds_count{stage="llm"} 4',
+    ]
+
+
+def test_timer_observes_its_block():
+    histogram = Histogram("test_timed_seconds", "Timed", ["stage"])
+    with histogram.time("send"):
+        pass
+    samples = list(histogram.samples())
+    assert samples[-1] == 'test_timed_seconds_count{stage="send"} 1'
+
+
+def test_metrics_endpoint_serves_the_global_registry():
+    app = FastAPI()
+    app.include_router(metrics.router)
+    with TestClient(app) as client:
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == metrics.CONTENT_TYPE
+    assert "# TYPE whatsapp_bot_stage_seconds histogram" in response.text
+
+
+def test_counter_label_values_are_positional():
+    counter = Counter("test_tokens_total", "Tokens", ["route", "direction"])
+    counter.inc("small", "in", amount=10)
+    assert counter.value("small", "in") == 10
+    assert counter.value("small", "out") == 0
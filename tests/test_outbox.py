@@ -0,0 +1,89 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+
+from src import outbox as outbox_module
+from src.outbox import Outbox
+
+
+def status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://evolution.test/message/sendText/bot")
+    return httpx.HTTPStatusError(
+        "error", request=request, response=httpx.Response(code, request=request)
+    )
+
+
+async def run_outbox(tmp_path, messages, *, wait=1.0, **options):
+    outbox = Outbox(
+        str(tmp_path / "outbox.db"),
+        poll_interval=0.02,
+        backoff_base=0.01,
+        backoff_max=0.02,
+        **options,
+    )
+    await outbox.open()
+    outbox.start({"bot": SimpleNamespace(outbound=None)})
+    try:
+        for number, text in messages:
+            await outbox.enqueue("bot", number, text)
+        deadline = asyncio.get_running_loop().time() + wait
+        while asyncio.get_running_loop().time() < deadline:
+            counts = (await outbox.stats())["by_status"]
+            if not counts.get("pending") and not counts.get("sending"):
+                break
+            await asyncio.sleep(0.02)
+        stats = await outbox.stats()
+    finally:
+        await outbox.stop(drain_timeout=0.5)
+        await outbox.close()
+    return stats
+
+
+def test_unexpected_error_is_retried_not_left_leased(tmp_path, monkeypatch):
+    attempts = []
+
+    async def send(outbound, number, text, **kwargs):
+        attempts.append(text)
+        if len(attempts) == 1:
+            # A proxy answering 200 with an HTML page
+            raise json.JSONDecodeError("Expecting value", "<html>", 0)
+
+    monkeypatch.setattr(outbox_module, "send_whatsapp_message", send)
+    stats = asyncio.run(run_outbox(tmp_path, [("1", "hello")], lease_seconds=0.5))
+    assert attempts == ["hello", "hello"]
+    assert stats["by_status"] == {"delivered": 1}
+    assert stats["in_flight"] == 0
+
+
+def test_client_errors_dead_letter_server_errors_retry(tmp_path, monkeypatch):
+    attempts = {"1": 0, "2": 0}
+
+    async def send(outbound, number, text, **kwargs):
+        attempts[number] += 1
+        raise status_error(400 if number == "1" else 503)
+
+    monkeypatch.setattr(outbox_module, "send_whatsapp_message", send)
+    stats = asyncio.run(run_outbox(tmp_path, [("1", "a"), ("2", "b")], max_attempts=3))
+    assert attempts == {"1": 1, "2": 3}
+    assert stats["by_status"] == {"dead": 2}
+    assert stats["retried"] == 2
+
+
+def test_failed_message_holds_back_the_rest_of_the_chat(tmp_path, monkeypatch):
+    sent = []
+
+    async def send(outbound, number, text, **kwargs):
+        if text == "first" and not sent.count((number, "failed first")):
+            sent.append((number, "failed first"))
+            raise httpx.ConnectError("connection refused")
+        sent.append((number, text))
+
+    monkeypatch.setattr(outbox_module, "send_whatsapp_message", send)
+    stats = asyncio.run(
+        run_outbox(tmp_path, [("1", "first"), ("1", "second"), ("2", "other")])
+    )
+    assert stats["by_status"] == {"delivered": 3}
+    chat = [text for number, text in sent if number == "1"]
+    assert chat == ["failed first", "first", "second"]
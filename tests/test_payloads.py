@@ -0,0 +1,131 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from src.models import MessagesUpsertPayload
+from src.payloads import PayloadTooLarge, peek_event, read_webhook_body
+from src.responses import FastJSONResponse
+
+
+class FakeRequest:
+    """Just the streaming part of a Starlette request"""
+
+    def __init__(self, body: bytes, chunk_size: int):
+        self.chunks = [
+            body[i : i + chunk_size] for i in range(0, len(body), chunk_size)
+        ]
+        self.read = 0
+
+    async def stream(self):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+
+def upsert(message, **key):
+    return json.dumps(
+        {
+            "event": "messages.upsert",
+            "instance": "bot",
+            "data": {
+                "key": {"remoteJid": "1@s.whatsapp.net", "id": "ABC", **key},
+                "pushName": "Alice",
+                "message": message,
+                "unknown": {"ignored": True},
+            },
+        }
+    ).encode()
+
+
+def test_peek_event_reads_the_leading_field():
+    assert peek_event(b'{"event" : "messages.upsert", "data"') == "messages.upsert"
+    assert peek_event(b'{"instance": "bot", "ev') is None
+
+
+def test_unhandled_events_are_not_read_to_the_end():
+    body = b'{"event": "presence.update", "data": "' + b"x" * 100_000 + b'"}'
+    request = FakeRequest(body, 1000)
+    event, read = asyncio.run(
+        read_webhook_body(request, {"messages.upsert"}, max_bytes=10**6)
+    )
+    assert (event, read) == ("presence.update", None)
+    assert request.read == 1
+
+
+def test_event_split_across_chunks_is_found():
+    body = upsert({"conversation": "hi"})
+    request = FakeRequest(body, 5)
+    event, read = asyncio.run(
+        read_webhook_body(request, {"messages.upsert"}, max_bytes=10**6)
+    )
+    assert (event, read) == ("messages.upsert", body)
+
+
+def test_oversized_body_is_rejected():
+    request = FakeRequest(upsert({"conversation": "x" * 1000}), 100)
+    with pytest.raises(PayloadTooLarge):
+        asyncio.run(read_webhook_body(request, {"messages.upsert"}, max_bytes=500))
+
+
+@pytest.mark.parametrize(
+    "message, text",
+    [
+        ({"conversation": "hello"}, "hello"),
+        ({"extendedTextMessage": {"text": "with a link"}}, "with a link"),
+        ({"reactionMessage": {"text": "👍"}}, None),
+    ],
+)
+def test_text_messages_are_parsed_in_one_pass(message, text):
+    payload = MessagesUpsertPayload.model_validate_json(upsert(message))
+    assert payload.instance == "bot"
+    assert payload.data.key.remoteJid == "1@s.whatsapp.net"
+    assert payload.data.pushName == "Alice"
+    assert payload.data.message.text == text
+    assert payload.data.message.media is None
+
+
+def test_media_reference_and_caption():
+    image = {
+        "imageMessage": {
+            "mimetype": "image/jpeg",
+            "caption": "look",
+            "fileLength": {"low": 5, "high": 1, "unsigned": True},
+        },
+        "mediaUrl": "https://media.example.com/a.jpg",
+    }
+    message = MessagesUpsertPayload.model_validate_json(upsert(image)).data.message
+    assert message.caption == "look"
+    media = message.media
+    assert (media.kind, media.mimetype, media.size) == (
+        "image",
+        "image/jpeg",
+        2**32 + 5,
+    )
+    assert media.url == "https://media.example.com/a.jpg"
+
+    document = {
+        "documentWithCaptionMessage": {
+            "message": {
+                "documentMessage": {
+                    "mimetype": "application/pdf",
+                    "fileName": "a.pdf",
+                    "caption": "the report",
+                    "fileLength": "1234",
+                }
+            }
+        }
+    }
+    message = MessagesUpsertPayload.model_validate_json(upsert(document)).data.message
+    assert message.caption == "the report"
+    media = message.media
+    assert (media.kind, media.file_name, media.size) == ("document", "a.pdf", 1234)
+
+
+def test_fast_json_response_renders_models_and_datetimes():
+    payload = MessagesUpsertPayload.model_validate_json(upsert({"conversation": "hi"}))
+    response = FastJSONResponse({"payload": payload, "at": datetime(2026, 1, 2)})
+    rendered = json.loads(response.body)
+    assert rendered["at"] == "2026-01-02T00:00:00"
+    assert rendered["payload"]["data"]["message"]["conversation"] == "hi"
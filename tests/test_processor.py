@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+from src import processor as processor_module
+from src.dedup import DedupCache
+from src.history import ConversationStore
+from src.models import IncomingMessage
+from src.processor import MessageProcessor
+from src.response_cache import ResponseCache
+from src.state import MemoryStateBackend
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    async def complete(self, messages, **kwargs):
+        self.calls += 1
+        return f"reply {self.calls}"
+
+
+def make_message(sender: str, text: str) -> IncomingMessage:
+    return IncomingMessage(
+        instance="test",
+        message_id=f"{sender}-{text}",
+        sender_jid=f"{sender}@s.whatsapp.net",
+        push_name=sender,
+        text=text,
+    )
+
+
+def test_cached_reply_not_shared_across_histories(monkeypatch):
+    sent = []
+
+    async def send(outbound, number, text, **kwargs):
+        sent.append((number, text))
+
+    monkeypatch.setattr(processor_module, "send_whatsapp_message", send)
+    llm = FakeLLM()
+    state = MemoryStateBackend(DedupCache(), ConversationStore())
+    processor = MessageProcessor(llm, state, response_cache=ResponseCache())
+    instance = SimpleNamespace(name="test", model="model", outbound=None)
+
+    async def scenario():
+        await state.append_turns(
+            "test/alice@s.whatsapp.net",
+            [("user", "shall I book it?"), ("assistant", "Want the 9am slot?")],
+        )
+        await state.append_turns(
+            "test/bob@s.whatsapp.net",
+            [("user", "cancel my order"), ("assistant", "Are you sure?")],
+        )
+        await processor.process(instance, make_message("alice", "yes"))
+        await processor.process(instance, make_message("bob", "yes"))
+
+    asyncio.run(scenario())
+    assert llm.calls == 2
+    assert sent == [
+        ("alice@s.whatsapp.net", "reply 1"),
+        ("bob@s.whatsapp.net", "reply 2"),
+    ]
+
+
+def test_cached_reply_reused_for_same_context(monkeypatch):
+    async def send(outbound, number, text, **kwargs):
+        pass
+
+    monkeypatch.setattr(processor_module, "send_whatsapp_message", send)
+    llm = FakeLLM()
+    state = MemoryStateBackend(DedupCache(), ConversationStore())
+    processor = MessageProcessor(llm, state, response_cache=ResponseCache())
+    instance = SimpleNamespace(name="test", model="model", outbound=None)
+
+    async def scenario():
+        # Two new conversations: no history, so the greeting is shared
+        await processor.process(instance, make_message("alice", "hi"))
+        await processor.process(instance, make_message("bob", "Hi!"))
+
+    asyncio.run(scenario())
+    assert llm.calls == 1
+
+
+def test_emoji_and_punctuation_only_prompts_are_not_cached(monkeypatch):
+    async def send(outbound, number, text, **kwargs):
+        pass
+
+    monkeypatch.setattr(processor_module, "send_whatsapp_message", send)
+    llm = FakeLLM()
+    state = MemoryStateBackend(DedupCache(), ConversationStore())
+    processor = MessageProcessor(llm, state, response_cache=ResponseCache())
+    instance = SimpleNamespace(name="test", model="model", outbound=None)
+
+    async def scenario():
+        for sender, text in [("alice", "👍"), ("bob", "😡"), ("carol", "?")]:
+            await processor.process(instance, make_message(sender, text))
+
+    asyncio.run(scenario())
+    assert llm.calls == 3
+    assert len(processor.response_cache) == 0
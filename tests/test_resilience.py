@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+
+from src.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    RetryBudget,
+    UpstreamPolicy,
+)
+
+
+def make_policy(name, latency=None, **options):
+    return UpstreamPolicy(
+        name,
+        breaker=CircuitBreaker(name, failure_threshold=5, reset_timeout=0.05),
+        budget=RetryBudget(1.0),
+        backoff_base=0.001,
+        latency=latency,
+        **options,
+    )
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_probe():
+    breaker = CircuitBreaker("test-breaker", failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.current_state == CLOSED
+    breaker.record_failure()
+    assert breaker.current_state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    time.sleep(0.06)
+    assert breaker.current_state == HALF_OPEN
+    breaker.check()  # the one probe
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_success()
+    assert breaker.current_state == CLOSED
+    breaker.unregister()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker("test-probe", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.current_state == OPEN
+    assert breaker.times_opened == 2
+    breaker.unregister()
+
+
+def test_retry_budget_caps_retries_at_a_share_of_calls():
+    budget = RetryBudget(0.1, min_per_second=0.0)
+    for _ in range(50):
+        budget.record_call()
+    spent = sum(budget.try_spend() for _ in range(20))
+    assert spent == 5
+
+
+def test_policy_retries_only_retryable_errors():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("refused")
+        return "ok"
+
+    policy = make_policy("test-retry", max_retries=2)
+    assert asyncio.run(policy.call(flaky)) == "ok"
+    assert len(attempts) == 3
+
+    async def rejected():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    attempts.clear()
+    policy = make_policy(
+        "test-no-retry", retryable=lambda e: not isinstance(e, ValueError)
+    )
+    with pytest.raises(ValueError):
+        asyncio.run(policy.call(rejected))
+    assert len(attempts) == 1
+
+
+def test_client_errors_do_not_open_the_circuit():
+    async def rejected():
+        raise ValueError("bad request")
+
+    policy = make_policy(
+        "test-4xx",
+        max_retries=0,
+        is_failure=lambda e: not isinstance(e, ValueError),
+    )
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            asyncio.run(policy.call(rejected))
+    assert policy.breaker.current_state == CLOSED
+
+
+def test_no_retry_once_the_circuit_opens():
+    attempts = []
+
+    async def down():
+        attempts.append(1)
+        raise ConnectionError("refused")
+
+    policy = make_policy("test-open", max_retries=10)
+    with pytest.raises(ConnectionError):
+        asyncio.run(policy.call(down))
+    assert len(attempts) == 5
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.call(down))
+    assert len(attempts) == 5
+
+
+def test_hedge_wins_and_the_loser_latency_is_recorded():
+    tracker = LatencyTracker(min_samples=5, min_delay=0.01)
+    for _ in range(5):
+        tracker.observe(0.02)
+    calls = []
+
+    async def call():
+        calls.append(1)
+        # The first attempt hangs, the hedge answers at once
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return len(calls)
+
+    policy = make_policy("test-hedge", latency=tracker)
+    started = time.monotonic()
+    assert asyncio.run(policy.call(call)) == 2
+    assert time.monotonic() - started < 1
+    samples = list(tracker._samples)[5:]
+    # The winner, and the cancelled primary at its elapsed time (>= the delay)
+    assert len(samples) == 2
+    assert max(samples) >= 0.02
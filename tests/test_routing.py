@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src import routing as routing_module
+from src.routing import COMPLEX, SIMPLE, LatencyWindow, ModelRouter, Route, is_simple
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(
+        routing_module, "time", SimpleNamespace(monotonic=lambda: clock.now)
+    )
+    return clock
+
+
+def make_router(**options):
+    return ModelRouter(
+        large_model="large",
+        small_model="small",
+        latency_budget=2.0,
+        min_samples=3,
+        fallback_models=["small", "medium"],
+        **options,
+    )
+
+
+def slow_down(router, model, seconds, count=3):
+    for _ in range(count):
+        router.observe(Route(COMPLEX, model, 500), seconds)
+
+
+@pytest.mark.parametrize(
+    "text, simple",
+    [
+        ("ok thanks!", True),
+        ("what time do you open?", True),
+        ("explain the refund policy", False),
+        ("How do I reset my password", False),
+        ("line one\nline two", False),
+        ("x" * 61, False),
+    ],
+)
+def test_short_small_talk_is_simple(text, simple):
+    assert is_simple(text, 60) is simple
+
+
+def test_simple_messages_go_to_the_small_model():
+    router = make_router()
+    route = router.choose("good morning")
+    assert (route.name, route.model, route.max_tokens) == (SIMPLE, "small", 200)
+    route = router.choose("please summarise this article for me")
+    assert (route.name, route.model, route.max_tokens) == (COMPLEX, "large", 500)
+    # An instance's own model replaces the large one
+    assert router.choose("write a poem", model="custom").model == "custom"
+
+
+def test_slow_model_cascades_to_the_next_within_budget():
+    router = make_router()
+    slow_down(router, "large", 5.0)
+    route = router.choose("compare these two plans")
+    assert (route.model, route.fallback) == ("small", True)
+
+
+def test_cascade_skips_fallbacks_that_are_slow_too():
+    router = make_router()
+    slow_down(router, "large", 5.0)
+    slow_down(router, "small", 3.0)
+    assert router.choose("compare these two plans").model == "medium"
+
+
+def test_all_slow_picks_the_fastest():
+    router = make_router()
+    slow_down(router, "large", 5.0)
+    slow_down(router, "small", 4.0)
+    slow_down(router, "medium", 3.0)
+    route = router.choose("compare these two plans")
+    assert (route.model, route.fallback) == ("medium", True)
+
+
+def test_too_few_samples_or_no_budget_keep_the_primary():
+    router = make_router()
+    slow_down(router, "large", 5.0, count=2)
+    assert router.choose("compare these two plans").model == "large"
+
+    unbudgeted = make_router()
+    unbudgeted.latency_budget = 0
+    slow_down(unbudgeted, "large", 5.0)
+    assert unbudgeted.choose("compare these two plans").model == "large"
+
+
+def test_slow_samples_age_out_of_the_window(clock):
+    router = make_router(window=60.0)
+    slow_down(router, "large", 5.0)
+    assert router.choose("compare these two plans").model == "small"
+    clock.now += 61
+    assert router.choose("compare these two plans").model == "large"
+
+
+def test_latency_window_percentile(clock):
+    window = LatencyWindow(window=60.0)
+    for seconds in range(1, 11):
+        window.observe(float(seconds))
+    assert window.percentile(50) == 6.0
+    assert window.percentile(95) == 10.0
+    assert window.percentile(95, min_samples=11) is None
+    clock.now += 61
+    assert len(window) == 0
+
+
+def test_stats_count_requests_and_fallbacks_per_route():
+    router = make_router()
+    router.observe(Route(SIMPLE, "small", 200), 0.2)
+    router.observe(Route(COMPLEX, "large", 500), 1.0)
+    router.observe(Route(COMPLEX, "small", 500, fallback=True), 0.3)
+    stats = router.stats()
+    assert stats["routes"][COMPLEX]["requests"] == 2
+    assert stats["routes"][COMPLEX]["models"] == {"large": 1, "small": 1}
+    assert stats["routes"][SIMPLE]["models"] == {"small": 1}
+    assert stats["models"]["small"]["samples"] == 2
@@ -0,0 +1,143 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.scheduler import (
+    PRIORITY_BULK,
+    PRIORITY_REPLY,
+    PRIORITY_TEST,
+    OutboundScheduler,
+    OutboundStopped,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+class FakeClient:
+    """Evolution stand-in: records sends, answering each with `responses`"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    async def send_text(self, number, text, timeout=None):
+        self.sent.append((number, text))
+        status, headers = self.responses.pop(0) if self.responses else (201, {})
+        request = httpx.Request("POST", "http://evolution.test/message/sendText/bot")
+        response = httpx.Response(status, headers=headers, request=request)
+        response.raise_for_status()
+        return {"number": number}
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    now = bucket.updated
+    for _ in range(2):
+        assert bucket.wait_time(now) == 0.0
+        bucket.consume()
+    assert bucket.wait_time(now) == pytest.approx(0.5)
+    assert bucket.wait_time(now + 0.5) == 0.0
+    # Never more than `capacity` tokens, however long it was idle
+    bucket.wait_time(now + 100)
+    assert bucket.tokens == 2
+
+
+@pytest.mark.parametrize(
+    "value, expected", [("3", 3.0), ("-1", 0.0), (None, 5.0), ("soon", 5.0)]
+)
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value, 5.0) == expected
+
+
+def test_replies_go_before_bulk_and_test_traffic():
+    client = FakeClient()
+
+    async def scenario():
+        scheduler = OutboundScheduler(client, max_in_flight=1)
+        sends = [
+            asyncio.create_task(scheduler.send("1", "test", priority=PRIORITY_TEST)),
+            asyncio.create_task(scheduler.send("2", "bulk", priority=PRIORITY_BULK)),
+            asyncio.create_task(scheduler.send("3", "reply", priority=PRIORITY_REPLY)),
+            asyncio.create_task(scheduler.send("4", "bulk 2", priority=PRIORITY_BULK)),
+        ]
+        await asyncio.sleep(0)
+        scheduler.start()
+        await asyncio.gather(*sends)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert [text for _, text in client.sent] == ["reply", "bulk", "bulk 2", "test"]
+
+
+def test_a_throttled_recipient_does_not_block_the_others():
+    client = FakeClient()
+
+    async def scenario():
+        scheduler = OutboundScheduler(client, recipient_rate=20.0, recipient_burst=1)
+        sends = [
+            asyncio.create_task(scheduler.send(number, text))
+            for number, text in [("1", "a"), ("1", "b"), ("2", "c")]
+        ]
+        await asyncio.sleep(0)
+        scheduler.start()
+        await asyncio.gather(*sends)
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert client.sent == [("1", "a"), ("2", "c"), ("1", "b")]
+    assert scheduler.sent == 3
+
+
+def test_429_pauses_sends_and_retries():
+    client = FakeClient((429, {"Retry-After": "0.1"}))
+
+    async def scenario():
+        scheduler = OutboundScheduler(client)
+        scheduler.start()
+        started = asyncio.get_running_loop().time()
+        result = await scheduler.send("1", "hi")
+        elapsed = asyncio.get_running_loop().time() - started
+        await scheduler.stop()
+        return scheduler, result, elapsed
+
+    scheduler, result, elapsed = asyncio.run(scenario())
+    assert result == {"number": "1"}
+    assert client.sent == [("1", "hi"), ("1", "hi")]
+    assert scheduler.rate_limited == 1
+    assert elapsed >= 0.1
+
+
+def test_errors_reach_the_sender_once_retries_run_out():
+    client = FakeClient((429, {"Retry-After": "0"}), (429, {"Retry-After": "0"}))
+
+    async def scenario():
+        scheduler = OutboundScheduler(client, max_retries=1)
+        scheduler.start()
+        with pytest.raises(httpx.HTTPStatusError):
+            await scheduler.send("1", "hi")
+        await scheduler.stop()
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert len(client.sent) == 2
+    assert scheduler.failed == 1
+
+
+def test_stopped_scheduler_fails_queued_and_new_sends():
+    client = FakeClient()
+
+    async def scenario():
+        # Never started: the queued send is still waiting at shutdown
+        scheduler = OutboundScheduler(client)
+        queued = asyncio.create_task(scheduler.send("1", "hi"))
+        await asyncio.sleep(0)
+        await scheduler.stop(drain_timeout=0)
+        with pytest.raises(OutboundStopped):
+            await queued
+        with pytest.raises(OutboundStopped):
+            await scheduler.send("1", "late")
+
+    asyncio.run(scenario())
+    assert client.sent == []
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+from src.startup import FirstRequestMiddleware, StartupReport
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_does_not_load_the_groq_sdk():
+    code = "import sys, app; assert 'groq' not in sys.modules"
+    env = {**os.environ, "GROQ_API_KEY": "test", "EVOLUTION_API_KEY": "test"}
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+
+
+def test_phases_are_durations_since_the_previous_mark(monkeypatch):
+    now = [10.0]
+    monkeypatch.setattr("src.startup.time.perf_counter", lambda: now[0])
+    monkeypatch.setattr("src.startup.process_age", lambda: 0.5)
+    report = StartupReport(started=10.0)
+    now[0] = 10.25
+    report.mark("import")
+    now[0] = 10.75
+    report.mark("llm")
+    report.ready()
+    assert report.report() == {
+        "before_import_seconds": 0.5,
+        "phases": {"import": 0.25, "llm": 0.5},
+        "ready_seconds": 1.25,
+        "first_request_seconds": None,
+    }
+
+
+def test_first_request_is_recorded_once():
+    report = StartupReport(started=0.0)
+    served = []
+
+    async def app(scope, receive, send):
+        served.append(scope["type"])
+
+    middleware = FirstRequestMiddleware(app, report)
+
+    async def scenario():
+        await middleware({"type": "lifespan"}, None, None)
+        assert report.first_request_after is None
+        await middleware({"type": "http"}, None, None)
+        first = report.first_request_after
+        await middleware({"type": "http"}, None, None)
+        return first
+
+    first = asyncio.run(scenario())
+    assert first is not None
+    assert report.first_request_after == first
+    assert served == ["lifespan", "http", "http"]
+
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from src.dedup import DedupCache
+from src.history import ConversationStore
+from src.state import MemoryStateBackend, SQLiteStateBackend, StateBackend
+
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+    MemoryStateBackend(DedupCache(), ConversationStore())
+
+
+def test_sqlite_dedup_and_forget(tmp_path):
+    async def scenario():
+        state = SQLiteStateBackend(str(tmp_path / "state.db"))
+        await state.start()
+        try:
+            first = await state.seen("k")
+            again = await state.seen("k")
+            await state.forget("k")
+            after_forget = await state.seen("k")
+        finally:
+            await state.close()
+        return first, again, after_forget
+
+    assert asyncio.run(scenario()) == (False, True, False)
+
+
+def test_sqlite_history_caps(tmp_path):
+    async def scenario():
+        state = SQLiteStateBackend(
+            str(tmp_path / "state.db"),
+            max_turns=4,
+            max_chars_per_conversation=25,
+            max_conversations=2,
+            max_total_chars=1000,
+            cache_ttl=0,
+        )
+        await state.start()
+        try:
+            for i in range(6):
+                await state.append_turns("a", [("user", f"message {i}")])
+            turns_a = await state.turns("a")
+            # Three conversations, "a" the least recently active
+            await state.append_turns("b", [("user", "hi")])
+            await state.append_turns("c", [("user", "hello")])
+            await state.flush()
+            evicted = await state.evict_idle()
+            remaining = [await state.turns(cid) for cid in ("a", "b", "c")]
+        finally:
+            await state.close()
+        return turns_a, evicted, remaining
+
+    turns_a, evicted, remaining = asyncio.run(scenario())
+    # Newest turns within both the turn and the char cap
+    assert turns_a == [("user", "message 4"), ("user", "message 5")]
+    assert evicted == 1
+    assert remaining == [[], [("user", "hi")], [("user", "hello")]]
+
+
+def test_sqlite_total_chars_cap(tmp_path):
+    async def scenario():
+        state = SQLiteStateBackend(
+            str(tmp_path / "state.db"), max_total_chars=10, cache_ttl=0
+        )
+        await state.start()
+        try:
+            for cid in ("a", "b", "c"):
+                await state.append_turns(cid, [("user", "x" * 6)])
+            await state.flush()
+            await state.evict_idle()
+            return [await state.turns(cid) for cid in ("a", "b", "c")]
+        finally:
+            await state.close()
+
+    # Only the most recently active conversation fits in 10 chars
+    assert asyncio.run(scenario()) == [[], [], [("user", "xxxxxx")]]
@@ -0,0 +1,33 @@
+import pytest
+
+from src.streaming import SentenceChunker, TagStripper
+
+TEXT = "<think>plan the answer</think>Hello there. <b>Bold</b> text<prompt>x</prompt>!"
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(TEXT)])
+def test_tags_split_across_chunks_are_removed(size):
+    stripper = TagStripper()
+    out = [stripper.feed(TEXT[i : i + size]) for i in range(0, len(TEXT), size)]
+    out.append(stripper.flush())
+    assert "".join(out) == "Hello there. <b>Bold</b> text!"
+
+
+def test_unterminated_block_is_dropped():
+    stripper = TagStripper()
+    assert stripper.feed("visible <think>never closed") == "visible "
+    assert stripper.flush() == ""
+
+
+def test_partial_tag_is_held_until_decided():
+    stripper = TagStripper()
+    assert stripper.feed("a <thi") == "a "
+    assert stripper.feed("s is not a tag") == "<this is not a tag"
+
+
+def test_chunker_cuts_at_sentences_past_min_chars_and_paragraphs():
+    chunker = SentenceChunker(min_chars=20)
+    chunks = chunker.feed("Hi. This is long enough now. Short")
+    chunks += chunker.feed(" one\n\nNext paragraph")
+    assert chunks == ["Hi. This is long enough now.", "Short one"]
+    assert chunker.flush() == "Next paragraph"
@@ -0,0 +1,91 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.config import settings
+from src.routers import webhook
+
+
+class FakeConnection:
+    def __init__(self):
+        self.updates = []
+
+    def update(self, state, pushed=False):
+        self.updates.append((state, pushed))
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(webhook.router)
+    connection = FakeConnection()
+    instance = SimpleNamespace(name="bot", connection=connection)
+    app.state.capture = None
+    app.state.instances = SimpleNamespace(
+        get=lambda name: instance if name in (None, "bot") else None
+    )
+    with TestClient(app) as client:
+        client.connection = connection
+        yield client
+
+
+def post(client, path, body):
+    content = body if isinstance(body, bytes) else json.dumps(body).encode()
+    return client.post(
+        path, content=content, headers={"Content-Type": "application/json"}
+    )
+
+
+@pytest.mark.parametrize(
+    "path, event",
+    [
+        ("/webhook/", "CONNECTION_UPDATE"),
+        ("/webhook/", "connection.update"),
+        ("/webhook/connection-update", "connection.update"),
+    ],
+)
+def test_every_event_spelling_reaches_its_handler(client, path, event):
+    body = {"event": event, "instance": "bot", "data": {"state": "close"}}
+    response = post(client, path, body)
+    assert response.json()["message"] == "Connection state updated"
+    assert client.connection.updates == [("close", True)]
+
+
+def test_event_named_after_the_first_bytes_is_still_dispatched(client):
+    body = {"data": {"state": "open", "padding": "x" * 2000}, "instance": "bot"}
+    body["event"] = "connection.update"
+    assert post(client, "/webhook/", body).json()["status"] == "success"
+    assert client.connection.updates == [("open", True)]
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("/webhook/presence-update", {"event": "presence.update", "data": {}}),
+        ("/webhook/", {"event": "chats.update", "data": {}}),
+        ("/webhook/", {"data": {}}),
+        ("/webhook/", [1, 2, 3]),
+        ("/webhook/", "connection.update"),
+    ],
+)
+def test_unhandled_or_non_object_bodies_are_acknowledged(client, path, body):
+    response = post(client, path, body)
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+    assert response.json()["message"] == "Event ignored"
+
+
+def test_qrcode_event_with_a_non_object_body(client):
+    response = post(client, "/webhook/", [{"event": "qrcode.updated"}])
+    assert response.json()["status"] == "success"
+    assert response.json()["message"] == "QR code noted"
+
+
+def test_oversized_body_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_BODY_BYTES", 100)
+    body = {"event": "messages.upsert", "data": {"padding": "x" * 200}}
+    response = post(client, "/webhook/", body)
+    assert response.status_code == 413
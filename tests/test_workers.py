@@ -0,0 +1,85 @@
+import asyncio
+
+from src.workers import WorkerPool
+
+
+def test_submit_never_waits_and_rejects_when_full():
+    async def scenario():
+        release = asyncio.Event()
+        done = []
+
+        async def handler(job):
+            await release.wait()
+            done.append(job)
+
+        pool = WorkerPool(handler, num_workers=1, max_queue_size=2, name="full")
+        pool.start()
+        assert pool.submit(1)
+        # The worker takes job 1; jobs 2 and 3 fill the queue
+        await asyncio.sleep(0)
+        assert pool.submit(2) and pool.submit(3)
+        assert not pool.submit(4)
+        assert pool.stats()["busy"] == 1 and pool.depth == 2
+        release.set()
+        await pool.stop()
+        return pool, done
+
+    pool, done = asyncio.run(scenario())
+    assert done == [1, 2, 3]
+    assert (pool.processed, pool.rejected) == (3, 1)
+
+
+def test_stop_drains_queued_jobs_then_rejects():
+    async def scenario():
+        done = []
+
+        async def handler(job):
+            await asyncio.sleep(0.01)
+            done.append(job)
+
+        pool = WorkerPool(handler, num_workers=2, max_queue_size=10, name="drain")
+        pool.start()
+        for job in range(6):
+            assert pool.submit(job)
+        await pool.stop()
+        assert not pool.accepting
+        assert not pool.submit("late")
+        return pool, done
+
+    pool, done = asyncio.run(scenario())
+    assert sorted(done) == list(range(6))
+    assert pool.rejected == 1
+
+
+def test_a_failing_job_does_not_stop_its_worker():
+    async def scenario():
+        async def handler(job):
+            if job == "bad":
+                raise ValueError(job)
+
+        pool = WorkerPool(handler, num_workers=1, name="failing")
+        pool.start()
+        for job in ("bad", "good", "bad", "good"):
+            pool.submit(job)
+        await pool.stop()
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert (pool.processed, pool.failed) == (2, 2)
+
+
+def test_drain_timeout_cancels_stuck_workers():
+    async def scenario():
+        async def handler(job):
+            await asyncio.sleep(10)
+
+        pool = WorkerPool(handler, num_workers=1, name="stuck")
+        pool.start()
+        pool.submit("slow")
+        pool.submit("queued")
+        await asyncio.wait_for(pool.stop(drain_timeout=0.05), timeout=1.0)
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert pool.processed == 0
+    assert pool.depth == 1